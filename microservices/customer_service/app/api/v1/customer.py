@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, BackgroundTasks
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from op_core.core import get_db
+from op_core.core import get_db, get_read_db, get_async_db
 from app.models.customer import Customer
 from app.models.otp import OTPVerification, OTPType, OTPPurpose
 from app.schemas.customer import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerRegisterRequest
 from app.crud import customer as customer_crud
+from app.crud import customer_async
 from app.crud import otp as otp_crud
 from app.core.redis_client import redis_client
 from app.core.email_utils import send_otp_email, generate_otp
@@ -20,7 +22,7 @@ def get_customers(
     request: Request,
     skip: int = 0, 
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all customers
@@ -58,14 +60,14 @@ async def register_customer(
     request: Request,
     customer: CustomerRegisterRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_client: UserClient = Depends(get_user_client)
 ):
     """
     Register a new customer with OTP verification
     """
     # Check if email already exists
-    db_customer = customer_crud.get_customer_by_email(db, email=customer.email)
+    db_customer = await customer_async.get_customer_by_email(db, email=customer.email)
     if db_customer:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,8 +98,8 @@ async def register_customer(
         is_verified=False
     )
     db.add(db_customer)
-    db.commit()
-    db.refresh(db_customer)
+    await db.commit()
+    await db.refresh(db_customer)
     
     # # Create OTP verification record for database tracking
     # otp_record = OTPVerification(
@@ -144,7 +146,7 @@ async def register_customer(
 def get_customer(
     request: Request,
     customer_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get customer by ID
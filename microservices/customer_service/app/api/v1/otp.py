@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
-from op_core.core import get_db
+from op_core.core import get_async_db
 from app.core.email_utils import send_otp_email, generate_otp
 from app.models.otp import OTPType, OTPPurpose
 from app.schemas.otp import OTPVerifyRequest, OTPResendRequest, OTPResponse
-from app.crud import otp as otp_crud
-from app.crud import customer as customer_crud
+from app.crud import otp_async as otp_crud
+from app.crud import customer_async as customer_crud
 from op_core.core import log_customer_activity
-from app.core.redis_client import store_otp, verify_otp, clear_otp
-from op_core.core.redis_client import redis_client
+from app.core.redis_client import store_otp_async, verify_otp_async, clear_otp_async
+from op_core.core.redis_client import async_redis_client
 from op_core.core.config import settings
 
 router = APIRouter()
@@ -18,7 +18,7 @@ router = APIRouter()
 async def verify_otp_endpoint(
     request: Request,
     verification_data: OTPVerifyRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Xác thực mã OTP
@@ -27,11 +27,11 @@ async def verify_otp_endpoint(
     email = verification_data.email
     otp_code = verification_data.otp
     
-    is_valid = verify_otp(email, otp_code)
+    is_valid = await verify_otp_async(email, otp_code)
     
     if not is_valid:
         # Log OTP verification failure
-        customer = customer_crud.get_customer_by_email(db, email)
+        customer = await customer_crud.get_customer_by_email(db, email)
         
         log_details = {
             "email": email,
@@ -51,10 +51,10 @@ async def verify_otp_endpoint(
         )
     
     # OTP is valid, update customer status
-    customer = customer_crud.get_customer_by_email(db, email)
+    customer = await customer_crud.get_customer_by_email(db, email)
     if customer:
         # Set customer as verified
-        customer_crud.update_customer(db, customer.id, {"is_verified": True})
+        await customer_crud.update_customer(db, customer.id, {"is_verified": True})
         
         # Log OTP verification success
         log_customer_activity(
@@ -79,7 +79,7 @@ async def resend_otp(
     request: Request,
     request_data: OTPResendRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Gửi lại OTP qua email
@@ -87,7 +87,7 @@ async def resend_otp(
     email = request_data.email
     
     # Kiểm tra customer có tồn tại không
-    customer = customer_crud.get_customer_by_email(db, email)
+    customer = await customer_crud.get_customer_by_email(db, email)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -98,7 +98,7 @@ async def resend_otp(
     key = f"otp:resend_limit:{email}"
     
     # Thử lấy số lần đã yêu cầu OTP
-    attempts = redis_client.get(key)
+    attempts = await async_redis_client.get(key)
     
     if attempts and int(attempts) >= settings.OTP_MAX_RESENDS:
         # Log OTP request rate limit
@@ -118,15 +118,15 @@ async def resend_otp(
     
     # Tăng số lần yêu cầu OTP và đặt thời gian hết hạn
     if attempts:
-        redis_client.incr(key)
+        await async_redis_client.incr(key)
     else:
-        redis_client.set(key, 1, ex=settings.OTP_COOLDOWN_MINUTES * 60)
+        await async_redis_client.set(key, 1, ex=settings.OTP_COOLDOWN_MINUTES * 60)
     
     # Tạo OTP mới
     otp_code = generate_otp()
     
     # Lưu OTP vào Redis
-    store_otp(email, otp_code, settings.OTP_EXPIRE_MINUTES * 60)
+    await store_otp_async(email, otp_code, settings.OTP_EXPIRE_MINUTES * 60)
     
     # Gửi OTP trong background task
     background_tasks.add_task(
@@ -154,12 +154,12 @@ async def resend_otp(
 @router.get("/clean-expired", response_model=Dict[str, Any])
 async def clean_expired_otps(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Xóa các OTP đã hết hạn (chỉ dành cho admin)
     """
-    count = otp_crud.clean_expired_otps(db)
+    count = await otp_crud.clean_expired_otps(db)
     
     # Log cleanup activity
     log_customer_activity(
@@ -1,4 +1,4 @@
-from op_core.core.redis_client import redis_client, get_redis
+from op_core.core.redis_client import redis_client, get_redis, async_redis_client
 from op_core.core.config import settings
 
 # Redis utility functions specific to customer service
@@ -52,4 +52,41 @@ def clear_otp(email: str):
     """
     key = f"customer:otp:{email}"
     redis_client.delete(key)
-    return True 
\ No newline at end of file
+    return True
+
+# Async variants for async endpoints (shared redis.asyncio pool, does not block the event loop)
+async def store_otp_async(email: str, otp: str, expiry_seconds: int = None):
+    """
+    Store OTP in Redis with expiration time (default from settings)
+    """
+    if expiry_seconds is None:
+        expiry_seconds = settings.OTP_EXPIRE_MINUTES * 60
+
+    key = f"customer:otp:{email}"
+    await async_redis_client.set(key, otp, ex=expiry_seconds)
+    return True
+
+async def verify_otp_async(email: str, otp: str) -> bool:
+    """
+    Verify if OTP is valid for the given email
+    """
+    key = f"customer:otp:{email}"
+    stored_otp = await async_redis_client.get(key)
+
+    if not stored_otp:
+        return False
+
+    if stored_otp == otp:
+        # Delete OTP after successful verification
+        await async_redis_client.delete(key)
+        return True
+
+    return False
+
+async def clear_otp_async(email: str):
+    """
+    Clear OTP for the given email
+    """
+    key = f"customer:otp:{email}"
+    await async_redis_client.delete(key)
+    return True
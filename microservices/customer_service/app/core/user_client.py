@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from op_core.rest.user.client import UserClient as BaseUserClient, UserCreate
 import os
 from op_core.core.config import settings
@@ -10,8 +10,9 @@ class UserClient:
     to make it easier to use in this service.
     """
     def __init__(self):
-        self.user_service_url = settings.SERVICES["customers"]["api_prefix"]
-        self.client = BaseUserClient(base_url=self.user_service_url)
+        # Requests go through the shared pooled client of the users service,
+        # balanced over its instances (settings.service_instances("users"))
+        self.client = BaseUserClient()
 
     async def create_user(self, email: str, full_name: str, password: str = "123456") -> Dict[str, Any]:
         """
@@ -32,6 +33,14 @@ class UserClient:
         """
         return await self.client.get_user(user_id)
 
-# Dependency to get a UserClient instance
+    async def get_users(self, user_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Get many users by ID in one request (unknown IDs are skipped).
+        """
+        return await self.client.get_users(user_ids)
+
+_user_client = UserClient()
+
+# Dependency to get the UserClient instance
 def get_user_client() -> UserClient:
-    return UserClient() 
\ No newline at end of file
+    return _user_client 
\ No newline at end of file
@@ -1,2 +1,4 @@
 from . import customer
-from . import otp 
\ No newline at end of file
+from . import otp
+from . import customer_async
+from . import otp_async
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_
 import random
 import string
+from op_core.core.cache import cached_lookup, invalidate
 from ..models.customer import Customer
 from ..schemas.customer import CustomerCreate, CustomerUpdate
 
@@ -42,12 +43,18 @@ def get_customers(db: Session, skip: int = 0, limit: int = 100, search: Optional
         "size": limit
     }
 
+def _invalidate_customer(customer_id: int, *emails: str):
+    invalidate("customer:id", customer_id)
+    invalidate("customer:email", *emails)
+
+@cached_lookup(Customer, "customer:id")
 def get_customer(db: Session, customer_id: int) -> Optional[Customer]:
     """
     Get a customer by ID
     """
     return db.query(Customer).filter(Customer.id == customer_id).first()
 
+@cached_lookup(Customer, "customer:email")
 def get_customer_by_email(db: Session, email: str) -> Optional[Customer]:
     """
     Get a customer by email
@@ -110,9 +117,10 @@ def update_customer(db: Session, customer_id: int, customer: Union[CustomerUpdat
     """
     Update an existing customer
     """
-    db_customer = get_customer(db, customer_id)
+    db_customer = get_customer.uncached(db, customer_id)
     if not db_customer:
         return None
+    old_email = db_customer.email
     
     # Update only the fields that are provided
     if isinstance(customer, dict):
@@ -125,6 +133,7 @@ def update_customer(db: Session, customer_id: int, customer: Union[CustomerUpdat
     
     db.commit()
     db.refresh(db_customer)
+    _invalidate_customer(customer_id, old_email, db_customer.email)
     
     return db_customer
 
@@ -132,11 +141,13 @@ def delete_customer(db: Session, customer_id: int) -> bool:
     """
     Delete a customer
     """
-    db_customer = get_customer(db, customer_id)
+    db_customer = get_customer.uncached(db, customer_id)
     if not db_customer:
         return False
+    email = db_customer.email
     
     db.delete(db_customer)
     db.commit()
+    _invalidate_customer(customer_id, email)
     
     return True 
\ No newline at end of file
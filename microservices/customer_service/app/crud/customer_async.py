@@ -0,0 +1,155 @@
+from typing import List, Optional, Dict, Any, Union
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from op_core.core.cache import cached_lookup, invalidate_async
+from ..models.customer import Customer
+from ..schemas.customer import CustomerCreate, CustomerUpdate
+from .customer import generate_customer_code
+
+# Async variants of crud/customer.py for AsyncSession (get_async_db)
+
+async def get_customers(db: AsyncSession, skip: int = 0, limit: int = 100, search: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get all customers with optional search and pagination
+    """
+    query = select(Customer)
+    
+    # Apply search filter if provided
+    if search:
+        search_term = f"%{search}%"
+        query = query.where(
+            or_(
+                Customer.full_name.ilike(search_term),
+                Customer.email.ilike(search_term),
+                Customer.phone.ilike(search_term),
+                Customer.customer_code.ilike(search_term)
+            )
+        )
+    
+    # Get total count for pagination
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    
+    # Apply pagination
+    result = await db.execute(query.offset(skip).limit(limit))
+    
+    return {
+        "total": total,
+        "items": result.scalars().all(),
+        "page": skip // limit + 1 if limit else 1,
+        "size": limit
+    }
+
+async def _invalidate_customer(customer_id: int, *emails: str):
+    await invalidate_async("customer:id", customer_id)
+    await invalidate_async("customer:email", *emails)
+
+@cached_lookup(Customer, "customer:id")
+async def get_customer(db: AsyncSession, customer_id: int) -> Optional[Customer]:
+    """
+    Get a customer by ID
+    """
+    result = await db.execute(select(Customer).where(Customer.id == customer_id))
+    return result.scalars().first()
+
+@cached_lookup(Customer, "customer:email")
+async def get_customer_by_email(db: AsyncSession, email: str) -> Optional[Customer]:
+    """
+    Get a customer by email
+    """
+    result = await db.execute(select(Customer).where(Customer.email == email))
+    return result.scalars().first()
+
+async def get_customer_by_user_id(db: AsyncSession, user_id: int) -> Optional[Customer]:
+    """
+    Get a customer by user_id
+    """
+    result = await db.execute(select(Customer).where(Customer.user_id == user_id))
+    return result.scalars().first()
+
+async def get_customer_by_oauth_id(db: AsyncSession, provider: str, oauth_id: str) -> Optional[Customer]:
+    """
+    Get a customer by OAuth ID (Google, Facebook, or Yahoo)
+    """
+    columns = {
+        "google": Customer.google_id,
+        "facebook": Customer.facebook_id,
+        "yahoo": Customer.yahoo_id
+    }
+    column = columns.get(provider)
+    if column is None:
+        return None
+    result = await db.execute(select(Customer).where(column == oauth_id))
+    return result.scalars().first()
+
+async def create_customer(db: AsyncSession, customer: Union[CustomerCreate, Dict[str, Any]]) -> Customer:
+    """
+    Create a new customer
+    """
+    # Generate a unique customer code
+    customer_code = generate_customer_code()
+    
+    # Handle both dict and CustomerCreate
+    if isinstance(customer, dict):
+        customer_data = customer
+    else:
+        customer_data = customer.dict()
+    
+    # Create a new Customer object
+    db_customer = Customer(
+        customer_code=customer_code,
+        full_name=customer_data.get("full_name", ""),
+        email=customer_data.get("email", ""),
+        phone=customer_data.get("phone"),
+        birthdate=customer_data.get("birthdate"),
+        address=customer_data.get("address"),
+        user_id=customer_data.get("user_id"),
+        google_id=customer_data.get("google_id"),
+        facebook_id=customer_data.get("facebook_id"),
+        yahoo_id=customer_data.get("yahoo_id")
+    )
+    
+    # Add to DB and commit
+    db.add(db_customer)
+    await db.commit()
+    await db.refresh(db_customer)
+    
+    return db_customer
+
+async def update_customer(db: AsyncSession, customer_id: int, customer: Union[CustomerUpdate, Dict[str, Any]]) -> Optional[Customer]:
+    """
+    Update an existing customer
+    """
+    db_customer = await get_customer.uncached(db, customer_id)
+    if not db_customer:
+        return None
+    old_email = db_customer.email
+    
+    # Update only the fields that are provided
+    if isinstance(customer, dict):
+        update_data = customer
+    else:
+        update_data = customer.dict(exclude_unset=True)
+        
+    for key, value in update_data.items():
+        setattr(db_customer, key, value)
+    
+    await db.commit()
+    await _invalidate_customer(customer_id, old_email, db_customer.email)
+    # Reload server-side values (updated_at) explicitly, lazy loads are not possible here
+    await db.refresh(db_customer)
+    
+    return db_customer
+
+async def delete_customer(db: AsyncSession, customer_id: int) -> bool:
+    """
+    Delete a customer
+    """
+    db_customer = await get_customer.uncached(db, customer_id)
+    if not db_customer:
+        return False
+    
+    await db.delete(db_customer)
+    await db.commit()
+    await _invalidate_customer(customer_id, db_customer.email)
+    
+    return True
@@ -0,0 +1,223 @@
+from typing import Optional, Dict, Any
+from sqlalchemy import select, delete, and_, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from op_core.core.config import settings
+from op_core.core.redis_client import async_redis_client
+from ..models.otp import OTPVerification
+from .otp import generate_otp
+
+# Async variants of crud/otp.py for AsyncSession (get_async_db)
+
+async def create_otp(
+    db: AsyncSession, 
+    identifier: str, 
+    otp_type: str, 
+    otp_purpose: str, 
+    customer_id: Optional[int] = None,
+    device_info: Optional[str] = None
+) -> OTPVerification:
+    """
+    Tạo mới một mã OTP
+    """
+    # Tính thời gian hết hạn
+    expires_at = datetime.utcnow() + timedelta(minutes=settings.OTP_EXPIRE_MINUTES)
+    
+    # Tạo mã OTP
+    otp_code = generate_otp()
+    
+    # Kiểm tra xem đã có OTP cho identifier này chưa và chưa hết hạn
+    result = await db.execute(select(OTPVerification).where(
+        and_(
+            OTPVerification.identifier == identifier,
+            OTPVerification.otp_type == otp_type,
+            OTPVerification.otp_purpose == otp_purpose,
+            OTPVerification.expires_at > datetime.utcnow(),
+            OTPVerification.is_used == False
+        )
+    ))
+    existing_otp = result.scalars().first()
+    
+    if existing_otp:
+        # Cập nhật OTP hiện có
+        existing_otp.code = otp_code
+        existing_otp.expires_at = expires_at
+        existing_otp.is_sent = False
+        existing_otp.send_count += 1
+        existing_otp.verify_count = 0
+        await db.commit()
+        await db.refresh(existing_otp)
+        return existing_otp
+    
+    # Tạo OTP mới
+    otp = OTPVerification(
+        identifier=identifier,
+        otp_type=otp_type,
+        otp_purpose=otp_purpose,
+        code=otp_code,
+        expires_at=expires_at,
+        customer_id=customer_id,
+        device_info=device_info
+    )
+    
+    db.add(otp)
+    await db.commit()
+    await db.refresh(otp)
+    
+    return otp
+
+async def get_otp(
+    db: AsyncSession, 
+    identifier: str, 
+    code: str, 
+    otp_type: str, 
+    otp_purpose: str
+) -> Optional[OTPVerification]:
+    """
+    Lấy thông tin OTP dựa trên identifier, code, type và purpose
+    """
+    result = await db.execute(select(OTPVerification).where(
+        and_(
+            OTPVerification.identifier == identifier,
+            OTPVerification.code == code,
+            OTPVerification.otp_type == otp_type,
+            OTPVerification.otp_purpose == otp_purpose,
+            OTPVerification.expires_at > datetime.utcnow(),
+            OTPVerification.is_used == False
+        )
+    ))
+    return result.scalars().first()
+
+async def get_latest_otp(
+    db: AsyncSession, 
+    identifier: str, 
+    otp_type: str, 
+    otp_purpose: str
+) -> Optional[OTPVerification]:
+    """
+    Lấy OTP mới nhất cho một identifier
+    """
+    result = await db.execute(select(OTPVerification).where(
+        and_(
+            OTPVerification.identifier == identifier,
+            OTPVerification.otp_type == otp_type,
+            OTPVerification.otp_purpose == otp_purpose,
+            OTPVerification.expires_at > datetime.utcnow(),
+            OTPVerification.is_used == False
+        )
+    ).order_by(desc(OTPVerification.created_at)))
+    return result.scalars().first()
+
+async def _get_otp_by_id(db: AsyncSession, otp_id: int) -> Optional[OTPVerification]:
+    result = await db.execute(select(OTPVerification).where(OTPVerification.id == otp_id))
+    return result.scalars().first()
+
+async def mark_otp_sent(db: AsyncSession, otp_id: int) -> Optional[OTPVerification]:
+    """
+    Đánh dấu OTP đã được gửi
+    """
+    otp = await _get_otp_by_id(db, otp_id)
+    if otp:
+        otp.is_sent = True
+        otp.send_count += 1
+        await db.commit()
+        await db.refresh(otp)
+    return otp
+
+async def mark_otp_used(db: AsyncSession, otp_id: int) -> Optional[OTPVerification]:
+    """
+    Đánh dấu OTP đã được sử dụng
+    """
+    otp = await _get_otp_by_id(db, otp_id)
+    if otp:
+        otp.is_used = True
+        await db.commit()
+        await db.refresh(otp)
+    return otp
+
+async def increment_verify_count(db: AsyncSession, otp_id: int) -> Optional[OTPVerification]:
+    """
+    Tăng số lần đã thử xác thực
+    """
+    otp = await _get_otp_by_id(db, otp_id)
+    if otp:
+        otp.verify_count += 1
+        await db.commit()
+        await db.refresh(otp)
+    return otp
+
+async def _record_failed_attempts(identifier: str):
+    # Ghi log vào Redis
+    failed_key = f"otp:failed:{identifier}"
+    await async_redis_client.incr(failed_key)
+    await async_redis_client.expire(failed_key, settings.OTP_COOLDOWN_MINUTES * 60)
+
+async def validate_otp(
+    db: AsyncSession, 
+    identifier: str, 
+    code: str, 
+    otp_type: str, 
+    otp_purpose: str
+) -> Dict[str, Any]:
+    """
+    Xác thực mã OTP từ database (Không dùng Redis)
+    """
+    # Lấy OTP từ database
+    otp = await get_otp(db, identifier, code, otp_type, otp_purpose)
+    
+    # Nếu không tìm thấy OTP
+    if not otp:
+        # Tìm OTP mới nhất cho identifier này để tăng số lần thử
+        latest_otp = await get_latest_otp(db, identifier, otp_type, otp_purpose)
+        if latest_otp:
+            await increment_verify_count(db, latest_otp.id)
+            
+            # Kiểm tra nếu đã vượt quá số lần thử
+            if latest_otp.verify_count >= settings.OTP_MAX_ATTEMPTS:
+                await _record_failed_attempts(identifier)
+                
+                return {
+                    "success": False,
+                    "message": f"Đã vượt quá số lần thử tối đa ({settings.OTP_MAX_ATTEMPTS}). Vui lòng yêu cầu mã OTP mới.",
+                    "data": {"exceeded_attempts": True}
+                }
+        
+        return {
+            "success": False,
+            "message": "Mã OTP không đúng hoặc đã hết hạn.",
+            "data": None
+        }
+    
+    # Tăng số lần thử
+    await increment_verify_count(db, otp.id)
+    
+    # Kiểm tra nếu đã vượt quá số lần thử
+    if otp.verify_count > settings.OTP_MAX_ATTEMPTS:
+        await _record_failed_attempts(identifier)
+        
+        return {
+            "success": False,
+            "message": f"Đã vượt quá số lần thử tối đa ({settings.OTP_MAX_ATTEMPTS}). Vui lòng yêu cầu mã OTP mới.",
+            "data": {"exceeded_attempts": True}
+        }
+    
+    # Đánh dấu là đã sử dụng
+    await mark_otp_used(db, otp.id)
+    
+    return {
+        "success": True,
+        "message": "Xác thực OTP thành công.",
+        "data": {"otp": otp}
+    }
+
+async def clean_expired_otps(db: AsyncSession) -> int:
+    """
+    Xóa các OTP đã hết hạn
+    """
+    # One DELETE statement instead of loading every expired row
+    result = await db.execute(delete(OTPVerification).where(
+        OTPVerification.expires_at <= datetime.utcnow()
+    ))
+    await db.commit()
+    
+    return result.rowcount
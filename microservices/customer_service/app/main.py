@@ -12,11 +12,15 @@ from op_core.core import (
     validation_error_handler,
     request_validation_error_handler,
     http_exception_handler,
-    generic_error_handler
+    generic_error_handler,
+    MetricsMiddleware,
+    DeadlineMiddleware,
+    metrics_router
 )
 from .api.v1.customer import router as customer_router
 # from .api.v1.otp import router as otp_router
 from op_core.core.error_handlers import ErrorResponse
+from op_core.rest import service_clients
 
 # Create all tables
 # Base.metadata.create_all(bind=engine)
@@ -24,7 +28,9 @@ from op_core.core.error_handlers import ErrorResponse
 app = FastAPI(
     title=settings.SERVICES["customers"]["name"],
     version=settings.SERVICES["customers"]["version"],
-    openapi_url=f"{settings.SERVICES['customers']['api_prefix']}/openapi.json"
+    openapi_url=f"{settings.SERVICES['customers']['api_prefix']}/openapi.json",
+    # Keep-alive HTTP clients of upstream services live as long as the app
+    lifespan=service_clients.lifespan("users")
 )
 
 
@@ -44,6 +50,12 @@ app = FastAPI(
 # Add request logging middleware
 # app.add_middleware(LoggingMiddleware)
 
+# Add request deadline middleware (budget for outbound calls, from the caller's header)
+app.add_middleware(DeadlineMiddleware)
+
+# Add latency metrics middleware (outermost, so it times the whole stack)
+app.add_middleware(MetricsMiddleware)
+
 # # Exception handlers
 # app.add_exception_handler(ValidationError, validation_error_handler)
 # app.add_exception_handler(RequestValidationError, request_validation_error_handler)
@@ -62,6 +74,9 @@ app.include_router(
 #     tags=["otp"]
 # )
 
+# Prometheus scrape endpoint
+app.include_router(metrics_router, tags=["metrics"])
+
 @app.get("/health")
 async def health_check():
     return {
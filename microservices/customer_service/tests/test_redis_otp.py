@@ -1,6 +1,9 @@
 import pytest
-from unittest.mock import patch, MagicMock
-from app.core.redis_client import store_otp, verify_otp, clear_otp
+from unittest.mock import patch, MagicMock, AsyncMock
+from app.core.redis_client import (
+    store_otp, verify_otp, clear_otp,
+    store_otp_async, verify_otp_async, clear_otp_async
+)
 
 def test_store_otp():
     """Test storing OTP in Redis"""
@@ -83,4 +86,55 @@ def test_clear_otp():
         assert result is True
         
         # Verify the mock was called with expected arguments
-        mock_redis.delete.assert_called_once_with("customer:otp:test@example.com") 
\ No newline at end of file
+        mock_redis.delete.assert_called_once_with("customer:otp:test@example.com") 
+
+@pytest.mark.asyncio
+async def test_store_otp_async():
+    """Test storing OTP through the async Redis client"""
+    with patch('app.core.redis_client.async_redis_client') as mock_redis:
+        mock_redis.set = AsyncMock(return_value=True)
+        
+        result = await store_otp_async("test@example.com", "123456", 300)
+        
+        assert result is True
+        mock_redis.set.assert_awaited_once_with(
+            "customer:otp:test@example.com", 
+            "123456", 
+            ex=300
+        )
+
+@pytest.mark.asyncio
+async def test_verify_otp_async_valid():
+    """Test verifying valid OTP through the async Redis client"""
+    with patch('app.core.redis_client.async_redis_client') as mock_redis:
+        mock_redis.get = AsyncMock(return_value="123456")
+        mock_redis.delete = AsyncMock(return_value=1)
+        
+        result = await verify_otp_async("test@example.com", "123456")
+        
+        assert result is True
+        mock_redis.get.assert_awaited_once_with("customer:otp:test@example.com")
+        mock_redis.delete.assert_awaited_once_with("customer:otp:test@example.com")
+
+@pytest.mark.asyncio
+async def test_verify_otp_async_invalid():
+    """Test verifying invalid OTP through the async Redis client"""
+    with patch('app.core.redis_client.async_redis_client') as mock_redis:
+        mock_redis.get = AsyncMock(return_value="123456")
+        mock_redis.delete = AsyncMock()
+        
+        result = await verify_otp_async("test@example.com", "654321")
+        
+        assert result is False
+        mock_redis.delete.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_clear_otp_async():
+    """Test clearing OTP through the async Redis client"""
+    with patch('app.core.redis_client.async_redis_client') as mock_redis:
+        mock_redis.delete = AsyncMock(return_value=1)
+        
+        result = await clear_otp_async("test@example.com")
+        
+        assert result is True
+        mock_redis.delete.assert_awaited_once_with("customer:otp:test@example.com")
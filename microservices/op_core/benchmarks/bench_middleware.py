@@ -0,0 +1,66 @@
+"""
+Benchmark: latency overhead per middleware layer on users_service.app.main:app.
+
+Each stack wraps the service's router directly (no exception handlers or CORS), so
+the difference to "none" is the cost of the middleware layers alone. A no-op
+BaseHTTPMiddleware layer is included as a reference for the per-request task and
+memory-stream hop that the pure ASGI middleware avoids.
+
+Needs the same environment as the service itself (MySQL for the request log,
+Redis for the rate limiter). Run from the microservices directory:
+    python op_core/benchmarks/bench_middleware.py --requests 2000 --path /health
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from starlette.middleware.base import BaseHTTPMiddleware
+from op_core.core.config import settings
+from op_core.core.middleware import LoggingMiddleware, RateLimitMiddleware
+from users_service.app.main import app
+
+# Never block the benchmark client itself
+settings.RATE_LIMIT["MAX_REQUESTS"] = 10 ** 9
+
+class PassthroughMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+def build_stacks():
+    base = app.router
+    return [
+        ("none", base),
+        ("BaseHTTPMiddleware no-op", PassthroughMiddleware(base)),
+        ("RateLimitMiddleware", RateLimitMiddleware(base)),
+        ("LoggingMiddleware", LoggingMiddleware(base)),
+        ("Logging + RateLimit", LoggingMiddleware(RateLimitMiddleware(base))),
+    ]
+
+async def measure(asgi_app, path: str, total: int) -> list:
+    transport = httpx.ASGITransport(app=asgi_app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(min(total, 100)):  # warm up
+            await client.get(path)
+        for _ in range(total):
+            start = time.perf_counter()
+            await client.get(path)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+async def main(total: int, path: str):
+    baseline = None
+    for name, asgi_app in build_stacks():
+        latencies = sorted(await measure(asgi_app, path, total))
+        p50 = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        baseline = p50 if baseline is None else baseline
+        print(f"{name:>26}: p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  overhead {p50 - baseline:+7.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--path", default="/health")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.path))
@@ -0,0 +1,94 @@
+"""
+Benchmark: legacy sync RateLimitMiddleware vs. async single round trip limiter.
+
+Requires a local Redis (REDIS_HOST / REDIS_PORT / REDIS_PASSWORD env vars).
+
+Usage:
+    python op_core/benchmarks/bench_rate_limit.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+import httpx
+import redis
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from op_core.core.config import settings
+from op_core.core.middleware import RateLimitMiddleware
+
+# Never block the benchmark client itself
+settings.RATE_LIMIT["MAX_REQUESTS"] = 10 ** 9
+settings.RATE_LIMIT["REQUEST_COOLDOWN"] = 1
+# Same work as the legacy middleware: duplicate-request cooldown on every request
+settings.RATE_LIMIT["ROUTES"]["/ping"] = {"cooldown": True}
+
+legacy_client = redis.Redis(
+    host=settings.RATE_LIMIT["REDIS_HOST"],
+    port=settings.RATE_LIMIT["REDIS_PORT"],
+    db=settings.RATE_LIMIT["REDIS_DB"],
+    password=settings.RATE_LIMIT["REDIS_PASSWORD"],
+    decode_responses=True
+)
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """Previous implementation: sync client, up to four round trips per request"""
+    async def dispatch(self, request: Request, call_next):
+        client_ip = request.client.host
+        path = request.url.path
+        body = await request.body()
+        body_hash = hashlib.md5(body).hexdigest() if body else ""
+        request_key = f"rate_limit:{client_ip}:{path}:{body_hash}"
+
+        last_request = legacy_client.get(request_key)
+        if last_request and time.time() - float(last_request) < settings.RATE_LIMIT["REQUEST_COOLDOWN"]:
+            return JSONResponse(status_code=429, content={"message": "Too many requests"})
+        legacy_client.set(request_key, str(time.time()), ex=settings.RATE_LIMIT["REQUEST_COOLDOWN"])
+
+        ip_key = f"rate_limit:total:{client_ip}"
+        request_count = legacy_client.incr(ip_key)
+        if request_count == 1:
+            legacy_client.expire(ip_key, settings.RATE_LIMIT["RATE_LIMIT_WINDOW"])
+        if request_count > settings.RATE_LIMIT["MAX_REQUESTS"]:
+            return JSONResponse(status_code=429, content={"message": "Rate limit exceeded"})
+        return await call_next(request)
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/ping/{n}")
+    async def ping(n: int):
+        return {"n": n}
+
+    app.add_middleware(middleware)
+    return app
+
+async def run(app: FastAPI, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            # Distinct path per request so the cooldown never short-circuits
+            for n in counter:
+                response = await client.post(f"/ping/{n}", json={"n": n})
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+async def main(total: int, concurrency: int):
+    for name, middleware in (("legacy", LegacyRateLimitMiddleware), ("async", RateLimitMiddleware)):
+        app = build_app(middleware)
+        await run(app, min(total, 200), concurrency)  # warm up pools and script cache
+        rps = await run(app, total, concurrency)
+        print(f"{name:>8}: {rps:10.1f} req/s  ({total} requests, concurrency {concurrency})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -1,5 +1,5 @@
 from .config import settings
-from .database import Base, engine, get_db
+from .database import Base, engine, get_db, get_read_db, async_engine, AsyncSessionLocal, get_async_db
 from .error_handlers import (
     ErrorResponse,
     handle_validation_error,
@@ -12,6 +12,8 @@ from .exceptions import (
     AuthenticationError,
     ValidationError,
     NotFoundError,
+    ServiceBusyError,
+    RevocationUnavailableError,
     DatabaseError
 )
 from .exception_handlers import (
@@ -21,9 +23,22 @@ from .exception_handlers import (
     generic_error_handler
 )
 
-from .security import verify_password, get_password_hash, create_access_token, decode_token
-from .middleware import LoggingMiddleware, SQLQueryLoggingMiddleware, RateLimitMiddleware
+from .security import (
+    verify_password,
+    get_password_hash,
+    verify_and_update_password,
+    verify_password_async,
+    get_password_hash_async,
+    verify_and_update_password_async,
+    create_access_token,
+    decode_token,
+    check_token_status,
+    check_token_status_async
+)
+from .middleware import LoggingMiddleware, SQLQueryLoggingMiddleware, RateLimitMiddleware, MetricsMiddleware, DeadlineMiddleware
 from .logging import log_customer_activity
+from .diagnostics import router as diagnostics_router
+from .metrics import router as metrics_router
 # from .models.log import Log
 
 __all__ = [
@@ -31,6 +46,10 @@ __all__ = [
     'Base',
     'engine',
     'get_db',
+    'get_read_db',
+    'async_engine',
+    'AsyncSessionLocal',
+    'get_async_db',
     'ErrorResponse',
     'handle_validation_error',
     'handle_request_validation_error',
@@ -40,15 +59,27 @@ __all__ = [
     'AuthenticationError',
     'ValidationError',
     'NotFoundError',
+    'ServiceBusyError',
+    'RevocationUnavailableError',
     'DatabaseError',
     'LoggingMiddleware',
     'SQLQueryLoggingMiddleware',
     'RateLimitMiddleware',
+    'MetricsMiddleware',
+    'DeadlineMiddleware',
     'create_access_token',
     'decode_token',
+    'check_token_status',
+    'check_token_status_async',
+    'verify_and_update_password',
+    'verify_password_async',
+    'get_password_hash_async',
+    'verify_and_update_password_async',
     'validation_error_handler',
     'request_validation_error_handler',
     'http_exception_handler',
     'generic_error_handler',
-    'log_customer_activity'
+    'log_customer_activity',
+    'diagnostics_router',
+    'metrics_router'
 ]
\ No newline at end of file
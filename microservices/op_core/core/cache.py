@@ -0,0 +1,216 @@
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import functools
+from datetime import date, datetime, time as dt_time
+from typing import Any, Callable, Dict, Iterable, Optional
+import redis
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from .config import settings
+from .metrics import CACHE_REQUESTS
+from .redis_client import get_sync_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+_TEMPORAL_TYPES = {datetime: datetime.fromisoformat, date: date.fromisoformat, dt_time: dt_time.fromisoformat}
+
+def cache_key(namespace: str, value: Any) -> str:
+    # MySQL compares emails case-insensitively, so must the cache
+    if isinstance(value, str):
+        value = value.lower()
+    return f"{settings.CACHE['KEY_PREFIX']}:{namespace}:{value}"
+
+class RowCodec:
+    """
+    Serializes the column values of a mapped class to JSON and back.
+    Decoded rows become detached instances that can be merged into a session
+    without a SELECT (Session.merge(load=False)).
+    Excluded columns (secrets) are never written; they stay unloaded on
+    decoded instances and are loaded from the database on first access.
+    """
+    def __init__(self, model: type, exclude: Iterable[str] = ()):
+        self.model = model
+        self.exclude = frozenset(exclude)
+        self._columns = None
+
+    @property
+    def columns(self) -> Dict[str, Optional[Callable[[str], Any]]]:
+        """
+        Column keys -> parser of their JSON form (temporal types only).
+        Resolved on first use: reading column_attrs configures all mappers,
+        which fails while related models are still being imported.
+        """
+        if self._columns is None:
+            columns = {}
+            for attr in inspect(self.model).column_attrs:
+                if attr.key in self.exclude:
+                    continue
+                try:
+                    python_type = attr.columns[0].type.python_type
+                except NotImplementedError:
+                    python_type = None
+                columns[attr.key] = _TEMPORAL_TYPES.get(python_type)
+            self._columns = columns
+        return self._columns
+
+    def dumps(self, instance: Any) -> Dict[str, Any]:
+        row = {}
+        for key, parser in self.columns.items():
+            value = getattr(instance, key)
+            if parser is not None and value is not None:
+                value = value.isoformat()
+            row[key] = value
+        return row
+
+    def loads(self, row: Dict[str, Any]) -> Any:
+        columns = self.columns
+        instance = inspect(self.model).class_manager.new_instance()
+        for key, value in row.items():
+            parser = columns.get(key)
+            if parser is not None and value is not None:
+                value = parser(value)
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+        return instance
+
+class _CachedLookup:
+    """
+    Read-through cache around a `lookup(db, value)` CRUD function.
+
+    Entries carry the time the lookup took (delta) and their expiry; a read
+    recomputes early with probability growing towards the expiry (XFetch,
+    Vattani et al.), so a hot key is refreshed by one caller before it
+    expires instead of by every caller at once after.
+    Misses (None) are not cached. Redis errors fall back to the database.
+    """
+    def __init__(self, func: Callable, model: type, namespace: str, ttl: Optional[int], exclude: Iterable[str] = ()):
+        self.func = func
+        self.uncached = func
+        self.codec = RowCodec(model, exclude)
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.ttl or settings.CACHE["TTL_SECONDS"]
+
+    @staticmethod
+    def lookup_value(args: tuple, kwargs: Dict[str, Any]) -> Any:
+        return args[0] if args else next(iter(kwargs.values()))
+
+    def decode(self, raw: Optional[str]) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        beta = settings.CACHE["EARLY_REFRESH_BETA"]
+        # -log(u) with u in (0, 1] is an exponential sample
+        if time.time() - entry["delta"] * beta * math.log(1.0 - random.random()) >= entry["expiry"]:
+            CACHE_REQUESTS.inc(self.namespace, "refresh")
+            return None
+        return entry
+
+    def encode(self, instance: Any, delta: float) -> str:
+        return json.dumps({
+            "row": self.codec.dumps(instance),
+            "delta": delta,
+            "expiry": time.time() + self.ttl_seconds
+        })
+
+    def error(self, action: str, e: Exception):
+        CACHE_REQUESTS.inc(self.namespace, "error")
+        logger.error(f"Cache {action} error ({self.namespace}): {str(e)}")
+
+class CachedLookup(_CachedLookup):
+    def __call__(self, db, *args, **kwargs):
+        if not settings.CACHE["ENABLED"]:
+            return self.func(db, *args, **kwargs)
+        key = cache_key(self.namespace, self.lookup_value(args, kwargs))
+        client = get_sync_redis(settings.CACHE["DATABASE"])
+        try:
+            entry = self.decode(client.get(key))
+        except (redis.RedisError, ValueError) as e:
+            self.error("read", e)
+            entry = None
+        if entry is not None:
+            CACHE_REQUESTS.inc(self.namespace, "hit")
+            return db.merge(self.codec.loads(entry["row"]), load=False)
+
+        CACHE_REQUESTS.inc(self.namespace, "miss")
+        start = time.perf_counter()
+        instance = self.func(db, *args, **kwargs)
+        if instance is not None:
+            try:
+                client.set(key, self.encode(instance, time.perf_counter() - start), ex=self.ttl_seconds)
+            except redis.RedisError as e:
+                self.error("write", e)
+        return instance
+
+class AsyncCachedLookup(_CachedLookup):
+    async def __call__(self, db, *args, **kwargs):
+        if not settings.CACHE["ENABLED"]:
+            return await self.func(db, *args, **kwargs)
+        key = cache_key(self.namespace, self.lookup_value(args, kwargs))
+        client = get_async_redis(settings.CACHE["DATABASE"])
+        try:
+            entry = self.decode(await client.get(key))
+        except (redis.RedisError, ValueError) as e:
+            self.error("read", e)
+            entry = None
+        if entry is not None:
+            CACHE_REQUESTS.inc(self.namespace, "hit")
+            return await db.merge(self.codec.loads(entry["row"]), load=False)
+
+        CACHE_REQUESTS.inc(self.namespace, "miss")
+        start = time.perf_counter()
+        instance = await self.func(db, *args, **kwargs)
+        if instance is not None:
+            try:
+                await client.set(key, self.encode(instance, time.perf_counter() - start), ex=self.ttl_seconds)
+            except redis.RedisError as e:
+                self.error("write", e)
+        return instance
+
+def cached_lookup(model: type, namespace: str, ttl: Optional[int] = None, exclude: Iterable[str] = ()):
+    """
+    Cache the rows returned by a single-value CRUD lookup in Redis.
+    Works on sync (Session) and async (AsyncSession) functions; the original
+    stays reachable as `.uncached` for read-modify-write paths and for
+    reading `exclude`d columns (password hashes and other secrets never
+    go to Redis).
+    Usage:
+        @cached_lookup(User, "user:id", exclude=("u_password",))
+        def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+            ...
+    Writers must call invalidate("user:id", user_id) after committing.
+    """
+    def decorator(func: Callable):
+        cls = AsyncCachedLookup if asyncio.iscoroutinefunction(func) else CachedLookup
+        return functools.wraps(func)(cls(func, model, namespace, ttl, exclude))
+    return decorator
+
+def invalidate(namespace: str, *values: Any):
+    """
+    Drop cached rows after a write (sync)
+    """
+    if not settings.CACHE["ENABLED"] or not values:
+        return
+    try:
+        get_sync_redis(settings.CACHE["DATABASE"]).delete(*(cache_key(namespace, value) for value in values))
+    except redis.RedisError as e:
+        logger.error(f"Cache invalidate error ({namespace}): {str(e)}")
+
+async def invalidate_async(namespace: str, *values: Any):
+    """
+    Drop cached rows after a write (async)
+    """
+    if not settings.CACHE["ENABLED"] or not values:
+        return
+    try:
+        await get_async_redis(settings.CACHE["DATABASE"]).delete(*(cache_key(namespace, value) for value in values))
+    except redis.RedisError as e:
+        logger.error(f"Cache invalidate error ({namespace}): {str(e)}")
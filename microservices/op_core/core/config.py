@@ -1,8 +1,15 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 import os
 from urllib.parse import quote_plus
 from enum import IntEnum
 
+def int_env_overrides(**env_names: str) -> Dict[str, int]:
+    """
+    {key: int(os.environ[name])} for the environment variables that are set,
+    so unset ones fall through to the defaults they override
+    """
+    return {key: int(os.environ[name]) for key, name in env_names.items() if os.getenv(name)}
+
   
 class Settings:
     """
@@ -12,15 +19,28 @@ class Settings:
         # Common settings
         self.ENV = "development"
         self.DEBUG = True
-        self.SQL_DEBUG = False
+        # Per-statement SQL log lines and parameters in request logs
+        self.SQL_DEBUG = os.getenv('SQL_DEBUG', 'false').lower() == 'true'
         
+        # Name of the running service (key of SERVICES), set per container
+        self.SERVICE_NAME = os.getenv('SERVICE_NAME', '')
+
         # Service configurations
         self.SERVICES = {
             "users": {
                 "name": "Users Service",
                 "version": "1.0.0",
                 "api_prefix": "/api/v1",
-                "port": 8000
+                "port": 8000,
+                # Where other services reach it (op_core.rest clients)
+                "base_url": os.getenv('USERS_SERVICE_URL', 'http://host.docker.internal:8000'),
+                # Replicas balanced by op_core.rest.discovery (comma-separated USERS_SERVICE_URLS), default: base_url
+                "instances": os.getenv('USERS_SERVICE_URLS', ''),
+                # Over DATABASE_POOL, only where USERS_DB_* is set
+                "database_pool": int_env_overrides(
+                    POOL_SIZE='USERS_DB_POOL_SIZE',
+                    MAX_OVERFLOW='USERS_DB_MAX_OVERFLOW'
+                )
             },
             "employee": {
                 "name": "Employee Service",
@@ -32,10 +52,75 @@ class Settings:
                 "name": "Customers Service",
                 "version": "1.0.0",
                 "api_prefix": "/api/v1",
-                "port": 8002
+                "port": 8002,
+                # Over DATABASE_POOL, only where CUSTOMERS_DB_* is set
+                "database_pool": int_env_overrides(
+                    POOL_SIZE='CUSTOMERS_DB_POOL_SIZE',
+                    MAX_OVERFLOW='CUSTOMERS_DB_MAX_OVERFLOW'
+                )
             }
         }
 
+        # Outbound HTTP: one pooled httpx.AsyncClient per upstream service (op_core/rest/http.py).
+        # Services override them with SERVICES[<upstream>]["http_client"].
+        self.HTTP_CLIENT = {
+            # Needs the h2 package (pip install httpx[http2]), falls back to HTTP/1.1 without it
+            'HTTP2': os.getenv('HTTP_CLIENT_HTTP2', 'false').lower() == 'true',
+            'MAX_CONNECTIONS': int(os.getenv('HTTP_CLIENT_MAX_CONNECTIONS', 100)),
+            'MAX_KEEPALIVE_CONNECTIONS': int(os.getenv('HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS', 20)),
+            'KEEPALIVE_EXPIRY': float(os.getenv('HTTP_CLIENT_KEEPALIVE_EXPIRY', 30)),
+            'CONNECT_TIMEOUT': float(os.getenv('HTTP_CLIENT_CONNECT_TIMEOUT', 5)),
+            'READ_TIMEOUT': float(os.getenv('HTTP_CLIENT_READ_TIMEOUT', 30)),
+            'WRITE_TIMEOUT': float(os.getenv('HTTP_CLIENT_WRITE_TIMEOUT', 30)),
+            # Max wait for a free connection from the pool
+            'POOL_TIMEOUT': float(os.getenv('HTTP_CLIENT_POOL_TIMEOUT', 5))
+        }
+
+        # Inter-service call resilience (op_core/rest/resilience.py)
+        self.RESILIENCE = {
+            # Jittered exponential backoff; non-idempotent calls only retry connect failures
+            'RETRY_ATTEMPTS': int(os.getenv('RETRY_ATTEMPTS', 3)),
+            'RETRY_BASE_DELAY_MS': int(os.getenv('RETRY_BASE_DELAY_MS', 50)),
+            'RETRY_MAX_DELAY_MS': int(os.getenv('RETRY_MAX_DELAY_MS', 1000)),
+            # Per-endpoint circuit breaker: open after N consecutive failures, probe after the reset time
+            'BREAKER_FAILURE_THRESHOLD': int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5)),
+            'BREAKER_RESET_SECONDS': float(os.getenv('BREAKER_RESET_SECONDS', 10)),
+            'BREAKER_HALF_OPEN_PROBES': int(os.getenv('BREAKER_HALF_OPEN_PROBES', 1)),
+            # Time budget of a request without an incoming deadline header, and the header itself
+            'DEFAULT_DEADLINE_MS': int(os.getenv('DEFAULT_DEADLINE_MS', 10000)),
+            'DEADLINE_HEADER': 'X-Request-Timeout-Ms',
+            # Send a second copy of hedged (idempotent) calls after this delay; 0 disables hedging
+            'HEDGE_DELAY_MS': int(os.getenv('HEDGE_DELAY_MS', 0))
+        }
+
+        # Client-side load balancing over service instances (op_core/rest/discovery.py):
+        # instances are ejected after N failed /health checks or connect errors in a row
+        self.DISCOVERY = {
+            'HEALTH_PATH': os.getenv('DISCOVERY_HEALTH_PATH', '/health'),
+            'HEALTH_INTERVAL_SECONDS': float(os.getenv('DISCOVERY_HEALTH_INTERVAL_SECONDS', 5)),
+            'HEALTH_TIMEOUT_SECONDS': float(os.getenv('DISCOVERY_HEALTH_TIMEOUT_SECONDS', 1)),
+            'UNHEALTHY_THRESHOLD': int(os.getenv('DISCOVERY_UNHEALTHY_THRESHOLD', 2))
+        }
+
+        # Client-side cache of upstream GET responses (op_core/rest/response_cache.py): fresh for
+        # the response's max-age, then kept RETENTION_SECONDS for ETag / If-None-Match revalidation
+        self.HTTP_CACHE = {
+            'ENABLED': os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true',
+            'MAX_ENTRIES': int(os.getenv('HTTP_CACHE_MAX_ENTRIES', 10000)),
+            'RETENTION_SECONDS': int(os.getenv('HTTP_CACHE_RETENTION_SECONDS', 300)),
+            # Share entries between workers through the cache Redis DB (L2 behind the in-process LRU)
+            'REDIS': os.getenv('HTTP_CACHE_REDIS', 'false').lower() == 'true',
+            # Cache-Control max-age of the users service's user responses
+            'MAX_AGE_SECONDS': int(os.getenv('HTTP_CACHE_MAX_AGE_SECONDS', 5))
+        }
+
+        # Batched user lookups (POST users:batchGet): distinct ids per request, and how long
+        # UserClient.get_user waits to coalesce concurrent calls (0: same event loop tick)
+        self.BATCH_GET = {
+            'MAX_IDS': int(os.getenv('BATCH_GET_MAX_IDS', 100)),
+            'COALESCE_DELAY_MS': float(os.getenv('BATCH_GET_COALESCE_DELAY_MS', 0))
+        }
+
         # Database settings
         # AVNS
         # _lAfoL7_
@@ -50,6 +135,28 @@ class Settings:
             "database": os.getenv('MYSQL_DATABASE', 'defaultdb')
         }
 
+        # Read replicas: comma separated SQLAlchemy URLs (same form as DATABASE_URL).
+        # A replica failing at connection level is skipped for EJECT_SECONDS.
+        self.DATABASE_REPLICAS = {
+            'URLS': [url.strip() for url in os.getenv('MYSQL_REPLICA_URLS', '').split(',') if url.strip()],
+            'EJECT_SECONDS': int(os.getenv('MYSQL_REPLICA_EJECT_SECONDS', 30))
+        }
+
+        # Connection pool defaults. Each worker process opens up to
+        # POOL_SIZE + MAX_OVERFLOW connections per engine (sync and async), so size
+        # them against the MySQL connection limit / number of uvicorn workers.
+        # Services override them with SERVICES[<SERVICE_NAME>]["database_pool"].
+        self.DATABASE_POOL = {
+            'POOL_SIZE': int(os.getenv('DB_POOL_SIZE', 5)),
+            'MAX_OVERFLOW': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+            'POOL_RECYCLE': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            # "pre_ping": SELECT 1 on every checkout (pool_pre_ping)
+            # "background": ping idle connections every LIVENESS_INTERVAL_SECONDS instead
+            'LIVENESS': os.getenv('DB_POOL_LIVENESS', 'pre_ping'),
+            'LIVENESS_INTERVAL_SECONDS': int(os.getenv('DB_POOL_LIVENESS_INTERVAL_SECONDS', 30))
+        }
+
 
 
         # Redis Configuration
@@ -58,6 +165,12 @@ class Settings:
             "port": int(os.getenv('REDIS_PORT', 6379)),
             "password": os.getenv('REDIS_PASSWORD', '123456789'),
             "default_db": 0,
+            # Connection pool shared by every client on the same logical DB
+            "max_connections": int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+            "socket_timeout": float(os.getenv('REDIS_SOCKET_TIMEOUT', 5)),
+            "socket_connect_timeout": float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 5)),
+            # PING connections idle for longer than this (seconds) before reuse
+            "health_check_interval": int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
             "databases": {
                 "rate_limit": 0,
                 "cache": 1,
@@ -73,7 +186,109 @@ class Settings:
             'REDIS_PASSWORD': self.REDIS_CONFIG['password'],
             'RATE_LIMIT_WINDOW': int(os.getenv('RATE_LIMIT_WINDOW', 60)),
             'MAX_REQUESTS': int(os.getenv('MAX_REQUESTS', 100)),
-            'REQUEST_COOLDOWN': int(os.getenv('REQUEST_COOLDOWN', 5))
+            'REQUEST_COOLDOWN': int(os.getenv('REQUEST_COOLDOWN', 5)),
+            # fixed_window | sliding_window_log | sliding_window_counter | gcra
+            'STRATEGY': os.getenv('RATE_LIMIT_STRATEGY', 'sliding_window_counter'),
+            # Per-route overrides keyed by path prefix (longest prefix wins), e.g.
+            # "/api/v1/user/login": {"strategy": "gcra", "max_requests": 10, "window": 60}
+            # "cooldown" opts a route into duplicate-request blocking: True uses
+            # REQUEST_COOLDOWN, an int sets the seconds. Other routes never read the body.
+            'ROUTES': {
+                "/api/v1/user/register": {"cooldown": True},
+                "/api/v1/customers/register": {"cooldown": True}
+            },
+            # Bytes of request body hashed for the duplicate-request fingerprint
+            'FINGERPRINT_BYTES': int(os.getenv('RATE_LIMIT_FINGERPRINT_BYTES', 8192)),
+            # Two-tier limiting: per-worker token buckets synced to Redis in batches.
+            # Routes can opt in/out with "local": True/False; local routes always
+            # count with a fixed window, whatever their strategy.
+            'LOCAL': {
+                'ENABLED': os.getenv('RATE_LIMIT_LOCAL', 'false').lower() == 'true',
+                'SYNC_INTERVAL_MS': int(os.getenv('RATE_LIMIT_LOCAL_SYNC_MS', 200)),
+                'MAX_KEYS': int(os.getenv('RATE_LIMIT_LOCAL_MAX_KEYS', 10000))
+            }
+        }
+
+        # Request log settings (LoggingMiddleware -> background writer)
+        self.REQUEST_LOG = {
+            'QUEUE_SIZE': int(os.getenv('REQUEST_LOG_QUEUE_SIZE', 10000)),
+            'BATCH_SIZE': int(os.getenv('REQUEST_LOG_BATCH_SIZE', 200)),
+            'FLUSH_INTERVAL_MS': int(os.getenv('REQUEST_LOG_FLUSH_INTERVAL_MS', 1000)),
+            # Bytes of request/response body kept per log entry; responses also get size + hash
+            'CAPTURE_BYTES': int(os.getenv('REQUEST_LOG_CAPTURE_BYTES', 4096)),
+            'HASH_RESPONSE': os.getenv('REQUEST_LOG_HASH_RESPONSE', 'true').lower() == 'true',
+            # Which requests are persisted, per path prefix (longest prefix wins; "" is the default).
+            # 5xx and requests slower than "slow_ms" are always kept, the rest is sampled per
+            # status class. Routes may also override "capture_bytes", "max_sql_queries" and
+            # "redact" (field names masked in bodies), or set "skip": True to never log.
+            'POLICIES': {
+                "": {
+                    "sample_rates": {
+                        "2xx": float(os.getenv('REQUEST_LOG_SAMPLE_2XX', 0.01)),
+                        "3xx": float(os.getenv('REQUEST_LOG_SAMPLE_3XX', 0.01)),
+                        "4xx": float(os.getenv('REQUEST_LOG_SAMPLE_4XX', 1.0))
+                    },
+                    "slow_ms": int(os.getenv('REQUEST_LOG_SLOW_MS', 1000)),
+                    "max_sql_queries": int(os.getenv('REQUEST_LOG_MAX_SQL_QUERIES', 50))
+                },
+                "/health": {"skip": True},
+                "/metrics": {"skip": True}
+            }
+        }
+
+        # Log retention (one leader-elected job across all workers)
+        self.LOG_RETENTION = {
+            'ENABLED': os.getenv('LOG_RETENTION_ENABLED', 'true').lower() == 'true',
+            'MAX_AGE_MINUTES': int(os.getenv('LOG_RETENTION_MAX_AGE_MINUTES', 30)),
+            'INTERVAL_SECONDS': int(os.getenv('LOG_RETENTION_INTERVAL_SECONDS', 60)),
+            'CHUNK_SIZE': int(os.getenv('LOG_RETENTION_CHUNK_SIZE', 1000))
+        }
+
+        # Per-request SQL analysis built on the SQL capture
+        self.DIAGNOSTICS = {
+            # Same statement fingerprint executed this many times in one request (N+1)
+            'REPEATED_QUERY_THRESHOLD': int(os.getenv('DIAGNOSTICS_REPEATED_QUERY_THRESHOLD', 2)),
+            # Single statement latency budget
+            'SLOW_QUERY_MS': int(os.getenv('DIAGNOSTICS_SLOW_QUERY_MS', 100)),
+            # Share of wall time spent in the database, for requests of at least MIN_WALL_MS
+            'DB_TIME_SHARE': float(os.getenv('DIAGNOSTICS_DB_TIME_SHARE', 0.5)),
+            'MIN_WALL_MS': int(os.getenv('DIAGNOSTICS_MIN_WALL_MS', 20)),
+            # Server-Timing response header, on by default in development only
+            'SERVER_TIMING': os.getenv('DIAGNOSTICS_SERVER_TIMING', str(self.ENV == 'development')).lower() == 'true',
+            # Fingerprints kept by the hot query report
+            'MAX_FINGERPRINTS': int(os.getenv('DIAGNOSTICS_MAX_FINGERPRINTS', 1000)),
+            # /diagnostics endpoints (hot queries, pool config): off unless enabled,
+            # and when TOKEN is set only served with a matching X-Diagnostics-Token header
+            'ENDPOINTS': os.getenv('DIAGNOSTICS_ENDPOINTS', 'false').lower() == 'true',
+            'TOKEN': os.getenv('DIAGNOSTICS_TOKEN', '')
+        }
+
+        # In-process metrics served at /metrics. With MULTIPROC_DIR set, every worker
+        # dumps a snapshot there and a scrape of any worker merges them all
+        # (clear the directory when the service restarts).
+        self.METRICS = {
+            'ENABLED': os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+            'MULTIPROC_DIR': os.getenv('METRICS_MULTIPROC_DIR', ''),
+            'SNAPSHOT_INTERVAL_SECONDS': float(os.getenv('METRICS_SNAPSHOT_INTERVAL_SECONDS', 5))
+        }
+
+        # Read-through cache of ORM rows (Redis database "cache"), see core/cache.py
+        self.CACHE = {
+            'ENABLED': os.getenv('CACHE_ENABLED', 'true').lower() == 'true',
+            'DATABASE': 'cache',
+            # Bump the version when cached models change shape
+            'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'cache:v1'),
+            'TTL_SECONDS': int(os.getenv('CACHE_TTL_SECONDS', 300)),
+            # Probabilistic early refresh (XFetch): > 1 refreshes earlier, 0 disables it
+            'EARLY_REFRESH_BETA': float(os.getenv('CACHE_EARLY_REFRESH_BETA', 1.0))
+        }
+
+        # Per-worker L1 cache invalidated over Redis pub/sub, see core/local_cache.py
+        self.LOCAL_CACHE = {
+            'ENABLED': os.getenv('LOCAL_CACHE_ENABLED', 'true').lower() == 'true',
+            'MAX_ENTRIES': int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 10000)),
+            'TTL_SECONDS': float(os.getenv('LOCAL_CACHE_TTL_SECONDS', 30)),
+            'CHANNEL': os.getenv('LOCAL_CACHE_CHANNEL', 'cache:invalidate')
         }
 
         # JWT settings
@@ -84,6 +299,17 @@ class Settings:
             "REFRESH_TOKEN_EXPIRE_DAYS": 7
         }
 
+        # Password hashing (bcrypt) runs off the event loop on a bounded pool
+        self.PASSWORD_HASHING = {
+            # Raising the rounds rehashes stored passwords on the next login
+            'BCRYPT_ROUNDS': int(os.getenv('BCRYPT_ROUNDS', 12)),
+            # thread (bcrypt releases the GIL) | process
+            'EXECUTOR': os.getenv('PASSWORD_HASHING_EXECUTOR', 'thread'),
+            'WORKERS': int(os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1)),
+            # Hashes queued or running per worker process before new ones are rejected (503)
+            'MAX_PENDING': int(os.getenv('PASSWORD_HASHING_MAX_PENDING', 64))
+        }
+
         # CORS Settings
         self.CORS = {
             'ALLOW_ORIGINS': ["*"],  # Allow all origins in development
@@ -113,4 +339,37 @@ class Settings:
             f"{self.DATABASE_CONFIG['database']}?ssl=true"
         )
 
+    def database_pool(self, service: str = None) -> Dict[str, Any]:
+        """
+        Pool settings of a service (SERVICE_NAME by default) over DATABASE_POOL
+        """
+        service = service or self.SERVICE_NAME
+        overrides = self.SERVICES.get(service, {}).get("database_pool", {})
+        return {**self.DATABASE_POOL, **overrides}
+
+    def http_client(self, service: str) -> Dict[str, Any]:
+        """
+        Outbound HTTP client settings for an upstream service over HTTP_CLIENT
+        """
+        overrides = self.SERVICES.get(service, {}).get("http_client", {})
+        return {**self.HTTP_CLIENT, **overrides}
+
+    def service_instances(self, service: str) -> List[str]:
+        """
+        Base URLs of the instances of an upstream service ("instances", else "base_url")
+        """
+        config = self.SERVICES[service]
+        instances = [url.strip().rstrip('/') for url in config.get("instances", "").split(",") if url.strip()]
+        return instances or [config["base_url"].rstrip('/')]
+
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        # TLS is configured through connect_args (an SSLContext) for aiomysql
+        password = quote_plus(self.DATABASE_CONFIG["password"])
+        return (
+            f"mysql+aiomysql://{self.DATABASE_CONFIG['user']}:{password}@"
+            f"{self.DATABASE_CONFIG['host']}:{self.DATABASE_CONFIG['port']}/"
+            f"{self.DATABASE_CONFIG['database']}"
+        )
+
 settings = Settings()
\ No newline at end of file
@@ -1,18 +1,53 @@
+import ssl
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.requests import Request
 from .config import settings
+from .metrics import DB_POOL_CHECKOUT_WAIT, registry as metrics_registry
+from .pool_monitor import instrument_pool, pool_stats
+from .routing import ReplicaSet, RoutingSession, request_pin
+
+class _CheckoutTimingMixin:
+    """Records how long each pool checkout waits for a connection"""
+    metrics_pool = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, self.metrics_pool)
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    metrics_pool = "primary"
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    metrics_pool = "primary_async"
+
+def _ssl_context() -> ssl.SSLContext:
+    """
+    TLS without certificate verification, same as the pymysql engine's ssl_mode REQUIRED
+    """
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+pool_config = settings.database_pool()
 
 # Create MySQL engine with connection pooling
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_size=5,  # Maximum number of connections in the pool
-    max_overflow=10,  # Maximum number of connections that can be created beyond pool_size
-    pool_timeout=30,  # Timeout in seconds for getting a connection from the pool
-    pool_recycle=1800,  # Recycle connections after 30 minutes
-    pool_pre_ping=True,  # Enable connection health checks
-    poolclass=QueuePool,
+    pool_size=pool_config["POOL_SIZE"],  # Maximum number of connections in the pool
+    max_overflow=pool_config["MAX_OVERFLOW"],  # Maximum number of connections that can be created beyond pool_size
+    pool_timeout=pool_config["POOL_TIMEOUT"],  # Timeout in seconds for getting a connection from the pool
+    pool_recycle=pool_config["POOL_RECYCLE"],  # Recycle connections
+    pool_pre_ping=pool_config["LIVENESS"] == "pre_ping",  # Health check on every checkout
+    poolclass=InstrumentedQueuePool,
     echo=settings.DEBUG,  # Enable SQL query logging if debug mode is on
     connect_args={
         "ssl": {
@@ -21,22 +56,118 @@ engine = create_engine(
     }
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async engine (aiomysql) for async endpoints, same pool settings as the sync one
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=pool_config["POOL_SIZE"],
+    max_overflow=pool_config["MAX_OVERFLOW"],
+    pool_timeout=pool_config["POOL_TIMEOUT"],
+    pool_recycle=pool_config["POOL_RECYCLE"],
+    pool_pre_ping=pool_config["LIVENESS"] == "pre_ping",
+    poolclass=InstrumentedAsyncQueuePool,
+    echo=settings.DEBUG,
+    connect_args={
+        "ssl": _ssl_context()
+    }
+)
+
+# Read replicas, same pool settings as the primary
+replica_engines = [
+    create_engine(
+        url,
+        pool_size=pool_config["POOL_SIZE"],
+        max_overflow=pool_config["MAX_OVERFLOW"],
+        pool_timeout=pool_config["POOL_TIMEOUT"],
+        pool_recycle=pool_config["POOL_RECYCLE"],
+        pool_pre_ping=pool_config["LIVENESS"] == "pre_ping",
+        poolclass=InstrumentedQueuePool,
+        echo=settings.DEBUG,
+        connect_args={
+            "ssl": {
+                "ssl_mode": "REQUIRED"
+            }
+        }
+    )
+    for url in settings.DATABASE_REPLICAS["URLS"]
+]
+replicas = ReplicaSet(replica_engines, eject_seconds=settings.DATABASE_REPLICAS["EJECT_SECONDS"])
+
+# Pool telemetry and (optionally) background liveness checks
+ENGINES = {"primary": engine, "primary_async": async_engine}
+for _index, _engine in enumerate(replica_engines):
+    _engine.pool.metrics_pool = f"replica_{_index}"
+    ENGINES[f"replica_{_index}"] = _engine
+for _name, _engine in ENGINES.items():
+    instrument_pool(_engine, _name, pool_config["LIVENESS"], pool_config["LIVENESS_INTERVAL_SECONDS"])
+
+def _pool_gauges():
+    values = {}
+    for name, pool_engine in ENGINES.items():
+        for state, value in pool_stats(pool_engine).items():
+            values[(name, state)] = value
+    return values
+
+metrics_registry.gauge(
+    "db_pool_connections",
+    "Connections of each SQLAlchemy pool by state (size, checked_in, checked_out, overflow)",
+    ("pool", "state"),
+    collect=_pool_gauges
+)
+
+# Create session factory; sessions route reads to replicas when asked to (see RoutingSession)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession, replicas=replicas)
+
+# Objects stay usable after commit: lazy refreshes cannot run implicitly on an AsyncSession.
+# Async sessions always use the primary; RoutingSession only records their writes in the request's pin.
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Create base class for models
 Base = declarative_base()
 
-def get_db():
+def get_db(request: Request = None):
     """
     Get database session with automatic closing.
+    Its writes pin the request's other sessions to the primary (see RoutingSession).
     Usage:
         @app.get("/users")
         def get_users(db: Session = Depends(get_db)):
             ...
     """
-    db = SessionLocal()
+    db = SessionLocal(pin=request_pin(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db(request: Request = None):
+    """
+    Get database session for read endpoints: queries go to a read replica
+    (round-robin) until the request writes through any of its sessions, then to the primary.
+    Usage:
+        @app.get("/users")
+        def list_users(db: Session = Depends(get_read_db)):
+            ...
+    """
+    db = SessionLocal(prefer_replica=True, pin=request_pin(request))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db(request: Request = None):
+    """
+    Get async database session with automatic closing.
+    Its writes pin the request's other sessions to the primary (see RoutingSession).
+    Usage:
+        @app.get("/users")
+        async def get_users(db: AsyncSession = Depends(get_async_db)):
+            ...
+    """
+    async with AsyncSessionLocal(pin=request_pin(request)) as db:
+        yield db
@@ -0,0 +1,27 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+# Monotonic time by which the current request must be answered (set by DeadlineMiddleware)
+request_deadline_var: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# True when the deadline was shortened by the caller's header rather than the service's own budget
+deadline_from_caller_var: ContextVar[bool] = ContextVar("deadline_from_caller", default=False)
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before an upstream call could complete"""
+
+def remaining_seconds() -> Optional[float]:
+    """
+    Time left for the current request, None outside a request with a deadline
+    """
+    deadline = request_deadline_var.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def deadline_from_caller() -> bool:
+    """
+    Whether the current deadline is client-controlled. Running out of such a
+    budget says nothing about the upstream (see Resilience circuit breaking).
+    """
+    return deadline_from_caller_var.get()
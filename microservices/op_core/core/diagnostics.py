@@ -0,0 +1,200 @@
+import hmac
+import threading
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from .config import settings
+from .sql_capture import RequestQueries, fingerprint_sql
+from .database import ENGINES, pool_config, replicas
+from .pool_monitor import pool_stats
+
+class QueryReport:
+    """Findings of the SQL analysis of one request"""
+    __slots__ = ("query_count", "db_ns", "wall_ns", "repeated", "slow", "db_heavy")
+
+    def __init__(self, query_count: int, db_ns: int, wall_ns: int, repeated: List[int], slow: List[int], db_heavy: bool):
+        self.query_count = query_count
+        self.db_ns = db_ns
+        self.wall_ns = wall_ns
+        # Fingerprint ids executed more than once (N+1) / over the latency budget
+        self.repeated = repeated
+        self.slow = slow
+        self.db_heavy = db_heavy
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.repeated or self.slow or self.db_heavy)
+
+    def describe(self) -> str:
+        issues = []
+        for fid in self.repeated:
+            issues.append(f"repeated query #{fid}: {fingerprint_sql(fid)}")
+        for fid in self.slow:
+            issues.append(f"slow query #{fid}: {fingerprint_sql(fid)}")
+        if self.db_heavy:
+            issues.append(f"database time {self.db_ns / 1e6:.1f} ms of {self.wall_ns / 1e6:.1f} ms")
+        return "; ".join(issues)
+
+def analyze_queries(queries: RequestQueries, wall_seconds: float, config: Dict[str, Any] = None) -> QueryReport:
+    """
+    Flag N+1 patterns, slow statements and database-bound requests
+    """
+    config = config or settings.DIAGNOSTICS
+    slow_ns = config["SLOW_QUERY_MS"] * 1_000_000
+    repeated = []
+    slow = []
+    query_count = 0
+    db_ns = 0
+    for fid, stats in queries.stats.items():
+        query_count += stats.count
+        db_ns += stats.total_ns
+        if stats.count >= config["REPEATED_QUERY_THRESHOLD"]:
+            repeated.append(fid)
+        if stats.max_ns > slow_ns:
+            slow.append(fid)
+    wall_ns = int(wall_seconds * 1e9)
+    db_heavy = (
+        wall_ns >= config["MIN_WALL_MS"] * 1_000_000
+        and db_ns > wall_ns * config["DB_TIME_SHARE"]
+    )
+    return QueryReport(query_count, db_ns, wall_ns, repeated, slow, db_heavy)
+
+# Findings of each kind listed in the Server-Timing header, to keep it short
+_MAX_TIMING_FINDINGS = 5
+
+def server_timing(queries: RequestQueries, elapsed_seconds: float) -> str:
+    """
+    Server-Timing header value for the work done so far, with the findings of
+    analyze_queries: n-plus-one / slow-query entries name the fingerprint id
+    (see /diagnostics/hot-queries), db-heavy marks a database-bound request
+    """
+    entries = [
+        f'db;dur={queries.total_ns / 1e6:.2f};desc="{queries.count} queries"',
+        f'app;dur={elapsed_seconds * 1000:.2f}'
+    ]
+    report = analyze_queries(queries, elapsed_seconds)
+    for fid in report.repeated[:_MAX_TIMING_FINDINGS]:
+        entries.append(f'n-plus-one;desc="#{fid} x{queries.stats[fid].count}"')
+    for fid in report.slow[:_MAX_TIMING_FINDINGS]:
+        entries.append(f'slow-query;dur={queries.stats[fid].max_ns / 1e6:.2f};desc="#{fid}"')
+    if report.db_heavy:
+        entries.append("db-heavy")
+    return ", ".join(entries)
+
+class _HotQuery:
+    __slots__ = ("count", "total_ns", "max_ns", "requests", "repeated", "slow", "routes")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.requests = 0
+        self.repeated = 0
+        self.slow = 0
+        self.routes = set()
+
+class HotQueryRegistry:
+    """
+    Process-wide aggregate of per-request SQL stats, per fingerprint.
+    Fingerprints beyond `max_fingerprints` are not tracked.
+    """
+    ORDER_BY = ("total", "count", "max", "repeated", "slow")
+
+    def __init__(self, max_fingerprints: int):
+        self.max_fingerprints = max_fingerprints
+        self.entries: Dict[int, _HotQuery] = {}
+        self.flagged_requests = 0
+        self._lock = threading.Lock()
+
+    def record(self, queries: RequestQueries, report: QueryReport, route: str):
+        if not queries.stats:
+            return
+        with self._lock:
+            if report.flagged:
+                self.flagged_requests += 1
+            for fid, stats in queries.stats.items():
+                entry = self.entries.get(fid)
+                if entry is None:
+                    if len(self.entries) >= self.max_fingerprints:
+                        continue
+                    entry = self.entries[fid] = _HotQuery()
+                entry.count += stats.count
+                entry.total_ns += stats.total_ns
+                entry.max_ns = max(entry.max_ns, stats.max_ns)
+                entry.requests += 1
+                if len(entry.routes) < 20:
+                    entry.routes.add(route)
+            for fid in report.repeated:
+                if fid in self.entries:
+                    self.entries[fid].repeated += 1
+            for fid in report.slow:
+                if fid in self.entries:
+                    self.entries[fid].slow += 1
+
+    def top(self, limit: int = 20, order_by: str = "total") -> List[Dict[str, Any]]:
+        attribute = {"total": "total_ns", "max": "max_ns"}.get(order_by, order_by)
+        with self._lock:
+            ordered = sorted(self.entries.items(), key=lambda item: getattr(item[1], attribute), reverse=True)
+            return [
+                {
+                    "fingerprint": fid,
+                    "query": fingerprint_sql(fid),
+                    "count": entry.count,
+                    "requests": entry.requests,
+                    "per_request": round(entry.count / entry.requests, 2),
+                    "total_ms": round(entry.total_ns / 1e6, 3),
+                    "avg_ms": round(entry.total_ns / entry.count / 1e6, 3),
+                    "max_ms": round(entry.max_ns / 1e6, 3),
+                    "repeated_requests": entry.repeated,
+                    "slow_requests": entry.slow,
+                    "routes": sorted(entry.routes)
+                }
+                for fid, entry in ordered[:limit]
+            ]
+
+    def reset(self):
+        with self._lock:
+            self.entries.clear()
+            self.flagged_requests = 0
+
+hot_queries = HotQueryRegistry(settings.DIAGNOSTICS["MAX_FINGERPRINTS"])
+
+def require_diagnostics_token(x_diagnostics_token: str = Header("")):
+    """
+    The endpoints expose SQL and pool configuration: with DIAGNOSTICS['TOKEN']
+    set, callers must send it in X-Diagnostics-Token
+    """
+    token = settings.DIAGNOSTICS["TOKEN"]
+    if token and not hmac.compare_digest(x_diagnostics_token.encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid diagnostics token")
+
+# Mounted only when DIAGNOSTICS['ENDPOINTS'] is on
+router = APIRouter(dependencies=[Depends(require_diagnostics_token)])
+
+@router.get("/hot-queries")
+async def hot_queries_report(
+    limit: int = Query(20, ge=1, le=500),
+    order_by: str = Query("total", enum=list(HotQueryRegistry.ORDER_BY))
+):
+    """
+    Aggregated SQL fingerprints of this worker, most expensive first
+    """
+    return {
+        "flagged_requests": hot_queries.flagged_requests,
+        "queries": hot_queries.top(limit, order_by)
+    }
+
+@router.delete("/hot-queries")
+async def reset_hot_queries():
+    hot_queries.reset()
+    return {"message": "Hot query report reset"}
+
+@router.get("/pool")
+async def pool_report():
+    """
+    Live connection pool usage and replica health of this worker
+    """
+    return {
+        "config": pool_config,
+        "pools": {name: pool_stats(pool_engine) for name, pool_engine in ENGINES.items()},
+        "replicas_healthy": replicas.healthy()
+    }
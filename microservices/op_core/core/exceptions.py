@@ -45,6 +45,26 @@ class NotFoundError(APIError):
             error_code="NOT_FOUND"
         )
 
+class ServiceBusyError(APIError):
+    """Server is at capacity, the client should retry later"""
+    def __init__(self, message: str = "Service is busy, please retry", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message=message,
+            error_code="SERVICE_BUSY",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class RevocationUnavailableError(APIError):
+    """Token revocation could not be recorded, the token is left as it was"""
+    def __init__(self, message: str = "Token revocation is unavailable, please retry", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message=message,
+            error_code="REVOCATION_UNAVAILABLE",
+            headers={"Retry-After": str(retry_after)}
+        )
+
 class DatabaseError(APIError):
     """Database operation errors"""
     def __init__(self, message: str = "Database operation failed"):
@@ -0,0 +1,214 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import redis
+from .config import settings
+from .redis_client import get_sync_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with per-entry TTL (L1, one per worker).
+
+    Entries are only served while the worker is subscribed to the invalidation
+    channel (see InvalidationBus), so a worker that may have missed an
+    invalidation falls back to its caller's L2 / database lookup.
+    """
+    def __init__(self, name: str, max_entries: int, ttl: float, bus: Optional["InvalidationBus"] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bus = bus
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation, see set(since=...)
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if self.bus is not None and not self.bus.ready():
+            self.misses += 1
+            return default
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= time.monotonic():
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, since: Optional[int] = None):
+        """
+        Cache a value for min(ttl, self.ttl) seconds.
+        Pass the `version` read before loading the value as `since`: the value
+        is then dropped if an invalidation arrived while it was being loaded.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if since is not None and since != self.version:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys: Hashable):
+        with self._lock:
+            self.version += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+class InvalidationBus:
+    """
+    Broadcasts L1 invalidations to every worker over Redis pub/sub.
+
+    Publishers drop the keys locally right away and PUBLISH
+    {"cache": name, "keys": [...]}; a listener thread per worker (started
+    lazily on first use) drops them from the other workers' caches.
+    Local caches are cleared on every (re)subscribe, since messages sent
+    while disconnected are lost.
+    """
+    def __init__(self, channel: str, reconnect_seconds: float = 1.0):
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.caches: Dict[str, LocalCache] = {}
+        self._subscribed = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def cache(self, name: str, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> LocalCache:
+        """
+        Get (or create) the local cache registered under `name`
+        """
+        with self._lock:
+            cache = self.caches.get(name)
+            if cache is None:
+                cache = self.caches[name] = LocalCache(
+                    name,
+                    max_entries or settings.LOCAL_CACHE["MAX_ENTRIES"],
+                    ttl or settings.LOCAL_CACHE["TTL_SECONDS"],
+                    bus=self
+                )
+            return cache
+
+    def ready(self) -> bool:
+        if not settings.LOCAL_CACHE["ENABLED"]:
+            return False
+        if self._thread is None:
+            self.start()
+        return self._subscribed.is_set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            pubsub = get_sync_redis(settings.CACHE["DATABASE"]).pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self._clear_all()
+                self._subscribed.set()
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._apply(message["data"])
+            except redis.RedisError as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+            finally:
+                self._subscribed.clear()
+                try:
+                    pubsub.close()
+                except redis.RedisError:
+                    pass
+            self._stop.wait(self.reconnect_seconds)
+
+    def _clear_all(self):
+        for cache in list(self.caches.values()):
+            cache.clear()
+
+    def _apply(self, data: str):
+        try:
+            message = json.loads(data)
+            cache = self.caches.get(message["cache"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid cache invalidation message: {str(e)}")
+            return
+        if cache is not None:
+            cache.discard(*(_key(key) for key in message["keys"]))
+
+    def _message(self, name: str, keys: Tuple[Hashable, ...]) -> str:
+        cache = self.caches.get(name)
+        if cache is not None:
+            cache.discard(*keys)
+        return json.dumps({"cache": name, "keys": list(keys)})
+
+    def publish(self, name: str, *keys: Hashable):
+        """
+        Invalidate keys of a local cache in every worker (sync)
+        """
+        if not settings.LOCAL_CACHE["ENABLED"] or not keys:
+            return
+        try:
+            get_sync_redis(settings.CACHE["DATABASE"]).publish(self.channel, self._message(name, keys))
+        except redis.RedisError as e:
+            logger.error(f"Cache invalidation publish error ({name}): {str(e)}")
+
+    async def publish_async(self, name: str, *keys: Hashable):
+        """
+        Invalidate keys of a local cache in every worker (async)
+        """
+        if not settings.LOCAL_CACHE["ENABLED"] or not keys:
+            return
+        try:
+            await get_async_redis(settings.CACHE["DATABASE"]).publish(self.channel, self._message(name, keys))
+        except redis.RedisError as e:
+            logger.error(f"Cache invalidation publish error ({name}): {str(e)}")
+
+def _key(key: Any) -> Hashable:
+    # JSON turns tuples into lists
+    return tuple(key) if isinstance(key, list) else key
+
+invalidation_bus = InvalidationBus(settings.LOCAL_CACHE["CHANNEL"])
+
+def local_cache(name: str, max_entries: Optional[int] = None, ttl: Optional[float] = None) -> LocalCache:
+    """
+    Per-worker L1 cache kept consistent across workers through invalidation_bus.
+    Usage:
+        user_status = local_cache("user_status", ttl=30)
+        status = user_status.get(user_id)
+        ...
+        invalidation_bus.publish("user_status", user_id)
+    """
+    return invalidation_bus.cache(name, max_entries, ttl)
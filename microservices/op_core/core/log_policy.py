@@ -0,0 +1,95 @@
+import re
+import random
+from typing import Any, Dict, List, Optional, Sequence
+from .logging import SENSITIVE_FIELDS
+
+class LogPolicy:
+    """What gets persisted for one group of routes"""
+    __slots__ = ("name", "skip", "sample_rates", "slow_ms", "capture_bytes", "max_sql_queries", "redact_pattern")
+
+    def __init__(
+        self,
+        name: str,
+        skip: bool = False,
+        sample_rates: Optional[Dict[str, float]] = None,
+        slow_ms: int = 1000,
+        capture_bytes: int = 4096,
+        max_sql_queries: int = 50,
+        redact: Sequence[str] = SENSITIVE_FIELDS
+    ):
+        self.name = name
+        self.skip = skip
+        # Status class ("2xx", "3xx", "4xx") -> fraction kept; 5xx is always kept
+        self.sample_rates = sample_rates or {}
+        self.slow_ms = slow_ms
+        self.capture_bytes = capture_bytes
+        self.max_sql_queries = max_sql_queries
+        self.redact_pattern = build_redact_pattern(redact)
+
+    def should_log(self, status_code: int, process_time: float) -> bool:
+        """
+        Keep every 5xx and slow request, sample the rest by status class
+        """
+        if self.skip:
+            return False
+        if status_code >= 500 or process_time * 1000 >= self.slow_ms:
+            return True
+        rate = self.sample_rates.get(f"{status_code // 100}xx", 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+    def redact(self, body: Optional[str]) -> Optional[str]:
+        """
+        Mask sensitive values in a JSON or form encoded body.
+        Works on truncated prefixes too, since it never parses the whole body.
+        """
+        if not body or self.redact_pattern is None:
+            return body
+        return self.redact_pattern.sub(_mask, body)
+
+def build_redact_pattern(fields: Sequence[str]):
+    """
+    Match `"<key>": <value>` (JSON) and `<key>=<value>` (form) pairs whose key
+    contains one of `fields`, like log_customer_activity does for its details
+    """
+    if not fields:
+        return None
+    names = "|".join(re.escape(field) for field in fields)
+    return re.compile(
+        rf'("[^"]*(?:{names})[^"]*"\s*:\s*)("(?:[^"\\]|\\.)*"?|[^,}}\s]+)'
+        rf'|((?:^|&)[^=&\s"{{}}]*(?:{names})[^=&\s"{{}}]*=)([^&]*)',
+        re.IGNORECASE
+    )
+
+def _mask(match) -> str:
+    if match.group(1) is not None:
+        return f'{match.group(1)}"*****"'
+    return f"{match.group(3)}*****"
+
+class LogPolicies:
+    """Route -> LogPolicy lookup built from settings.REQUEST_LOG"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.policies = build_log_policies(config)
+
+    def policy_for(self, path: str) -> LogPolicy:
+        for prefix, policy in self.policies:
+            if path.startswith(prefix):
+                return policy
+        return self.policies[-1][1]
+
+def build_log_policies(config: Dict[str, Any]) -> List[tuple]:
+    """
+    Build (path_prefix, policy) pairs, longest prefix first.
+    Route entries inherit every setting they do not override from the "" default.
+    """
+    routes = config.get("POLICIES", {})
+    default = {
+        "capture_bytes": config["CAPTURE_BYTES"],
+        "redact": SENSITIVE_FIELDS,
+        **routes.get("", {})
+    }
+    policies = [("", LogPolicy("default", **default))]
+    for prefix, route in routes.items():
+        if prefix:
+            policies.append((prefix, LogPolicy(prefix, **{**default, **route})))
+    return sorted(policies, key=lambda item: len(item[0]), reverse=True)
@@ -0,0 +1,132 @@
+import os
+import uuid
+import socket
+import logging
+import threading
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import engine
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Take or renew the leader lease; only the owner may renew it.
+#   KEYS[1] = lease key, ARGV[1] = instance id, ARGV[2] = lease (ms)
+LEADER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+def clean_old_logs(db: Session, minutes: int = 30, chunk_size: int = 1000) -> int:
+    """
+    Delete logs older than specified minutes.
+
+    Finds the newest expired id through idx_created_at, then deletes by primary
+    key range in chunks of `chunk_size` so no single statement holds locks for long.
+    """
+    try:
+        newest_expired = db.execute(text("""
+            SELECT id FROM logs
+            WHERE created_at < NOW() - INTERVAL :minutes MINUTE
+            ORDER BY created_at DESC
+            LIMIT 1
+        """), {"minutes": minutes}).scalar()
+        db.commit()
+        if newest_expired is None:
+            return 0
+
+        deleted_count = 0
+        while True:
+            result = db.execute(text("""
+                DELETE FROM logs
+                WHERE id <= :max_id
+                ORDER BY id
+                LIMIT :chunk_size
+            """), {"max_id": newest_expired, "chunk_size": chunk_size})
+            db.commit()
+            deleted_count += result.rowcount
+            if result.rowcount < chunk_size:
+                break
+
+        if deleted_count > 0:
+            logger.info(f"Cleaned {deleted_count} old logs (older than {minutes} minutes)")
+        return deleted_count
+
+    except Exception as e:
+        logger.error(f"Error cleaning old logs: {str(e)}")
+        db.rollback()
+        return 0
+
+class LogRetentionJob:
+    """
+    Periodic log retention.
+
+    Every worker runs the timer, but a Redis lease makes sure only one of them
+    (the leader) deletes old logs per interval.
+    """
+    LEASE_KEY = "log_retention:leader"
+
+    def __init__(self, engine, redis_client, interval_seconds: int, max_age_minutes: int, chunk_size: int):
+        self.engine = engine
+        self.interval = interval_seconds
+        self.max_age_minutes = max_age_minutes
+        self.chunk_size = chunk_size
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader_script = redis_client.register_script(LEADER_SCRIPT)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_leader(self) -> bool:
+        # The lease outlives one interval so a healthy leader keeps it
+        lease_ms = self.interval * 2 * 1000
+        return bool(self._leader_script(keys=[self.LEASE_KEY], args=[self.instance_id, lease_ms]))
+
+    def run_once(self) -> Optional[int]:
+        """
+        Delete expired logs if this worker is the leader; returns None otherwise
+        """
+        try:
+            if not self.is_leader():
+                return None
+        except Exception as e:
+            logger.error(f"Log retention leader election failed: {str(e)}")
+            return None
+
+        db = Session(self.engine)
+        try:
+            return clean_old_logs(db, self.max_age_minutes, self.chunk_size)
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+log_retention_job = LogRetentionJob(
+    engine,
+    redis_client,
+    interval_seconds=settings.LOG_RETENTION["INTERVAL_SECONDS"],
+    max_age_minutes=settings.LOG_RETENTION["MAX_AGE_MINUTES"],
+    chunk_size=settings.LOG_RETENTION["CHUNK_SIZE"]
+)
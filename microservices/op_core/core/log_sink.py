@@ -0,0 +1,110 @@
+import time
+import queue
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+from .config import settings
+from .database import engine
+from .models.log import Log
+
+logger = logging.getLogger(__name__)
+
+class LogSink:
+    """
+    Background writer for request logs.
+
+    Requests only push a record onto a bounded in-memory queue; a writer thread
+    flushes the queue with multi-row INSERTs every BATCH_SIZE records or
+    FLUSH_INTERVAL_MS milliseconds. When the queue is full new records are
+    dropped (and counted) instead of slowing requests down.
+    """
+    def __init__(self, engine, max_queue: int, batch_size: int, flush_interval_ms: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Start the writer thread (no-op if it is already running)
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the writer thread after flushing what is already queued
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Queue a log record without blocking; returns False if it was dropped
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Request log queue is full, {self.dropped} records dropped so far")
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (self._stop.is_set() and self.queue.empty()):
+                break
+            try:
+                batch.append(self.queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        try:
+            # executemany: one multi-row INSERT per batch with pymysql
+            with self.engine.begin() as conn:
+                conn.execute(Log.__table__.insert(), batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error saving {len(batch)} logs: {str(e)}")
+
+log_sink = LogSink(
+    engine,
+    max_queue=settings.REQUEST_LOG["QUEUE_SIZE"],
+    batch_size=settings.REQUEST_LOG["BATCH_SIZE"],
+    flush_interval_ms=settings.REQUEST_LOG["FLUSH_INTERVAL_MS"]
+)
@@ -6,6 +6,9 @@ from datetime import datetime
 
 logger = logging.getLogger("activity_logger")
 
+# Field names (substring match, case-insensitive) whose values are never logged
+SENSITIVE_FIELDS = ["password", "token", "secret", "key", "otp"]
+
 def log_customer_activity(
     request: Request,
     activity: str,
@@ -42,10 +45,9 @@ def log_customer_activity(
     if details:
         # Sanitize sensitive information
         sanitized_details = {}
-        sensitive_fields = ["password", "token", "secret", "key", "otp"]
         
         for key, value in details.items():
-            if any(sensitive in key.lower() for sensitive in sensitive_fields):
+            if any(sensitive in key.lower() for sensitive in SENSITIVE_FIELDS):
                 sanitized_details[key] = "*****"
             else:
                 sanitized_details[key] = value
@@ -0,0 +1,360 @@
+import os
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import redis
+import redis.asyncio as aioredis
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Log-spaced latency buckets: two per power of two, 0.25 ms .. ~46 s
+LATENCY_BUCKETS = tuple(round(0.00025 * 2 ** (i / 2), 6) for i in range(36))
+
+class Histogram:
+    """Bucketed distribution of one label set"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # Last slot is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricFamily:
+    """
+    A named histogram, counter or gauge with a fixed set of label names.
+    Gauges are read from `collect` (label values -> value) at snapshot time.
+    """
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.collect = collect
+        self.series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            histogram = self.series.get(labels)
+            if histogram is None:
+                histogram = self.series[labels] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.kind == "histogram":
+            with self._lock:
+                series = [[list(labels), [h.counts[:], h.sum, h.count]] for labels, h in self.series.items()]
+        else:
+            with self._lock:
+                values = dict(self.series)
+            if self.collect is not None:
+                try:
+                    values.update(self.collect())
+                except Exception as e:
+                    logger.error(f"Error collecting metric {self.name}: {str(e)}")
+            series = [[list(labels), value] for labels, value in values.items()]
+        return {
+            "name": self.name,
+            "help": self.documentation,
+            "kind": self.kind,
+            "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets),
+            "series": series
+        }
+
+class MetricsRegistry:
+    """
+    In-process metrics registry.
+
+    With a multiprocess directory (METRICS['MULTIPROC_DIR']) every worker
+    periodically dumps a JSON snapshot of its metrics there, and /metrics merges
+    the snapshots of all workers, so any worker can answer a scrape.
+    Counters and histograms are summed across workers; gauges describe the
+    state of one process (pool, breaker, endpoint health) and get a `pid` label.
+    Snapshots of workers that exited or stopped writing are pruned.
+    """
+    def __init__(self, multiproc_dir: str = "", snapshot_interval: float = 5.0):
+        self.families: Dict[str, MetricFamily] = {}
+        self.multiproc_dir = multiproc_dir
+        self.snapshot_interval = snapshot_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "histogram", labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str]) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "counter", labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "gauge", labelnames, collect=collect))
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        if family.name in self.families:
+            raise ValueError(f"Metric '{family.name}' is already registered")
+        self.families[family.name] = family
+        return family
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [family.snapshot() for family in self.families.values()]
+
+    def start(self):
+        """
+        Start dumping snapshots to the multiprocess directory (no-op without one)
+        """
+        if not self.multiproc_dir or (self._thread is not None and self._thread.is_alive()):
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.snapshot_interval)
+            self._thread = None
+        if self.multiproc_dir:
+            self.write_snapshot()
+
+    def _run(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        path = os.path.join(self.multiproc_dir, f"{os.getpid()}.json")
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Error writing metrics snapshot: {str(e)}")
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """
+        Metrics of this worker, merged with the other workers' snapshots in multiprocess mode
+        """
+        if not self.multiproc_dir:
+            return self.snapshot()
+        self.write_snapshot()
+        snapshots = {}
+        for filename in os.listdir(self.multiproc_dir):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.multiproc_dir, filename)
+            pid = filename[:-len(".json")]
+            try:
+                if self._is_stale(path, pid):
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    snapshots[pid] = json.load(f)
+            except FileNotFoundError:
+                # Pruned by another worker in the meantime
+                continue
+            except (OSError, ValueError) as e:
+                logger.error(f"Error reading metrics snapshot {filename}: {str(e)}")
+        return merge_snapshots(snapshots)
+
+    def _is_stale(self, path: str, pid: str) -> bool:
+        """
+        Snapshot of a worker that exited, or that missed several snapshot intervals
+        """
+        if time.time() - os.path.getmtime(path) > 3 * self.snapshot_interval:
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ValueError:
+            return False
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            # Alive, owned by another user
+            return False
+        return False
+
+    def render(self) -> str:
+        return render_text(self.collect())
+
+def merge_snapshots(snapshots: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge the snapshots of several workers (by pid): counters and histograms
+    are summed, gauges are kept per worker under an extra `pid` label
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for pid, snapshot in snapshots.items():
+        for family in snapshot:
+            target = merged.get(family["name"])
+            if target is None:
+                labelnames = family["labelnames"] + (["pid"] if family["kind"] == "gauge" else [])
+                target = merged[family["name"]] = {**family, "labelnames": labelnames, "series": {}}
+            for labels, value in family["series"]:
+                if family["kind"] == "gauge":
+                    target["series"][tuple(labels) + (pid,)] = value
+                    continue
+                key = tuple(labels)
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = value
+                elif family["kind"] == "histogram":
+                    counts = [a + b for a, b in zip(current[0], value[0])]
+                    target["series"][key] = [counts, current[1] + value[1], current[2] + value[2]]
+                else:
+                    target["series"][key] = current + value
+    for family in merged.values():
+        family["series"] = [[list(labels), value] for labels, value in family["series"].items()]
+    return list(merged.values())
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def render_text(families: List[Dict[str, Any]]) -> str:
+    """
+    Prometheus text exposition format (version 0.0.4)
+    """
+    lines = []
+    for family in families:
+        name = family["name"]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        if family["kind"] != "histogram":
+            for labels, value in family["series"]:
+                lines.append(f"{name}{_labels(family['labelnames'], labels)} {value}")
+            continue
+        for labels, (counts, total, count) in family["series"]:
+            cumulative = 0
+            for bound, bucket_count in zip(family["buckets"], counts):
+                cumulative += bucket_count
+                bucket_labels = _labels(family["labelnames"], labels, 'le="%s"' % bound)
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _labels(family["labelnames"], labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{_labels(family['labelnames'], labels)} {total}")
+            lines.append(f"{name}_count{_labels(family['labelnames'], labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry(
+    multiproc_dir=settings.METRICS["MULTIPROC_DIR"],
+    snapshot_interval=settings.METRICS["SNAPSHOT_INTERVAL_SECONDS"]
+)
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ("method", "route", "status")
+)
+DB_POOL_CHECKOUT_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    ("pool",)
+)
+DB_POOL_INVALIDATIONS = registry.counter(
+    "db_pool_invalidations_total",
+    "Pooled connections invalidated (failed pre-ping or liveness check, disconnects)",
+    ("pool",)
+)
+DB_POOL_LIVENESS_FAILURES = registry.counter(
+    "db_pool_liveness_failures_total",
+    "Failed liveness pings of idle pooled connections",
+    ("pool",)
+)
+REDIS_COMMAND_DURATION = registry.histogram(
+    "redis_command_duration_seconds",
+    "Redis command round trip latency",
+    ("client", "command")
+)
+PASSWORD_HASH_DURATION = registry.histogram(
+    "password_hash_duration_seconds",
+    "bcrypt hash / verify latency on the hashing pool, queueing included",
+    ("operation",)
+)
+PASSWORD_HASH_REJECTED = registry.counter(
+    "password_hash_rejected_total",
+    "Hash / verify calls rejected because the hashing pool queue was full",
+    ("operation",)
+)
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total",
+    "Cache lookups by namespace and result (hit, miss, refresh, revalidated, error)",
+    ("namespace", "result")
+)
+UPSTREAM_RETRIES = registry.counter(
+    "upstream_retries_total",
+    "Retried and hedged outbound calls by upstream endpoint",
+    ("upstream", "endpoint", "kind")
+)
+UPSTREAM_REQUEST_DURATION = registry.histogram(
+    "upstream_request_duration_seconds",
+    "Outbound HTTP request latency by upstream service and endpoint",
+    ("upstream", "method", "endpoint", "status")
+)
+
+class TimedRedis(redis.Redis):
+    """redis.Redis recording the latency of every command"""
+
+    def __init__(self, *args, metrics_name: str = "default", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_name = metrics_name
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, self.metrics_name, str(args[0]).lower())
+
+class TimedAsyncRedis(aioredis.Redis):
+    """redis.asyncio.Redis recording the latency of every command"""
+
+    def __init__(self, *args, metrics_name: str = "default", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_name = metrics_name
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, self.metrics_name, str(args[0]).lower())
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Merging worker snapshots reads files, keep it off the event loop
+    body = await run_in_threadpool(registry.render)
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
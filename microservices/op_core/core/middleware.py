@@ -1,30 +1,25 @@
 import time
-from fastapi import Request, HTTPException
+from fastapi import Request
 import logging
-from typing import Callable
+from typing import Optional
 import json
 import hashlib
-from sqlalchemy.orm import Session
-from .database import engine
-from .models.log import Log
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.concurrency import iterate_in_threadpool
-from sqlalchemy import event, text
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .database import engine, async_engine, replica_engines
+from .log_sink import log_sink
+from .log_policy import LogPolicies, LogPolicy
+from .sql_capture import RequestQueries
+from .diagnostics import analyze_queries, hot_queries, server_timing
+from .metrics import registry as metrics_registry, HTTP_REQUEST_DURATION
+from .log_retention import log_retention_job, clean_old_logs
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
 from contextvars import ContextVar
-from collections import defaultdict
-import redis
 from .config import settings
+from .rate_limit import RateLimiter, RateLimitResult
+from .deadline import request_deadline_var, deadline_from_caller_var
 from starlette.responses import JSONResponse
-from datetime import datetime, timedelta
-
-# Initialize Redis connection
-redis_client = redis.Redis(
-    host=settings.RATE_LIMIT["REDIS_HOST"],
-    port=settings.RATE_LIMIT["REDIS_PORT"],
-    db=settings.RATE_LIMIT["REDIS_DB"],
-    password=settings.RATE_LIMIT["REDIS_PASSWORD"],
-    decode_responses=True
-)
+from datetime import datetime
 
 # Configure logging
 logging.basicConfig(
@@ -38,133 +33,200 @@ logger = logging.getLogger(__name__)
 request_var = ContextVar("request", default=None)
 sql_queries_var = ContextVar("sql_queries", default=None)
 
-def clean_old_logs(db: Session, minutes: int = 30):
+async def fingerprint_body(scope: Scope, receive: Receive, limit: int):
+    """
+    Fingerprint a request body from its first `limit` bytes plus Content-Length,
+    without buffering the rest of it.
+
+    Returns the hex digest and a receive callable that replays the chunks
+    consumed here before handing over to the original receive.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    consumed = []
+    size = 0
+    more_body = True
+    while more_body and size < limit:
+        message = await receive()
+        consumed.append(message)
+        if message["type"] != "http.request":
+            break
+        chunk = message.get("body", b"")
+        hasher.update(chunk[:limit - size])
+        size += len(chunk)
+        more_body = message.get("more_body", False)
+
+    content_length = dict(scope["headers"]).get(b"content-length", b"-")
+    hasher.update(b"|" + content_length)
+
+    async def replay() -> dict:
+        if consumed:
+            return consumed.pop(0)
+        return await receive()
+
+    return hasher.hexdigest() if size else "", replay
+
+class RateLimitMiddleware:
     """
-    Delete logs older than specified minutes
+    Pure ASGI rate limiting middleware
     """
-    try:
-        # Calculate the cutoff time
-        cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
-        
-        # Delete old logs
-        delete_query = text("""
-            DELETE FROM logs 
-            WHERE created_at < :cutoff_time
-        """)
-        
-        result = db.execute(delete_query, {"cutoff_time": cutoff_time})
-        deleted_count = result.rowcount
-        db.commit()
-        
-        if deleted_count > 0:
-            logger.info(f"Cleaned {deleted_count} old logs (older than {minutes} minutes)")
-            
-    except Exception as e:
-        logger.error(f"Error cleaning old logs: {str(e)}")
-        db.rollback()
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = None):
+        self.app = app
+        self.limiter = limiter or RateLimiter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        path = scope["path"]
         try:
-            # Get client IP
-            client_ip = request.client.host
-            
-            # Get request path
-            path = request.url.path
-            
-            # Get request body if exists
-            body = await request.body()
+            # Only cooldown routes look at the body, and only at a bounded prefix of it
             body_hash = ""
-            if body:
-                # Create hash of the request body
-                body_hash = hashlib.md5(body).hexdigest()
-            
-            # Create unique key for this request
-            request_key = f"rate_limit:{client_ip}:{path}:{body_hash}"
-            
-            # Check if this exact request was made recently
-            last_request = redis_client.get(request_key)
-            if last_request:
-                # If request was made within cooldown period, block it
-                time_passed = time.time() - float(last_request)
-                if time_passed < settings.RATE_LIMIT["REQUEST_COOLDOWN"]:
-                    wait_time = settings.RATE_LIMIT["REQUEST_COOLDOWN"] - time_passed
-                    error_detail = {
-                        "message": "Too many requests",
-                        "wait_seconds": round(wait_time, 1),
-                        "ip": client_ip,
-                        "path": path,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                    logger.warning(f"Rate limit exceeded for IP {client_ip} on path {path}. Wait time: {wait_time}s")
-                    return JSONResponse(
-                        status_code=429,
-                        content=error_detail
-                    )
-            
-            # Update last request time
-            redis_client.set(
-                request_key, 
-                str(time.time()), 
-                ex=settings.RATE_LIMIT["REQUEST_COOLDOWN"],
-            )
-            
-            # Also check total requests from this IP
-            ip_key = f"rate_limit:total:{client_ip}"
-            request_count = redis_client.incr(ip_key)
-            
-            # Set expiry for the counter if it's new
-            if request_count == 1:
-                redis_client.expire(ip_key, settings.RATE_LIMIT["RATE_LIMIT_WINDOW"])
-            
-            # Check if too many requests
-            if request_count > settings.RATE_LIMIT["MAX_REQUESTS"]:
-                error_detail = {
-                    "message": "Rate limit exceeded",
-                    "retry_after": settings.RATE_LIMIT["RATE_LIMIT_WINDOW"],
-                    "ip": client_ip,
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                logger.warning(f"Rate limit exceeded for IP {client_ip}. Request count: {request_count}")
-                return JSONResponse(
-                    status_code=429,
-                    content=error_detail
+            if self.limiter.policy_for(path).cooldown:
+                body_hash, receive = await fingerprint_body(
+                    scope, receive, settings.RATE_LIMIT["FINGERPRINT_BYTES"]
                 )
-                
-            # Process the request
-            response = await call_next(request)
-            return response
-            
+
+            # Cooldown check and request counting in a single Redis round trip
+            result = await self.limiter.hit(client_ip, path, body_hash)
         except Exception as e:
             logger.error(f"Error in RateLimitMiddleware: {str(e)}", exc_info=True)
             # Allow request to proceed in case of error in the middleware
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        try:
-            # Initialize SQL queries tracking
-            sql_queries = []
-            sql_queries_token = sql_queries_var.set(sql_queries)
-            
-            # Set the request in context
-            request_token = request_var.set(request)
-            start_time = time.time()
-
-            # Get request body
-            request_body = None
-            try:
-                body = await request.body()
-                if body:
-                    request_body = body.decode()
-            except Exception as e:
-                logger.error(f"Error reading request body: {str(e)}")
+        if result.reason == RateLimitResult.COOLDOWN:
+            error_detail = {
+                "message": "Too many requests",
+                "wait_seconds": round(result.wait_seconds, 1),
+                "ip": client_ip,
+                "path": path,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            logger.warning(f"Rate limit exceeded for IP {client_ip} on path {path}. Wait time: {result.wait_seconds}s")
+            response = JSONResponse(
+                status_code=429,
+                content=error_detail
+            )
+            await response(scope, receive, send)
+            return
+
+        if result.reason == RateLimitResult.LIMIT:
+            error_detail = {
+                "message": "Rate limit exceeded",
+                "retry_after": round(result.wait_seconds, 1),
+                "ip": client_ip,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            logger.warning(f"Rate limit exceeded for IP {client_ip}. Request count: {result.count}")
+            response = JSONResponse(
+                status_code=429,
+                content=error_detail
+            )
+            await response(scope, receive, send)
+            return
+
+        # Process the request
+        await self.app(scope, receive, send)
+
+class BodyCapture:
+    """
+    Bounded tee of a body stream: keeps the first `limit` bytes,
+    the total size and (optionally) a blake2b hash of the whole body.
+    """
+    __slots__ = ("limit", "prefix", "size", "hasher")
+
+    def __init__(self, limit: int, hash_body: bool = False):
+        self.limit = limit
+        self.prefix = bytearray()
+        self.size = 0
+        self.hasher = hashlib.blake2b(digest_size=16) if hash_body else None
+
+    def feed(self, chunk: bytes):
+        if not chunk:
+            return
+        if len(self.prefix) < self.limit:
+            self.prefix += chunk[:self.limit - len(self.prefix)]
+        self.size += len(chunk)
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+
+    def text(self) -> Optional[str]:
+        if not self.size:
+            return None
+        body = self.prefix.decode(errors="replace")
+        if self.size > len(self.prefix):
+            body += f"... [truncated, {self.size} bytes]"
+        return body
+
+    def digest(self) -> Optional[str]:
+        return self.hasher.hexdigest() if self.hasher is not None and self.size else None
+
+class LoggingMiddleware:
+    """
+    Pure ASGI request logging middleware.
+    Request and response bodies are observed as they pass through receive/send,
+    so streaming responses are forwarded chunk by chunk instead of being re-buffered.
+    """
+    def __init__(self, app: ASGIApp, policies: LogPolicies = None):
+        self.app = app
+        self.policies = policies or LogPolicies(settings.REQUEST_LOG)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            await self.app(scope, self.lifespan_receive(receive), send)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.policies.policy_for(scope["path"])
+        if policy.skip:
+            await self.app(scope, receive, send)
+            return
+
+        # Initialize SQL queries tracking
+        sql_queries = RequestQueries(debug=settings.SQL_DEBUG)
+        sql_queries_token = sql_queries_var.set(sql_queries)
+
+        # Set the request in context
+        request = Request(scope)
+        request_token = request_var.set(request)
+        start_time = time.time()
+
+        # Only a bounded prefix of each body is kept, whatever its size
+        request_capture = BodyCapture(policy.capture_bytes)
+        response_capture = BodyCapture(policy.capture_bytes, hash_body=settings.REQUEST_LOG["HASH_RESPONSE"])
+        response_info = {"status_code": 500, "started": False}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                request_capture.feed(message.get("body", b""))
+            return message
 
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response_info["status_code"] = message["status"]
+                response_info["started"] = True
+                if settings.DIAGNOSTICS["SERVER_TIMING"]:
+                    headers = list(message.get("headers", []))
+                    timing = server_timing(sql_queries, time.time() - start_time)
+                    headers.append((b"server-timing", timing.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                response_capture.feed(message.get("body", b""))
+            await send(message)
+
+        try:
             # Process request
             try:
-                response = await call_next(request)
+                await self.app(scope, receive_wrapper, send_wrapper)
             except Exception as e:
                 logger.error(f"Request processing error: {str(e)}", exc_info=True)
+                if response_info["started"]:
+                    raise
                 response = JSONResponse(
                     status_code=500,
                     content={
@@ -173,127 +235,199 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                         "timestamp": datetime.utcnow().isoformat()
                     }
                 )
-
+                await response(scope, receive, send_wrapper)
+        finally:
             process_time = time.time() - start_time
-
-            # Get response body
-            response_body = None
-            try:
-                response_body = [section async for section in response.body_iterator]
-                response.body_iterator = iterate_in_threadpool(response_body)
-                response_body = response_body[0].decode()
-            except Exception as e:
-                logger.error(f"Error reading response body: {str(e)}")
-
-            # Get collected SQL queries
-            collected_queries = sql_queries_var.get()
-            
-            # Store in database
-            db = Session(engine)
-            try:
-                # Clean old logs before adding new one
-                clean_old_logs(db)
-                
-                # Create log entry
-                log_entry = Log(
-                    method=request.method,
-                    url=str(request.url),
-                    status_code=response.status_code,
-                    request_body=request_body,
-                    response_body=response_body,
-                    ip_address=request.client.host,
-                    user_agent=request.headers.get("user-agent"),
-                    process_time=process_time,
-                    sql_queries=json.dumps(collected_queries)
-                )
-                db.add(log_entry)
-                db.commit()
-                
-                # # Log request details
-                # log_data = {
-                #     "method": request.method,
-                #     "url": str(request.url),
-                #     "status_code": response.status_code,
-                #     "ip_address": request.client.host,
-                #     "user_agent": request.headers.get("user-agent"),
-                #     "process_time": process_time,
-                #     "sql_queries_count": len(collected_queries),
-                #     "timestamp": datetime.utcnow().isoformat()
-                # }
-                
-                # # Log based on status code
-                # if response.status_code >= 400:
-                #     logger.error(f"Error request: {log_data}")
-                # elif response.status_code >= 300:
-                #     logger.warning(f"Redirect request: {log_data}")
-                # else:
-                #     logger.info(f"Successful request: {log_data}")
-                    
-            except Exception as e:
-                logger.error(f"Error saving log: {str(e)}")
-                db.rollback()
-            finally:
-                db.close()
+            self.analyze(scope, sql_queries, process_time)
+            self.save_log(
+                policy,
+                request,
+                request_capture,
+                response_info["status_code"],
+                response_capture,
+                process_time,
+                sql_queries
+            )
 
             # Reset context variables
             request_var.reset(request_token)
             sql_queries_var.reset(sql_queries_token)
 
-            return response
-            
+    def lifespan_receive(self, receive: Receive) -> Receive:
+        """
+        Start the background log writer and retention job with the app
+        and stop them (flushing queued logs) on shutdown
+        """
+        async def wrapped():
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                log_sink.start()
+                if settings.LOG_RETENTION["ENABLED"]:
+                    log_retention_job.start()
+            elif message["type"] == "lifespan.shutdown":
+                log_retention_job.stop()
+                await run_in_threadpool(log_sink.stop)
+            return message
+        return wrapped
+
+    def analyze(self, scope: Scope, queries: RequestQueries, process_time: float):
+        """
+        Flag N+1 / slow statements / database-bound requests and feed the hot query report
+        """
+        try:
+            report = analyze_queries(queries, process_time)
+            route = scope.get("route")
+            hot_queries.record(queries, report, route.path if route is not None else scope["path"])
+            if report.flagged:
+                logger.warning(f"SQL diagnostics for {scope['method']} {scope['path']}: {report.describe()}")
         except Exception as e:
-            logger.error(f"Error in LoggingMiddleware: {str(e)}", exc_info=True)
-            raise
+            logger.error(f"Error analyzing SQL queries: {str(e)}")
+
+    def save_log(
+        self,
+        policy: LogPolicy,
+        request: Request,
+        request_capture: BodyCapture,
+        status_code: int,
+        response_capture: BodyCapture,
+        process_time: float,
+        collected_queries: RequestQueries
+    ):
+        """
+        Queue the request log entry for the background writer,
+        if the route's policy keeps it
+        """
+        if not policy.should_log(status_code, process_time):
+            return
+        log_sink.submit({
+            "method": request.method,
+            "url": str(request.url),
+            "status_code": status_code,
+            "request_body": policy.redact(request_capture.text()),
+            "response_body": policy.redact(response_capture.text()),
+            "response_size": response_capture.size,
+            "response_hash": response_capture.digest(),
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("user-agent"),
+            "process_time": process_time,
+            "sql_queries": json.dumps(collected_queries.to_dict(policy.max_sql_queries))
+        })
+
+class DeadlineMiddleware:
+    """
+    Pure ASGI middleware giving every request a deadline: the remaining budget
+    sent by the caller in RESILIENCE['DEADLINE_HEADER'] (milliseconds), capped by
+    RESILIENCE['DEFAULT_DEADLINE_MS']. Outbound calls (op_core.rest) shrink their
+    timeouts to what is left and forward the remainder downstream.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.header = settings.RESILIENCE["DEADLINE_HEADER"].lower().encode()
+        self.default_budget = settings.RESILIENCE["DEFAULT_DEADLINE_MS"] / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.default_budget
+        for name, value in scope["headers"]:
+            if name == self.header:
+                try:
+                    budget = min(budget, max(float(value) / 1000, 0.0))
+                except ValueError:
+                    pass
+                break
+
+        token = request_deadline_var.set(time.monotonic() + budget)
+        caller_token = deadline_from_caller_var.set(budget < self.default_budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            deadline_from_caller_var.reset(caller_token)
+            request_deadline_var.reset(token)
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template and status.
+    Also starts / stops the metrics snapshot writer with the app.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "lifespan":
+            await self.app(scope, self.lifespan_receive(receive), send)
+            return
+        if scope["type"] != "http" or not settings.METRICS["ENABLED"]:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route template (e.g. /api/v1/customers/{customer_id}) keeps the label set bounded
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start_time,
+                scope["method"],
+                route.path if route is not None else "<unmatched>",
+                str(status["code"])
+            )
+
+    def lifespan_receive(self, receive: Receive) -> Receive:
+        async def wrapped():
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                metrics_registry.start()
+            elif message["type"] == "lifespan.shutdown":
+                await run_in_threadpool(metrics_registry.stop)
+            return message
+        return wrapped
 
 class SQLQueryLoggingMiddleware:
+    """
+    Collects the SQL statements of the current request into sql_queries_var.
+    Only perf_counter_ns and a fingerprint lookup run per statement unless
+    settings.SQL_DEBUG is on.
+    """
     def __init__(self, engine):
         self.engine = engine
 
     def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
-        conn.info.setdefault('query_start_time', []).append(time.time())
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter_ns())
 
     def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
         try:
-            total_time = time.time() - conn.info['query_start_time'].pop()
-            
-            # Try to get current SQL queries list
+            elapsed_ns = time.perf_counter_ns() - conn.info['query_start_time'].pop()
+
+            # Try to get current SQL queries collector
             current_queries = sql_queries_var.get()
-            if current_queries is not None:
-                # Add query information
-                query_info = {
-                    "query": statement,
-                    "parameters": str(parameters),
-                    "execution_time": round(total_time, 4),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                current_queries.append(query_info)
-                
+            if current_queries is None:
+                return
+            current_queries.record(statement, elapsed_ns, parameters)
+
+            if current_queries.debug:
                 # Log SQL query details
                 logger.info(f"SQL Query: {statement}")
                 logger.info(f"Parameters: {parameters}")
-                logger.info(f"Execution Time: {total_time:.4f}s")
-                
-                # If query failed, add error details
-                if hasattr(cursor, 'error'):
-                    error_info = {
-                        "error": str(cursor.error),
-                        "error_code": cursor.error.code if hasattr(cursor.error, 'code') else None,
-                        "error_message": cursor.error.message if hasattr(cursor.error, 'message') else None
-                    }
-                    query_info["error"] = error_info
-                    logger.error(f"SQL Query Error: {error_info}")
+                logger.info(f"Execution Time: {elapsed_ns / 1e9:.4f}s")
         except Exception as e:
             logger.error(f"Error logging SQL query: {str(e)}")
-            # Add error to current queries
-            current_queries = sql_queries_var.get()
-            if current_queries is not None:
-                current_queries.append({
-                    "error": str(e),
-                    "query": statement,
-                    "parameters": str(parameters),
-                    "timestamp": datetime.utcnow().isoformat()
-                })
 
 # Connect middleware with SQLAlchemy engine
 event.listen(engine, "before_cursor_execute", SQLQueryLoggingMiddleware(engine).before_cursor_execute)
-event.listen(engine, "after_cursor_execute", SQLQueryLoggingMiddleware(engine).after_cursor_execute)
\ No newline at end of file
+event.listen(engine, "after_cursor_execute", SQLQueryLoggingMiddleware(engine).after_cursor_execute)
+event.listen(async_engine.sync_engine, "before_cursor_execute", SQLQueryLoggingMiddleware(async_engine).before_cursor_execute)
+event.listen(async_engine.sync_engine, "after_cursor_execute", SQLQueryLoggingMiddleware(async_engine).after_cursor_execute)
+for replica_engine in replica_engines:
+    event.listen(replica_engine, "before_cursor_execute", SQLQueryLoggingMiddleware(replica_engine).before_cursor_execute)
+    event.listen(replica_engine, "after_cursor_execute", SQLQueryLoggingMiddleware(replica_engine).after_cursor_execute)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Index, func
 from sqlalchemy.orm import declarative_base
 import json
 
@@ -13,7 +13,14 @@ class Log(Base):
     status_code = Column(Integer)
     request_body = Column(Text, nullable=True)
     response_body = Column(Text, nullable=True)
+    response_size = Column(Integer, nullable=True)  # Tổng số byte của response
+    response_hash = Column(String(32), nullable=True)  # blake2b của toàn bộ response
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
     process_time = Column(Float)
     sql_queries = Column(Text, nullable=True)  # 🔥 Chứa danh sách SQL dưới dạng JSON
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)  # Dùng cho log retention
+
+    __table_args__ = (
+        Index('idx_created_at', 'created_at'),
+    )
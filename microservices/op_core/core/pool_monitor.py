@@ -0,0 +1,103 @@
+import time
+import logging
+import threading
+from typing import Dict, Optional
+from sqlalchemy import event, exc
+from .metrics import DB_POOL_INVALIDATIONS, DB_POOL_LIVENESS_FAILURES
+
+logger = logging.getLogger(__name__)
+
+def pool_stats(engine) -> Dict[str, int]:
+    """
+    Live connection counts of an engine's QueuePool
+    """
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool.overflow() counts from -pool_size
+        "overflow": max(pool.overflow(), 0)
+    }
+
+def instrument_pool(engine, name: str, liveness: str, interval: int) -> Optional["PoolLivenessChecker"]:
+    """
+    Count invalidated connections and, in "background" liveness mode, replace the
+    per-checkout pre-ping with:
+      - a ping on checkout only for connections idle longer than `interval`
+      - a background thread pinging idle connections every `interval` (sync engines;
+        async connections belong to the event loop and rely on the checkout check)
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        DB_POOL_INVALIDATIONS.inc(name)
+
+    if liveness != "background":
+        return None
+
+    checker = PoolLivenessChecker(engine, name, interval) if sync_engine is engine else None
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_used"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if checker is not None and checker.thread is None:
+            checker.start()
+        last_used = connection_record.info.get("last_used")
+        if last_used is None or time.monotonic() - last_used < interval:
+            return
+        try:
+            alive = sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if not alive:
+            DB_POOL_LIVENESS_FAILURES.inc(name)
+            # The pool discards this connection and retries with a fresh one
+            raise exc.DisconnectionError("Stale pooled connection failed liveness check")
+
+    return checker
+
+class PoolLivenessChecker:
+    """
+    Pings the idle connections of a sync engine every `interval` seconds.
+    QueuePool hands connections out FIFO, so cycling through checkedin() connections
+    touches each idle one once; dead ones are invalidated by the engine.
+    """
+    def __init__(self, engine, name: str, interval: int):
+        self.engine = engine
+        self.name = name
+        self.interval = interval
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self.thread is not None:
+                return
+            self._stop.clear()
+            self.thread = threading.Thread(target=self._run, name=f"pool-liveness-{self.name}", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check_once(self) -> int:
+        failures = 0
+        for _ in range(self.engine.pool.checkedin()):
+            try:
+                with self.engine.connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+            except Exception as e:
+                failures += 1
+                DB_POOL_LIVENESS_FAILURES.inc(self.name)
+                logger.warning(f"Pool liveness check failed ({self.name}): {str(e)}")
+        return failures
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check_once()
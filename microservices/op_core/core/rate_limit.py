@@ -0,0 +1,373 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from itertools import chain
+from typing import Optional, Dict, Any, List
+import redis.asyncio as aioredis
+from .config import settings
+from .redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Every strategy script shares the same calling convention so that a single
+# EVALSHA decides a request atomically:
+#   KEYS[1] = duplicate-request cooldown key
+#   KEYS[2] = strategy key, KEYS[3] = previous window key (sliding counter only)
+#   ARGV[1] = now (ms), ARGV[2] = cooldown (ms), ARGV[3] = limit, ARGV[4] = window (ms)
+#   ARGV[5] = strategy specific (window start or unique member)
+# and returns {allowed, reason, retry_after_ms, count}
+# with reason 0 = ok, 1 = cooldown, 2 = limit.
+COOLDOWN_PROLOGUE = """
+local now = tonumber(ARGV[1])
+local cooldown = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local window = tonumber(ARGV[4])
+
+if cooldown > 0 then
+    local last = redis.call('GET', KEYS[1])
+    if last then
+        local passed = now - tonumber(last)
+        if passed < cooldown then
+            return {0, 1, cooldown - passed, 0}
+        end
+    end
+    redis.call('SET', KEYS[1], now, 'PX', cooldown)
+end
+"""
+
+# Fixed window counter; the TTL is set in the same script as the INCR
+FIXED_WINDOW = """
+local count = redis.call('INCR', KEYS[2])
+local ttl = redis.call('PTTL', KEYS[2])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[2], window)
+    ttl = window
+end
+if count > limit then
+    return {0, 2, ttl, count}
+end
+return {1, 0, 0, count}
+"""
+
+# Exact sliding window: one sorted set member per accepted request
+SLIDING_WINDOW_LOG = """
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[2])
+if count >= limit then
+    local oldest = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+    return {0, 2, tonumber(oldest[2]) + window - now, count}
+end
+redis.call('ZADD', KEYS[2], now, ARGV[5])
+redis.call('PEXPIRE', KEYS[2], window)
+return {1, 0, 0, count + 1}
+"""
+
+# Sliding window approximated from the current and previous fixed windows
+SLIDING_WINDOW_COUNTER = """
+local elapsed = now - tonumber(ARGV[5])
+local current = tonumber(redis.call('GET', KEYS[2]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[3]) or '0')
+local weight = (window - elapsed) / window
+local estimated = math.floor(previous * weight) + current
+if estimated >= limit then
+    -- The next request passes once floor(share of the previous window) + current < limit,
+    -- i.e. once that share is strictly below limit - current: 1 ms past the boundary
+    local retry
+    if current < limit then
+        -- time until the previous window's share has decayed enough
+        retry = window * (1 - (limit - current) / previous) - elapsed
+    else
+        -- wait for the rollover, then for the current window to decay
+        retry = window - elapsed + window * (1 - limit / current)
+    end
+    return {0, 2, math.max(math.floor(retry) + 1, 1), estimated}
+end
+current = redis.call('INCR', KEYS[2])
+if current == 1 or redis.call('PTTL', KEYS[2]) < 0 then
+    redis.call('PEXPIRE', KEYS[2], window * 2)
+end
+return {1, 0, 0, estimated + 1}
+"""
+
+# GCRA (token bucket equivalent): store the theoretical arrival time only.
+# Allows bursts of up to `limit` requests, refilled evenly over `window`.
+GCRA = """
+local interval = window / limit
+local tat = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+    return {0, 2, allow_at - now, limit}
+end
+redis.call('SET', KEYS[2], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, 0, 0, math.ceil((new_tat - now) / interval)}
+"""
+
+# Cooldown only; used when the counting is done by the local pre-limiter
+COOLDOWN_ONLY = """
+return {1, 0, 0, 0}
+"""
+
+STRATEGIES = {
+    "fixed_window": FIXED_WINDOW,
+    "sliding_window_log": SLIDING_WINDOW_LOG,
+    "sliding_window_counter": SLIDING_WINDOW_COUNTER,
+    "gcra": GCRA,
+}
+
+# Batched reconciliation for the local pre-limiter: add every worker-local
+# count to the shared fixed-window counters and return the global totals.
+#   KEYS = counter keys, ARGV = (increment, window ms) pairs, one per key
+SYNC_SCRIPT = """
+local totals = {}
+for i, key in ipairs(KEYS) do
+    local total = redis.call('INCRBY', key, ARGV[i * 2 - 1])
+    if redis.call('PTTL', key) < 0 then
+        redis.call('PEXPIRE', key, ARGV[i * 2])
+    end
+    totals[i] = total
+end
+return totals
+"""
+
+class RateLimitPolicy:
+    """Limits applied to one group of routes"""
+    __slots__ = ("name", "strategy", "max_requests", "window", "local", "cooldown")
+
+    def __init__(self, name: str, strategy: str, max_requests: int, window: int, local: bool = False, cooldown: int = 0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown rate limit strategy '{strategy}', expected one of {list(STRATEGIES)}")
+        self.name = name
+        self.strategy = strategy
+        self.max_requests = max_requests
+        self.window = window
+        self.local = local
+        # Duplicate-request cooldown in seconds; 0 disables it (and body fingerprinting)
+        self.cooldown = cooldown
+
+def build_policies(config: Dict[str, Any]) -> List[tuple]:
+    """
+    Build (path_prefix, policy) pairs from settings.RATE_LIMIT, longest prefix first.
+    The default policy is registered under the "" prefix.
+    """
+    local = config["LOCAL"]["ENABLED"]
+    policies = [("", RateLimitPolicy(
+        "total",
+        config["STRATEGY"],
+        config["MAX_REQUESTS"],
+        config["RATE_LIMIT_WINDOW"],
+        local
+    ))]
+    for prefix, route in config.get("ROUTES", {}).items():
+        cooldown = route.get("cooldown", 0)
+        if cooldown is True:
+            cooldown = config["REQUEST_COOLDOWN"]
+        policies.append((prefix, RateLimitPolicy(
+            prefix,
+            route.get("strategy", config["STRATEGY"]),
+            route.get("max_requests", config["MAX_REQUESTS"]),
+            route.get("window", config["RATE_LIMIT_WINDOW"]),
+            route.get("local", local),
+            cooldown
+        )))
+    return sorted(policies, key=lambda item: len(item[0]), reverse=True)
+
+class RateLimitResult:
+    """Outcome of a single rate limit decision"""
+    __slots__ = ("allowed", "reason", "count", "wait_seconds")
+
+    COOLDOWN = "cooldown"
+    LIMIT = "limit"
+
+    def __init__(self, allowed: bool, reason: Optional[str] = None, count: int = 0, wait_seconds: float = 0.0):
+        self.allowed = allowed
+        self.reason = reason
+        self.count = count
+        self.wait_seconds = wait_seconds
+
+class _LocalEntry:
+    """Per-client state of the local pre-limiter"""
+    __slots__ = ("redis_key", "window_ms", "tokens", "updated", "window_start", "pending", "global_count")
+
+    def __init__(self, redis_key: str, window_ms: int, capacity: float, now: float, window_start: int):
+        self.redis_key = redis_key
+        self.window_ms = window_ms
+        self.tokens = capacity
+        self.updated = now
+        self.window_start = window_start
+        self.pending = 0
+        self.global_count = 0
+
+class LocalRateLimiter:
+    """
+    In-process pre-limiter: a per-worker token bucket per client key that decides
+    locally and reconciles its counts with Redis in one batch every SYNC_INTERVAL_MS.
+
+    The global limit is enforced from the last known cross-worker total, so it may be
+    exceeded by at most (workers x requests per sync interval).
+    """
+    def __init__(self, client: aioredis.Redis, max_keys: int, sync_interval_ms: int):
+        self.client = client
+        self.max_keys = max_keys
+        self.sync_interval = sync_interval_ms / 1000
+        self.entries: "OrderedDict[str, _LocalEntry]" = OrderedDict()
+        # Evicted entries whose counts were not pushed to Redis yet (flushed by the next sync)
+        self._evicted: List[_LocalEntry] = []
+        self._sync_script = client.register_script(SYNC_SCRIPT)
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def hit(self, key: str, policy: RateLimitPolicy) -> RateLimitResult:
+        """
+        Decide locally; never touches Redis
+        """
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+        now = time.monotonic()
+        window_ms = policy.window * 1000
+        now_ms = int(time.time() * 1000)
+        window_start = now_ms - now_ms % window_ms
+
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = _LocalEntry(key, window_ms, policy.max_requests, now, window_start)
+            self.entries[key] = entry
+            if len(self.entries) > self.max_keys:
+                _, evicted = self.entries.popitem(last=False)
+                if evicted.pending:
+                    self._evicted.append(evicted)
+        else:
+            self.entries.move_to_end(key)
+            if entry.window_start != window_start:
+                # Counts from an expired window no longer matter
+                entry.window_start = window_start
+                entry.pending = 0
+                entry.global_count = 0
+            rate = policy.max_requests / policy.window
+            entry.tokens = min(policy.max_requests, entry.tokens + (now - entry.updated) * rate)
+            entry.updated = now
+
+        wait_seconds = (window_start + window_ms - now_ms) / 1000
+        if entry.global_count + entry.pending >= policy.max_requests:
+            return RateLimitResult(False, RateLimitResult.LIMIT, entry.global_count + entry.pending, wait_seconds)
+        if entry.tokens < 1:
+            rate = policy.max_requests / policy.window
+            return RateLimitResult(False, RateLimitResult.LIMIT, entry.global_count + entry.pending, (1 - entry.tokens) / rate)
+
+        entry.tokens -= 1
+        entry.pending += 1
+        return RateLimitResult(True, count=entry.global_count + entry.pending)
+
+    async def sync(self):
+        """
+        Push pending local counts to Redis and refresh the global totals
+        """
+        evicted, self._evicted = self._evicted, []
+        batch = [
+            (entry, entry.pending, entry.window_start)
+            for entry in chain(self.entries.values(), evicted) if entry.pending
+        ]
+        if not batch:
+            return
+        keys, args = [], []
+        for entry, pending, window_start in batch:
+            entry.pending -= pending
+            keys.append(f"{entry.redis_key}:{window_start}")
+            args.extend((pending, entry.window_ms))
+
+        try:
+            totals = await self._sync_script(keys=keys, args=args)
+        except Exception as e:
+            logger.error(f"Error syncing local rate limits: {str(e)}")
+            for entry, pending, window_start in batch:
+                if entry.window_start == window_start:
+                    entry.pending += pending
+            self._evicted.extend(entry for entry in evicted if entry.pending)
+            return
+        for (entry, _, window_start), total in zip(batch, totals):
+            if entry.window_start == window_start:
+                entry.global_count = int(total)
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+class RateLimiter:
+    """
+    Async Redis rate limiter.
+    Every decision is a single EVALSHA round trip on a pooled connection,
+    using the strategy configured for the route in settings.RATE_LIMIT.
+    """
+    REASONS = {1: RateLimitResult.COOLDOWN, 2: RateLimitResult.LIMIT}
+
+    def __init__(self, client: Optional[aioredis.Redis] = None):
+        self.client = client or get_async_redis("rate_limit")
+        self.policies = build_policies(settings.RATE_LIMIT)
+        self._scripts = {
+            name: self.client.register_script(COOLDOWN_PROLOGUE + body)
+            for name, body in STRATEGIES.items()
+        }
+        self._cooldown_script = self.client.register_script(COOLDOWN_PROLOGUE + COOLDOWN_ONLY)
+        self.local = LocalRateLimiter(
+            self.client,
+            settings.RATE_LIMIT["LOCAL"]["MAX_KEYS"],
+            settings.RATE_LIMIT["LOCAL"]["SYNC_INTERVAL_MS"]
+        )
+
+    def policy_for(self, path: str) -> RateLimitPolicy:
+        for prefix, policy in self.policies:
+            if path.startswith(prefix):
+                return policy
+
+    async def hit(self, client_ip: str, path: str, body_hash: str = "") -> RateLimitResult:
+        """
+        Record a request and decide whether it may proceed.
+        body_hash is the request body fingerprint, only used by cooldown routes.
+        """
+        policy = self.policy_for(path)
+        cooldown = policy.cooldown * 1000
+        if policy.local:
+            return await self._hit_local(policy, client_ip, path, body_hash, cooldown)
+
+        now = int(time.time() * 1000)
+        window = policy.window * 1000
+        key = f"rate_limit:{policy.strategy}:{policy.name}:{client_ip}"
+
+        keys = [f"rate_limit:{client_ip}:{path}:{body_hash}", key]
+        extra = ""
+        if policy.strategy == "sliding_window_counter":
+            window_start = now - now % window
+            keys = [keys[0], f"{key}:{window_start}", f"{key}:{window_start - window}"]
+            extra = window_start
+        elif policy.strategy == "sliding_window_log":
+            extra = f"{now}-{uuid.uuid4().hex[:8]}"
+
+        allowed, reason, retry_ms, count = await self._scripts[policy.strategy](
+            keys=keys,
+            args=[now, cooldown, policy.max_requests, window, extra]
+        )
+        if int(allowed):
+            return RateLimitResult(True, count=int(count))
+        return RateLimitResult(False, self.REASONS[int(reason)], count=int(count), wait_seconds=int(retry_ms) / 1000)
+
+    async def _hit_local(self, policy: RateLimitPolicy, client_ip: str, path: str, body_hash: str, cooldown: int) -> RateLimitResult:
+        """
+        Count the request in the local pre-limiter; Redis is only needed for the cooldown.
+        The cooldown is checked first (as in the Redis strategies), so a request it
+        rejects does not use up a local token.
+        """
+        if cooldown:
+            allowed, reason, retry_ms, _ = await self._cooldown_script(
+                keys=[f"rate_limit:{client_ip}:{path}:{body_hash}"],
+                args=[int(time.time() * 1000), cooldown, 0, 0, ""]
+            )
+            if not int(allowed):
+                return RateLimitResult(False, self.REASONS[int(reason)], wait_seconds=int(retry_ms) / 1000)
+
+        return self.local.hit(f"rate_limit:local:{policy.name}:{client_ip}", policy)
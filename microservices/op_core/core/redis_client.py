@@ -1,12 +1,16 @@
-import redis
+import threading
+from typing import Dict
+import redis.asyncio as aioredis
 from .config import settings
+from .metrics import TimedRedis, TimedAsyncRedis
 
-redis_client = redis.Redis(
+redis_client = TimedRedis(
     host=settings.REDIS_CONFIG['host'],
     port=settings.REDIS_CONFIG['port'],
     db=settings.REDIS_CONFIG['default_db'],
     password=settings.REDIS_CONFIG['password'],
-    decode_responses=True
+    decode_responses=True,
+    metrics_name="default"
 )
 
 def get_redis():
@@ -28,4 +32,92 @@ def set_hash(name: str, mapping: dict):
     return redis_client.hmset(name, mapping)
 
 def get_hash(name: str):
-    return redis_client.hgetall(name) 
\ No newline at end of file
+    return redis_client.hgetall(name)
+
+# Async clients: one explicit pool per logical DB, shared by every client of the process
+_async_pools: Dict[int, aioredis.ConnectionPool] = {}
+_async_clients: Dict[str, TimedAsyncRedis] = {}
+_lock = threading.Lock()
+
+def _database_number(name: str) -> int:
+    if name == "default":
+        return settings.REDIS_CONFIG['default_db']
+    try:
+        return settings.REDIS_CONFIG['databases'][name]
+    except KeyError:
+        raise ValueError(f"Unknown Redis database '{name}'")
+
+def get_async_redis_pool(db: int) -> aioredis.ConnectionPool:
+    """
+    Get (or lazily create) the process-wide async connection pool of a logical DB
+    """
+    with _lock:
+        pool = _async_pools.get(db)
+        if pool is None:
+            pool = _async_pools[db] = aioredis.ConnectionPool(
+                host=settings.REDIS_CONFIG['host'],
+                port=settings.REDIS_CONFIG['port'],
+                db=db,
+                password=settings.REDIS_CONFIG['password'],
+                max_connections=settings.REDIS_CONFIG['max_connections'],
+                socket_timeout=settings.REDIS_CONFIG['socket_timeout'],
+                socket_connect_timeout=settings.REDIS_CONFIG['socket_connect_timeout'],
+                health_check_interval=settings.REDIS_CONFIG['health_check_interval'],
+                decode_responses=True
+            )
+        return pool
+
+def get_async_redis(name: str = "default") -> TimedAsyncRedis:
+    """
+    Get the shared async client of a logical DB ("default" or a key of
+    REDIS_CONFIG['databases']). Clients on the same DB number share one pool.
+    """
+    client = _async_clients.get(name)
+    if client is None:
+        pool = get_async_redis_pool(_database_number(name))
+        with _lock:
+            client = _async_clients.setdefault(name, TimedAsyncRedis(connection_pool=pool, metrics_name=name))
+    return client
+
+_sync_clients: Dict[str, TimedRedis] = {"default": redis_client}
+
+def get_sync_redis(name: str = "default") -> TimedRedis:
+    """
+    Get the shared sync client of a logical DB, for code running in the threadpool
+    """
+    client = _sync_clients.get(name)
+    if client is None:
+        db = _database_number(name)
+        with _lock:
+            client = _sync_clients.get(name)
+            if client is None:
+                client = _sync_clients[name] = TimedRedis(
+                    host=settings.REDIS_CONFIG['host'],
+                    port=settings.REDIS_CONFIG['port'],
+                    db=db,
+                    password=settings.REDIS_CONFIG['password'],
+                    max_connections=settings.REDIS_CONFIG['max_connections'],
+                    socket_timeout=settings.REDIS_CONFIG['socket_timeout'],
+                    socket_connect_timeout=settings.REDIS_CONFIG['socket_connect_timeout'],
+                    health_check_interval=settings.REDIS_CONFIG['health_check_interval'],
+                    decode_responses=True,
+                    metrics_name=name
+                )
+    return client
+
+async_redis_client = get_async_redis()
+
+async def set_key_async(key: str, value: str, expire: int = None):
+    return await async_redis_client.set(key, value, ex=expire)
+
+async def get_key_async(key: str):
+    return await async_redis_client.get(key)
+
+async def delete_key_async(key: str):
+    return await async_redis_client.delete(key)
+
+async def set_hash_async(name: str, mapping: dict):
+    return await async_redis_client.hset(name, mapping=mapping)
+
+async def get_hash_async(name: str):
+    return await async_redis_client.hgetall(name)
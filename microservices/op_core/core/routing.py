@@ -0,0 +1,114 @@
+import time
+import logging
+import threading
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+class ReplicaSet:
+    """
+    Round-robin over read replica engines. A replica that fails at connection
+    level is ejected for `eject_seconds` and then tried again.
+    """
+    def __init__(self, engines: List, eject_seconds: int = 30):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._ejected_until = [0.0] * len(engines)
+        self._next = 0
+        self._lock = threading.Lock()
+        for index, engine in enumerate(engines):
+            self._watch(engine, index)
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def choose(self):
+        """
+        Next healthy replica, or None when every replica is ejected
+        """
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                index = self._next
+                self._next = (self._next + 1) % len(self.engines)
+                if self._ejected_until[index] <= now:
+                    return self.engines[index]
+        return None
+
+    def eject(self, index: int):
+        with self._lock:
+            self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        logger.warning(f"Read replica {index} ejected for {self.eject_seconds}s")
+
+    def healthy(self) -> List[bool]:
+        now = time.monotonic()
+        return [until <= now for until in self._ejected_until]
+
+    def _watch(self, engine, index: int):
+        @event.listens_for(engine, "handle_error")
+        def on_error(context):
+            # Connection failures and disconnects, not SQL errors
+            if context.is_disconnect or context.connection is None:
+                self.eject(index)
+
+class PrimaryPin:
+    """
+    Read-your-writes marker shared by every session of one request: set by
+    the first write through any of them, it sends the others' reads to the primary
+    """
+    __slots__ = ("pinned",)
+
+    def __init__(self):
+        self.pinned = False
+
+def request_pin(request=None) -> PrimaryPin:
+    """
+    The PrimaryPin of `request`, created on first use (a private one without a request).
+    Kept on request.state rather than set in a contextvar: sync dependencies run
+    in the threadpool, each in its own copy of the context.
+    """
+    if request is None:
+        return PrimaryPin()
+    pin = getattr(request.state, "primary_pin", None)
+    if pin is None:
+        pin = request.state.primary_pin = PrimaryPin()
+    return pin
+
+class RoutingSession(Session):
+    """
+    Session sending reads to replicas and writes to the primary (its bind).
+
+    Reads use a replica when the session prefers replicas (get_read_db) or the
+    statement is marked with .execution_options(replica=True). The first write
+    (flush or INSERT/UPDATE/DELETE) sets the session's PrimaryPin, shared by the
+    sessions of the same request, so from then on all of them read from the
+    primary and the request reads its own writes.
+    """
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, prefer_replica: bool = False,
+                 pin: Optional[PrimaryPin] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.prefer_replica = prefer_replica
+        self.pin = pin if pin is not None else PrimaryPin()
+
+    @property
+    def pinned_to_primary(self) -> bool:
+        return self.pin.pinned
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.pin.pinned = True
+        if self.replicas and not self.pin.pinned and self._wants_replica(clause):
+            replica = self.replicas.choose()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+    def _wants_replica(self, clause) -> bool:
+        if clause is None or not getattr(clause, "is_select", False):
+            return False
+        marked = clause.get_execution_options().get("replica")
+        return marked if marked is not None else self.prefer_replica
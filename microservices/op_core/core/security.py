@@ -1,10 +1,29 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import redis
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from .config import settings
+from .exceptions import ServiceBusyError, RevocationUnavailableError
+from .metrics import registry as metrics_registry, PASSWORD_HASH_DURATION, PASSWORD_HASH_REJECTED
+from .redis_client import get_sync_redis, get_async_redis
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Hashes with other rounds than configured are flagged by verify_and_update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_HASHING["BCRYPT_ROUNDS"],
+    bcrypt__min_rounds=settings.PASSWORD_HASHING["BCRYPT_ROUNDS"],
+    bcrypt__max_rounds=settings.PASSWORD_HASHING["BCRYPT_ROUNDS"]
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,6 +31,78 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; on success with an outdated hash (rounds / scheme changed)
+    also return its new hash, which the caller should store
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+class HashingPool:
+    """
+    Bounded executor for bcrypt so logins do not block the event loop.
+    At most `max_pending` calls may be queued or running per process;
+    beyond that callers get ServiceBusyError (503) instead of queueing forever.
+    """
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use, i.e. after the server forked its workers
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hashing")
+        return self._executor
+
+    async def run(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            PASSWORD_HASH_REJECTED.inc(operation)
+            raise ServiceBusyError("Too many concurrent sign-ins, please retry")
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            PASSWORD_HASH_DURATION.observe(time.perf_counter() - start, operation)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+hashing_pool = HashingPool(
+    settings.PASSWORD_HASHING["EXECUTOR"],
+    settings.PASSWORD_HASHING["WORKERS"],
+    settings.PASSWORD_HASHING["MAX_PENDING"]
+)
+
+metrics_registry.gauge(
+    "password_hash_pending",
+    "Hash / verify calls queued or running on the hashing pool",
+    (),
+    collect=lambda: {(): hashing_pool.pending}
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run("verify", verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await hashing_pool.run("hash", get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await hashing_pool.run("verify", verify_and_update_password, plain_password, hashed_password)
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -20,6 +111,9 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
         expire = datetime.utcnow() + timedelta(minutes=settings.JWT_SETTINGS["ACCESS_TOKEN_EXPIRE_MINUTES"])
     
     to_encode.update({"exp": expire})
+    # jti identifies the token for revocation, iat (ms precision) orders it against per-user cutoffs
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    to_encode.setdefault("iat", round(time.time(), 3))
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SETTINGS["SECRET_KEY"], algorithm=settings.JWT_SETTINGS["ALGORITHM"])
     return encoded_jwt
 
@@ -28,7 +122,112 @@ def decode_token(token: str) -> Dict[str, Any]:
         decoded_token = jwt.decode(token, settings.JWT_SETTINGS["SECRET_KEY"], algorithms=[settings.JWT_SETTINGS["ALGORITHM"]])
         return decoded_token
     except JWTError:
-        return None 
-def check_token_status(token: str) -> bool:
-    
-    return True
\ No newline at end of file
+        return None
+
+# Revocation state lives in the Redis "session" DB, so validating a token needs no MySQL query:
+#   auth:revoked:{jti}          a single revoked token, kept until the token expires
+#   auth:revoked_before:{sub}   tokens of the user issued before this time are revoked
+def _revoked_key(jti: str) -> str:
+    return f"auth:revoked:{jti}"
+
+def _revoked_before_key(subject: Any) -> str:
+    return f"auth:revoked_before:{subject}"
+
+def _token_ttl(claims: Dict[str, Any]) -> int:
+    return max(int(claims.get("exp", 0) - time.time()) + 1, 1)
+
+def _is_revoked(claims: Dict[str, Any], revoked: Optional[str], revoked_before: Optional[str]) -> bool:
+    if revoked is not None:
+        return True
+    return revoked_before is not None and float(claims.get("iat", 0)) < float(revoked_before)
+
+def is_token_revoked(claims: Dict[str, Any]) -> bool:
+    """
+    One MGET against the revocation keys; fails closed when Redis is unreachable
+    """
+    if not claims.get("jti"):
+        return True
+    try:
+        revoked, revoked_before = get_sync_redis("session").mget(
+            _revoked_key(claims["jti"]), _revoked_before_key(claims.get("sub"))
+        )
+    except redis.RedisError as e:
+        logger.error(f"Error checking token revocation: {str(e)}")
+        return True
+    return _is_revoked(claims, revoked, revoked_before)
+
+async def is_token_revoked_async(claims: Dict[str, Any]) -> bool:
+    if not claims.get("jti"):
+        return True
+    try:
+        revoked, revoked_before = await get_async_redis("session").mget(
+            _revoked_key(claims["jti"]), _revoked_before_key(claims.get("sub"))
+        )
+    except redis.RedisError as e:
+        logger.error(f"Error checking token revocation: {str(e)}")
+        return True
+    return _is_revoked(claims, revoked, revoked_before)
+
+# Revocation is what stops a still-signed token: a Redis error is retried, then raised
+# as RevocationUnavailableError so callers keep the token table unchanged (nothing half-revoked)
+_REVOKE_ATTEMPTS = 3
+_REVOKE_RETRY_SECONDS = 0.05
+
+def _set_revocation(key: str, value: Any, ttl: int):
+    for attempt in range(1, _REVOKE_ATTEMPTS + 1):
+        try:
+            get_sync_redis("session").set(key, value, ex=ttl)
+            return
+        except redis.RedisError as e:
+            logger.error(f"Error recording token revocation (attempt {attempt}): {str(e)}")
+            if attempt < _REVOKE_ATTEMPTS:
+                time.sleep(_REVOKE_RETRY_SECONDS * attempt)
+    raise RevocationUnavailableError()
+
+async def _set_revocation_async(key: str, value: Any, ttl: int):
+    for attempt in range(1, _REVOKE_ATTEMPTS + 1):
+        try:
+            await get_async_redis("session").set(key, value, ex=ttl)
+            return
+        except redis.RedisError as e:
+            logger.error(f"Error recording token revocation (attempt {attempt}): {str(e)}")
+            if attempt < _REVOKE_ATTEMPTS:
+                await asyncio.sleep(_REVOKE_RETRY_SECONDS * attempt)
+    raise RevocationUnavailableError()
+
+def revoke_token_claims(claims: Dict[str, Any]):
+    if claims.get("jti"):
+        _set_revocation(_revoked_key(claims["jti"]), 1, _token_ttl(claims))
+
+async def revoke_token_claims_async(claims: Dict[str, Any]):
+    if claims.get("jti"):
+        await _set_revocation_async(_revoked_key(claims["jti"]), 1, _token_ttl(claims))
+
+def _revoked_before_ttl() -> int:
+    # Older tokens have all expired once a full token lifetime has passed
+    return settings.JWT_SETTINGS["ACCESS_TOKEN_EXPIRE_MINUTES"] * 60 + 1
+
+def revoke_subject_tokens(subject: Any):
+    """
+    Revoke every token of a user issued until now
+    """
+    _set_revocation(_revoked_before_key(subject), time.time(), _revoked_before_ttl())
+
+async def revoke_subject_tokens_async(subject: Any):
+    await _set_revocation_async(_revoked_before_key(subject), time.time(), _revoked_before_ttl())
+
+def check_token_status(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Validate signature and expiry locally and check revocation in Redis.
+    Returns the claims of a valid token, None otherwise.
+    """
+    claims = decode_token(token)
+    if claims is None or is_token_revoked(claims):
+        return None
+    return claims
+
+async def check_token_status_async(token: str) -> Optional[Dict[str, Any]]:
+    claims = decode_token(token)
+    if claims is None or await is_token_revoked_async(claims):
+        return None
+    return claims
\ No newline at end of file
@@ -0,0 +1,123 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# Normalized statement text -> fingerprint id, shared by every request of the process
+_fingerprint_ids: Dict[str, int] = {}
+_fingerprint_sql: List[str] = []
+# Raw statement -> fingerprint id, so a known statement is never normalized twice
+_statement_ids: Dict[str, int] = {}
+_STATEMENT_CACHE_SIZE = 10000
+_lock = threading.Lock()
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_LITERALS = re.compile(r"%\(\w+\)s|%s|\?|'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(statement: str) -> str:
+    """
+    Replace bind parameters and literals with `?`, collapse IN lists and whitespace,
+    so the same query with different values shares one fingerprint
+    """
+    normalized = _LITERALS.sub("?", statement)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return _IN_LIST.sub("IN (...)", normalized)
+
+def fingerprint(statement: str) -> int:
+    """
+    Interned fingerprint id of a statement
+    """
+    fid = _statement_ids.get(statement)
+    if fid is not None:
+        return fid
+    normalized = normalize_sql(statement)
+    with _lock:
+        fid = _fingerprint_ids.get(normalized)
+        if fid is None:
+            fid = len(_fingerprint_sql)
+            _fingerprint_sql.append(normalized)
+            _fingerprint_ids[normalized] = fid
+        if len(_statement_ids) < _STATEMENT_CACHE_SIZE:
+            _statement_ids[statement] = fid
+    return fid
+
+def fingerprint_sql(fid: int) -> str:
+    return _fingerprint_sql[fid]
+
+class QueryStats:
+    """Aggregated timings of one fingerprint"""
+    __slots__ = ("count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, elapsed_ns: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+class RequestQueries:
+    """
+    SQL statements executed while handling one request.
+
+    Compact mode only keeps count / total / max time per fingerprint; debug mode
+    (settings.SQL_DEBUG) additionally keeps every statement with its parameters.
+    """
+    __slots__ = ("stats", "debug", "statements")
+
+    def __init__(self, debug: bool = False):
+        self.stats: Dict[int, QueryStats] = {}
+        self.debug = debug
+        self.statements: List[Dict[str, Any]] = []
+
+    def record(self, statement: str, elapsed_ns: int, parameters: Any = None) -> int:
+        fid = fingerprint(statement)
+        stats = self.stats.get(fid)
+        if stats is None:
+            stats = self.stats[fid] = QueryStats()
+        stats.add(elapsed_ns)
+        if self.debug:
+            self.statements.append({
+                "query": statement,
+                "parameters": str(parameters),
+                "execution_time": round(elapsed_ns / 1e9, 4)
+            })
+        return fid
+
+    @property
+    def count(self) -> int:
+        return sum(stats.count for stats in self.stats.values())
+
+    @property
+    def total_ns(self) -> int:
+        return sum(stats.total_ns for stats in self.stats.values())
+
+    def to_list(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        JSON-friendly per-fingerprint summary, most expensive fingerprints first
+        """
+        ordered = sorted(self.stats.items(), key=lambda item: item[1].total_ns, reverse=True)
+        summary = [
+            {
+                "fingerprint": fid,
+                "query": fingerprint_sql(fid),
+                "count": stats.count,
+                "total_ms": round(stats.total_ns / 1e6, 3),
+                "max_ms": round(stats.max_ns / 1e6, 3)
+            }
+            for fid, stats in ordered[:limit]
+        ]
+        return summary
+
+    def to_dict(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        {"fingerprints": to_list()} plus, in debug mode, "statements": every
+        statement with its parameters, in execution order
+        """
+        queries: Dict[str, Any] = {"fingerprints": self.to_list(limit)}
+        if self.debug:
+            queries["statements"] = self.statements[:limit]
+        return queries
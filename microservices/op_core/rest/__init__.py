@@ -1,3 +1,15 @@
+from .discovery import Endpoint, EndpointResolver, endpoint_resolvers
+from .http import ServiceClients, service_clients
+from .loader import BatchLoader
+from .response_cache import ResponseCache
+from .resilience import Resilience, CircuitBreaker, CircuitOpenError, circuit_breakers
 from .user import UserClient, UserCreate, UserUpdate
 
-__all__ = ['UserClient', 'UserCreate', 'UserUpdate'] 
\ No newline at end of file
+__all__ = [
+    'Endpoint', 'EndpointResolver', 'endpoint_resolvers',
+    'ServiceClients', 'service_clients',
+    'BatchLoader',
+    'ResponseCache',
+    'Resilience', 'CircuitBreaker', 'CircuitOpenError', 'circuit_breakers',
+    'UserClient', 'UserCreate', 'UserUpdate'
+]
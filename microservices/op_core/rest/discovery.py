@@ -0,0 +1,146 @@
+import random
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import httpx
+from op_core.core.config import settings
+from op_core.core.metrics import registry as metrics_registry
+
+logger = logging.getLogger(__name__)
+
+class Endpoint:
+    """One instance of an upstream service and its load balancing state"""
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+
+class EndpointResolver:
+    """
+    Client-side load balancing over the instances of one upstream service.
+
+    pick() uses power-of-two-choices: of two random healthy instances, the one
+    with fewer outstanding requests wins. An instance is ejected after
+    UNHEALTHY_THRESHOLD failed health checks or connect errors in a row and
+    readmitted by its next successful health check. When every instance is
+    ejected all of them are used again, rather than failing every call.
+    """
+    def __init__(self, service: str, urls: List[str]):
+        if not urls:
+            raise ValueError(f"No instances configured for service '{service}'")
+        self.service = service
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.health_path = settings.DISCOVERY["HEALTH_PATH"]
+        self.interval = settings.DISCOVERY["HEALTH_INTERVAL_SECONDS"]
+        self.health_timeout = settings.DISCOVERY["HEALTH_TIMEOUT_SECONDS"]
+        self.unhealthy_threshold = max(settings.DISCOVERY["UNHEALTHY_THRESHOLD"], 1)
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self) -> Endpoint:
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.healthy] or self.endpoints
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+    @contextmanager
+    def track(self, endpoint: Endpoint):
+        """
+        Count a request as outstanding on `endpoint`; connect errors count towards ejection
+        """
+        endpoint.outstanding += 1
+        try:
+            yield endpoint
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            self.record_failure(endpoint)
+            raise
+        finally:
+            endpoint.outstanding -= 1
+
+    def record_failure(self, endpoint: Endpoint):
+        endpoint.failures += 1
+        if endpoint.healthy and endpoint.failures >= self.unhealthy_threshold:
+            endpoint.healthy = False
+            logger.warning(f"Ejected {self.service} instance {endpoint.url} after {endpoint.failures} failures")
+
+    def record_success(self, endpoint: Endpoint):
+        endpoint.failures = 0
+        if not endpoint.healthy:
+            endpoint.healthy = True
+            logger.info(f"Readmitted {self.service} instance {endpoint.url}")
+
+    def start(self, client: httpx.AsyncClient):
+        """
+        Start the background health checks (no-op with a single instance or when running)
+        """
+        if len(self.endpoints) < 2 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.ensure_future(self._run(client))
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, client: httpx.AsyncClient):
+        while not client.is_closed:
+            await asyncio.gather(*(self.check(client, endpoint) for endpoint in self.endpoints))
+            await asyncio.sleep(self.interval)
+
+    async def check(self, client: httpx.AsyncClient, endpoint: Endpoint):
+        try:
+            response = await client.get(f"{endpoint.url}{self.health_path}", timeout=self.health_timeout)
+            healthy = response.status_code == 200
+        except httpx.HTTPError as e:
+            # Ejected instances fail every check until they recover, log only the way down
+            if endpoint.healthy:
+                logger.error(f"Health check of {self.service} instance {endpoint.url} failed: {str(e)}")
+            healthy = False
+        if healthy:
+            self.record_success(endpoint)
+        else:
+            self.record_failure(endpoint)
+
+class EndpointResolvers:
+    def __init__(self):
+        self.resolvers: Dict[str, EndpointResolver] = {}
+
+    def get(self, service: str) -> EndpointResolver:
+        resolver = self.resolvers.get(service)
+        if resolver is None:
+            resolver = self.resolvers[service] = EndpointResolver(service, settings.service_instances(service))
+        return resolver
+
+    async def aclose(self):
+        for resolver in list(self.resolvers.values()):
+            await resolver.stop()
+
+endpoint_resolvers = EndpointResolvers()
+
+metrics_registry.gauge(
+    "upstream_endpoint_healthy",
+    "1 while an upstream instance receives traffic, 0 while it is ejected",
+    ("upstream", "endpoint"),
+    collect=lambda: {
+        (resolver.service, endpoint.url): int(endpoint.healthy)
+        for resolver in list(endpoint_resolvers.resolvers.values())
+        for endpoint in resolver.endpoints
+    }
+)
+
+metrics_registry.gauge(
+    "upstream_endpoint_outstanding",
+    "In-flight requests per upstream instance",
+    ("upstream", "endpoint"),
+    collect=lambda: {
+        (resolver.service, endpoint.url): endpoint.outstanding
+        for resolver in list(endpoint_resolvers.resolvers.values())
+        for endpoint in resolver.endpoints
+    }
+)
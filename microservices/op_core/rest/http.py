@@ -0,0 +1,100 @@
+import re
+import time
+import logging
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Dict
+import httpx
+from op_core.core.config import settings
+from op_core.core.metrics import UPSTREAM_REQUEST_DURATION
+from op_core.rest.discovery import endpoint_resolvers
+
+logger = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def _latency_hooks(upstream: str) -> Dict[str, list]:
+    async def start_timer(request: httpx.Request):
+        request.extensions["start_time"] = time.perf_counter()
+
+    async def observe_latency(response: httpx.Response):
+        # Latency up to the response headers, per endpoint template
+        request = response.request
+        start_time = request.extensions.get("start_time")
+        if start_time is not None:
+            UPSTREAM_REQUEST_DURATION.observe(
+                time.perf_counter() - start_time,
+                upstream,
+                request.method,
+                _ID_SEGMENT.sub("/{id}", request.url.path),
+                str(response.status_code)
+            )
+
+    return {"request": [start_timer], "response": [observe_latency]}
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+class ServiceClients:
+    """
+    One long-lived httpx.AsyncClient per upstream service, so calls reuse
+    keep-alive connections instead of connecting (and handshaking) every time.
+    Clients are created by the app lifespan (see lifespan()) or on first use,
+    and closed on shutdown.
+    """
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, service: str) -> httpx.AsyncClient:
+        client = self._clients.get(service)
+        if client is None or client.is_closed:
+            client = self._clients[service] = self._create(service)
+        return client
+
+    def _create(self, service: str) -> httpx.AsyncClient:
+        config = settings.http_client(service)
+        http2 = config["HTTP2"]
+        if http2 and not _http2_available():
+            logger.warning("HTTP_CLIENT['HTTP2'] is on but the h2 package is missing, using HTTP/1.1")
+            http2 = False
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config["MAX_CONNECTIONS"],
+                max_keepalive_connections=config["MAX_KEEPALIVE_CONNECTIONS"],
+                keepalive_expiry=config["KEEPALIVE_EXPIRY"]
+            ),
+            timeout=httpx.Timeout(
+                connect=config["CONNECT_TIMEOUT"],
+                read=config["READ_TIMEOUT"],
+                write=config["WRITE_TIMEOUT"],
+                pool=config["POOL_TIMEOUT"]
+            ),
+            event_hooks=_latency_hooks(service)
+        )
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    def lifespan(self, *services: str):
+        """
+        FastAPI lifespan creating the clients of `services` (and starting the
+        health checks of their instances) at startup, and closing every client
+        at shutdown.
+        Usage:
+            app = FastAPI(lifespan=service_clients.lifespan("users"))
+        """
+        @asynccontextmanager
+        async def lifespan(app):
+            for service in services:
+                endpoint_resolvers.get(service).start(self.get(service))
+            try:
+                yield
+            finally:
+                await endpoint_resolvers.aclose()
+                await self.aclose()
+        return lifespan
+
+service_clients = ServiceClients()
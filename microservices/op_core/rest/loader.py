@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from op_core.core.deadline import (
+    DeadlineExceeded,
+    request_deadline_var,
+    deadline_from_caller_var,
+    remaining_seconds
+)
+
+logger = logging.getLogger(__name__)
+
+# batch_fn(keys) -> {key: value}; keys left out of the result resolve to None
+BatchFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+class BatchLoader:
+    """
+    DataLoader-style coalescing of single-key lookups.
+
+    load(key) calls made in the same event loop tick (or within `delay`
+    seconds of the first one) are merged into one batch_fn(keys) call of at
+    most `max_batch_size` distinct keys; concurrent loads of the same key
+    share one result.
+    A batch serves several requests, so it runs in a clean context whose
+    deadline is the longest of its callers' (none if one caller has none);
+    each caller still gives up at its own deadline with DeadlineExceeded.
+    Usage:
+        loader = BatchLoader(fetch_users, max_batch_size=100)
+        user = await loader.load(user_id)
+    """
+    def __init__(self, batch_fn: BatchFn, max_batch_size: int, delay: float = 0.0):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(max_batch_size, 1)
+        self.delay = delay
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._handle: Optional[asyncio.Handle] = None
+        # (deadline, from_caller) of every load() in the pending batch
+        self._deadlines: List[Tuple[Optional[float], bool]] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any:
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = loop.create_future()
+        self._deadlines.append((request_deadline_var.get(), deadline_from_caller_var.get()))
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._handle is None:
+            if self.delay > 0:
+                self._handle = loop.call_later(self.delay, self._dispatch)
+            else:
+                self._handle = loop.call_soon(self._dispatch)
+
+        # Shielded: one caller giving up must not cancel the load for the others
+        remaining = remaining_seconds()
+        if remaining is None:
+            return await asyncio.shield(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(remaining, 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Request deadline exceeded while waiting for a batched load")
+
+    def _dispatch(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        deadlines, self._deadlines = self._deadlines, []
+        if batch:
+            # Fresh context: nothing of the caller that happened to open the batch leaks into it
+            context = contextvars.Context()
+            context.run(self._set_deadline, deadlines)
+            task = context.run(asyncio.ensure_future, self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _set_deadline(deadlines: List[Tuple[Optional[float], bool]]):
+        if not deadlines or any(deadline is None for deadline, _ in deadlines):
+            return
+        deadline, from_caller = max(deadlines, key=lambda item: (item[0], not item[1]))
+        request_deadline_var.set(deadline)
+        deadline_from_caller_var.set(from_caller)
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future]):
+        try:
+            results = await self.batch_fn(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Batch load error ({len(batch)} keys): {str(e)}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
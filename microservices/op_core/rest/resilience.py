@@ -0,0 +1,238 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+import httpx
+from op_core.core.config import settings
+from op_core.core.deadline import DeadlineExceeded, remaining_seconds, deadline_from_caller
+from op_core.core.metrics import registry as metrics_registry, UPSTREAM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Upstream answers worth another attempt (the request was not processed or may succeed elsewhere)
+RETRYABLE_STATUS = {502, 503, 504}
+
+# Below this budget an attempt is not sent, and a timeout is the deadline's rather than the upstream's
+MIN_ATTEMPT_SECONDS = 0.01
+
+class CircuitOpenError(Exception):
+    """The upstream endpoint is failing, calls are rejected without being sent"""
+    def __init__(self, name: str):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    closed -> open after `failure_threshold` failures in a row; open -> half-open
+    after `reset_seconds`, letting `half_open_probes` calls through; a successful
+    probe closes the circuit, a failed one opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float, half_open_probes: int):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self.probes = 0
+            if self.state == self.HALF_OPEN:
+                if self.probes < self.half_open_probes:
+                    self.probes += 1
+                    return True
+                return False
+            return self.state == self.CLOSED
+
+    def release(self):
+        """
+        End a call that says nothing about the upstream (cancelled, or the
+        caller's deadline ran out): gives back its half-open probe, if any
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+class CircuitBreakers:
+    def __init__(self):
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.get(name)
+                if breaker is None:
+                    breaker = self.breakers[name] = CircuitBreaker(
+                        name,
+                        settings.RESILIENCE["BREAKER_FAILURE_THRESHOLD"],
+                        settings.RESILIENCE["BREAKER_RESET_SECONDS"],
+                        settings.RESILIENCE["BREAKER_HALF_OPEN_PROBES"]
+                    )
+        return breaker
+
+circuit_breakers = CircuitBreakers()
+
+metrics_registry.gauge(
+    "upstream_circuit_open",
+    "1 while the circuit breaker of an upstream endpoint is open or half-open",
+    ("circuit",),
+    collect=lambda: {
+        (name,): int(breaker.state != CircuitBreaker.CLOSED)
+        for name, breaker in list(circuit_breakers.breakers.items())
+    }
+)
+
+# send(timeout) performs one attempt; timeout is the request's remaining budget (None: no deadline)
+Send = Callable[[Optional[float]], Awaitable[httpx.Response]]
+
+class Resilience:
+    """
+    Retries, circuit breaking, deadline enforcement and hedging for calls to one upstream.
+
+    - Idempotent calls retry transport errors and 502/503/504 with full-jitter
+      exponential backoff; non-idempotent calls only retry connect failures,
+      where the request never reached the upstream.
+    - Each endpoint has its own circuit breaker; an open circuit fails the call
+      immediately with CircuitOpenError.
+    - Attempts and backoff never outlive the incoming request's deadline
+      (DeadlineMiddleware); running out raises DeadlineExceeded. It only
+      counts as a breaker failure when the deadline is the service's own
+      budget: a short X-Request-Timeout-Ms must not open the circuit for
+      every other caller.
+    - Hedged calls send a second copy after HEDGE_DELAY_MS if the first has not
+      answered and take whichever succeeds first.
+    """
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.attempts = max(settings.RESILIENCE["RETRY_ATTEMPTS"], 1)
+        self.base_delay = settings.RESILIENCE["RETRY_BASE_DELAY_MS"] / 1000
+        self.max_delay = settings.RESILIENCE["RETRY_MAX_DELAY_MS"] / 1000
+        self.hedge_delay = settings.RESILIENCE["HEDGE_DELAY_MS"] / 1000
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def _retryable_error(e: Exception, idempotent: bool) -> bool:
+        if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        return idempotent and isinstance(e, httpx.TransportError)
+
+    async def call(self, endpoint: str, send: Send, idempotent: bool = True, hedge: bool = False) -> httpx.Response:
+        breaker = circuit_breakers.get(f"{self.upstream}:{endpoint}")
+        for attempt in range(self.attempts):
+            last_attempt = attempt == self.attempts - 1
+            remaining = remaining_seconds()
+            if remaining is not None and remaining <= MIN_ATTEMPT_SECONDS:
+                raise DeadlineExceeded(f"No time left to call {self.upstream} {endpoint}")
+            if not breaker.allow():
+                raise CircuitOpenError(breaker.name)
+
+            try:
+                if hedge and idempotent and self.hedge_delay > 0:
+                    response = await self._within(self._hedged(endpoint, send, remaining), remaining)
+                else:
+                    response = await self._within(send(remaining), remaining)
+            except DeadlineExceeded:
+                self._record_deadline(breaker)
+                raise
+            except httpx.TimeoutException as e:
+                if self._deadline_reached():
+                    # The attempt's timeout had been cut down to the request's remaining budget
+                    self._record_deadline(breaker)
+                    raise DeadlineExceeded(f"Request deadline exceeded while calling {self.upstream} {endpoint}") from e
+                breaker.record_failure()
+                if last_attempt or not self._retryable_error(e, idempotent):
+                    raise
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if last_attempt or not self._retryable_error(e, idempotent):
+                    raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if last_attempt or not idempotent:
+                    return response
+
+            UPSTREAM_RETRIES.inc(self.upstream, endpoint, "retry")
+            delay = self.backoff(attempt)
+            remaining = remaining_seconds()
+            if remaining is not None:
+                delay = min(delay, max(remaining, 0))
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _deadline_reached() -> bool:
+        remaining = remaining_seconds()
+        return remaining is not None and remaining <= MIN_ATTEMPT_SECONDS
+
+    @staticmethod
+    def _record_deadline(breaker: CircuitBreaker):
+        if deadline_from_caller():
+            breaker.release()
+        else:
+            breaker.record_failure()
+
+    @staticmethod
+    async def _within(awaitable: Awaitable[httpx.Response], remaining: Optional[float]) -> httpx.Response:
+        if remaining is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Request deadline exceeded while waiting for the upstream")
+
+    async def _hedged(self, endpoint: str, send: Send, remaining: Optional[float]) -> httpx.Response:
+        tasks = {asyncio.ensure_future(send(remaining))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done:
+                UPSTREAM_RETRIES.inc(self.upstream, endpoint, "hedge")
+                tasks.add(asyncio.ensure_future(send(remaining_seconds())))
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
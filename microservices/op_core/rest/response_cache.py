@@ -0,0 +1,168 @@
+import re
+import json
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+import redis
+from op_core.core.config import settings
+from op_core.core.local_cache import LocalCache
+from op_core.core.metrics import CACHE_REQUESTS
+from op_core.core.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+def freshness(response: httpx.Response) -> Optional[int]:
+    """
+    Seconds a response may be reused without revalidation (Cache-Control
+    max-age; 0 for no-cache), None when it must not be stored
+    """
+    cache_control = response.headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    return 0 if "ETag" in response.headers else None
+
+def is_private(response: httpx.Response) -> bool:
+    """
+    Cache-Control: private, i.e. meant for the credentials that fetched it only
+    """
+    return "private" in response.headers.get("Cache-Control", "").lower()
+
+class CacheEntry:
+    def __init__(self, body: Any, etag: Optional[str], expires: float):
+        self.body = body
+        self.etag = etag
+        self.expires = expires
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def dumps(self) -> str:
+        return json.dumps({"body": self.body, "etag": self.etag, "expires": self.expires})
+
+    @classmethod
+    def loads(cls, raw: str) -> "CacheEntry":
+        entry = json.loads(raw)
+        return cls(entry["body"], entry["etag"], entry["expires"])
+
+# send(headers) performs the GET with the given conditional headers
+Send = Callable[[Dict[str, str]], Awaitable[httpx.Response]]
+
+class ResponseCache:
+    """
+    Client-side cache of upstream GET responses (JSON bodies), keyed by the
+    caller (e.g. path scoped by the credential, see UserClient).
+
+    An entry is served without a request while fresh (its response's max-age),
+    then kept RETENTION_SECONDS longer so the next fetch revalidates it with
+    If-None-Match: a 304 makes it fresh again at the cost of an empty response.
+    Entries live in an in-process LRU, backed by the cache Redis DB (shared by
+    all workers) when HTTP_CACHE['REDIS'] is on; `private` responses never leave
+    the process. Times are wall clock, so entries read from Redis stay comparable
+    across workers.
+    """
+    def __init__(self, name: str):
+        self.namespace = f"http:{name}"
+        self.retention = settings.HTTP_CACHE["RETENTION_SECONDS"]
+        # Entry lifetimes are passed per set(), the LRU only bounds the size
+        self.local = LocalCache(self.namespace, settings.HTTP_CACHE["MAX_ENTRIES"], float("inf"))
+
+    def _redis_key(self, key: str) -> str:
+        return f"{settings.CACHE['KEY_PREFIX']}:{self.namespace}:{key}"
+
+    def _lifetime(self, entry: CacheEntry) -> float:
+        return entry.expires - time.time() + self.retention
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        if not settings.HTTP_CACHE["ENABLED"]:
+            return None
+        entry = self.local.get(key)
+        if entry is None and settings.HTTP_CACHE["REDIS"]:
+            try:
+                raw = await get_async_redis(settings.CACHE["DATABASE"]).get(self._redis_key(key))
+                entry = CacheEntry.loads(raw) if raw is not None else None
+            except (redis.RedisError, ValueError, KeyError) as e:
+                logger.error(f"Response cache read error ({self.namespace}): {str(e)}")
+                entry = None
+            if entry is not None:
+                self.local.set(key, entry, ttl=self._lifetime(entry))
+        return entry
+
+    async def store_many(self, items: List[Tuple[str, Any, Optional[str], Optional[int]]], private: bool = False):
+        """
+        Store (key, body, etag, max_age) items; max_age None (or 0 without an ETag) is not cacheable.
+        `private` items are only kept in the in-process LRU.
+        """
+        if not settings.HTTP_CACHE["ENABLED"]:
+            return
+        entries = []
+        for key, body, etag, max_age in items:
+            if max_age is None or (max_age <= 0 and not etag):
+                continue
+            entry = CacheEntry(body, etag, time.time() + max_age)
+            self.local.set(key, entry, ttl=self._lifetime(entry))
+            entries.append((key, entry))
+        if entries and settings.HTTP_CACHE["REDIS"] and not private:
+            try:
+                pipeline = get_async_redis(settings.CACHE["DATABASE"]).pipeline(transaction=False)
+                for key, entry in entries:
+                    pipeline.set(self._redis_key(key), entry.dumps(), ex=max(int(self._lifetime(entry)), 1))
+                await pipeline.execute()
+            except redis.RedisError as e:
+                logger.error(f"Response cache write error ({self.namespace}): {str(e)}")
+
+    async def store(self, key: str, body: Any, etag: Optional[str], max_age: Optional[int], private: bool = False):
+        await self.store_many([(key, body, etag, max_age)], private)
+
+    async def discard(self, *keys: str):
+        """
+        Drop entries after a write through this client
+        """
+        if not settings.HTTP_CACHE["ENABLED"] or not keys:
+            return
+        self.local.discard(*keys)
+        if settings.HTTP_CACHE["REDIS"]:
+            try:
+                await get_async_redis(settings.CACHE["DATABASE"]).delete(*(self._redis_key(key) for key in keys))
+            except redis.RedisError as e:
+                logger.error(f"Response cache invalidate error ({self.namespace}): {str(e)}")
+
+    async def fetch(self, key: str, send: Send, entry: Optional[CacheEntry] = None) -> Any:
+        """
+        GET through the cache: fresh entries cost nothing, stale ones a conditional request.
+        Pass `entry` when it was already read with get().
+        """
+        if entry is None:
+            entry = await self.get(key)
+        if entry is not None and entry.fresh:
+            CACHE_REQUESTS.inc(self.namespace, "hit")
+            return entry.body
+
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+        response = await send(headers)
+        if response.status_code == 304 and entry is not None:
+            CACHE_REQUESTS.inc(self.namespace, "revalidated")
+            max_age = freshness(response)
+            if max_age is None:
+                # Still valid for this request, but no longer storable
+                await self.discard(key)
+            else:
+                await self.store(key, entry.body, response.headers.get("ETag", entry.etag), max_age, is_private(response))
+            return entry.body
+
+        CACHE_REQUESTS.inc(self.namespace, "miss")
+        response.raise_for_status()
+        body = response.json()
+        max_age = freshness(response)
+        if max_age is None and entry is not None:
+            await self.discard(key)
+        await self.store(key, body, response.headers.get("ETag"), max_age, is_private(response))
+        return body
@@ -1,10 +1,19 @@
-from typing import Optional, Dict, Any
+import asyncio
+import hashlib
+from typing import Optional, Dict, Any, List
 import httpx
 from pydantic import BaseModel
 import json
 import sys
 from pprint import pprint
+from op_core.core.config import settings
+from op_core.core.deadline import DeadlineExceeded
 from op_core.core.debug import debug_request, debug_response, debug_error
+from op_core.rest.discovery import EndpointResolver, endpoint_resolvers
+from op_core.rest.http import service_clients
+from op_core.rest.loader import BatchLoader
+from op_core.rest.resilience import Resilience, CircuitOpenError
+from op_core.rest.response_cache import ResponseCache, freshness, is_private
 from fastapi import HTTPException, status
 
 
@@ -23,157 +32,283 @@ class UserUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 class UserClient:
-    def __init__(self, base_url: str, token: Optional[str] = None):
-        self.base_url = base_url.rstrip('/')
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        timeout: Optional[float] = None,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        # Instances of the users service: all configured replicas (load balanced,
+        # health checked), or only `base_url` when one is given
+        if base_url is None:
+            self.resolver = endpoint_resolvers.get("users")
+        else:
+            self.resolver = EndpointResolver("users", [base_url])
+        self.base_url = self.resolver.endpoints[0].url
+        # Routes of users_service are mounted under {api_prefix}/user
+        self.api_path = f"{settings.SERVICES['users']['api_prefix']}/user"
+        self.api_url = f"{self.base_url}{self.api_path}"
         self.token = token
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}" if token else ""
         }
-        self.timeout = 30.0  # 30 seconds timeout
+        # Per-call timeout (seconds); None keeps the pooled client's HTTP_CLIENT timeouts
+        self.timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        # Shared keep-alive client of the users service, owned by the app lifespan
+        self.client = client
+        self.resilience = Resilience("users")
+        # Concurrent get_user calls are coalesced into users:batchGet requests
+        self.loader = BatchLoader(
+            self._load_users,
+            settings.BATCH_GET["MAX_IDS"],
+            settings.BATCH_GET["COALESCE_DELAY_MS"] / 1000
+        )
+        # User responses by path, revalidated with their ETag once stale. Responses
+        # depend on the caller's token (auth, revocation): entries are scoped by a
+        # digest of it, so a body fetched with one token is never served to another
+        self.response_cache = ResponseCache("users")
+        self.cache_scope = hashlib.sha256(token.encode()).hexdigest()[:32] if token else "anonymous"
+
+    def _cache_key(self, user_id: int) -> str:
+        return f"{self.cache_scope}:{self.api_path}/users/{user_id}"
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self.client or service_clients.get("users")
+
+    def _timeout(self, remaining: Optional[float]):
+        if remaining is None:
+            return self.timeout
+        if isinstance(self.timeout, (int, float)):
+            return min(self.timeout, remaining)
+        return remaining
+
+    async def _request(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        idempotent: bool = True,
+        hedge: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send `path` to an instance of the users service through the resilience layer
+        (retries, circuit breaker, deadline, hedging), forwarding the remaining deadline.
+        Every attempt (and hedge) picks its own instance.
+        """
+        self.resolver.start(self.http)
+        request_headers = {**self.headers, **(headers or {})}
+
+        async def send(remaining: Optional[float]) -> httpx.Response:
+            headers = dict(request_headers)
+            if remaining is not None:
+                headers[settings.RESILIENCE["DEADLINE_HEADER"]] = str(max(int(remaining * 1000), 0))
+            with self.resolver.track(self.resolver.pick()) as instance:
+                return await self.http.request(
+                    method,
+                    f"{instance.url}{path}",
+                    headers=headers,
+                    timeout=self._timeout(remaining),
+                    **kwargs
+                )
+
+        return await self.resilience.call(endpoint, send, idempotent=idempotent, hedge=hedge)
 
     async def health_check(self) -> bool:
         """
         Check if user service is available
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(
-                    f"{self.base_url}/health",
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                return True
-            except Exception as e:
-                debug_error(e)
-                return False
+        try:
+            response = await self._request(
+                "health_check",
+                "GET",
+                "/health"
+            )
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            debug_error(e)
+            return False
 
     async def create_user(self, user_data: UserCreate) -> Dict[str, Any]:
         """
         Tạo user mới và trả về thông tin user bao gồm ID
         """
-        async with httpx.AsyncClient() as client:
-            try:
-             
-                response = await client.post(
-                    f"http://host.docker.internal:8000/api/v1/user/register",
-                    json=user_data.dict(),
-                    headers=self.headers,
-                    timeout=self.timeout
-                )
+        try:
          
-                response.raise_for_status()
-                return response.json()
-            except httpx.TimeoutException:
-                raise HTTPException(
-                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
-                    detail="User service request timeout"
-                )
-            except httpx.ConnectError:
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="User service is not available"
-                )
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=str(e)
-                )
+            response = await self._request(
+                "create_user",
+                "POST",
+                f"{self.api_path}/register",
+                json=user_data.dict(),
+                idempotent=False
+            )
+         
+            response.raise_for_status()
+            return response.json()
+        except (httpx.TimeoutException, DeadlineExceeded):
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="User service request timeout"
+            )
+        except (httpx.ConnectError, CircuitOpenError):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="User service is not available"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e)
+            )
 
     async def get_user(self, user_id: int) -> Dict[str, Any]:
         """
         Lấy thông tin user theo ID
+        (từ cache nếu còn mới, revalidate bằng ETag nếu đã cũ; nếu chưa có thì
+        gộp với các get_user đồng thời khác thành một request users:batchGet)
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/api/v1/users/{user_id}",
-                headers=self.headers
+        path = f"{self.api_path}/users/{user_id}"
+        key = self._cache_key(user_id)
+        entry = await self.response_cache.get(key)
+        if entry is not None:
+            return await self.response_cache.fetch(
+                key,
+                lambda headers: self._request("get_user", "GET", path, hedge=True, headers=headers),
+                entry
             )
-            response.raise_for_status()
-            return response.json()
+
+        user = await self.loader.load(user_id)
+        if user is None:
+            # Same error as GET /users/{id} for callers checking the status code
+            request = httpx.Request("GET", f"{self.api_url}/users/{user_id}")
+            response = httpx.Response(status.HTTP_404_NOT_FOUND, json={"detail": "User not found"}, request=request)
+            raise httpx.HTTPStatusError("User not found", request=request, response=response)
+        return user
+
+    async def get_users(self, user_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Lấy nhiều user theo danh sách ID; ID không tồn tại bị bỏ qua
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        size = settings.BATCH_GET["MAX_IDS"]
+        chunks = await asyncio.gather(*(
+            self._batch_get(user_ids[i:i + size]) for i in range(0, len(user_ids), size)
+        ))
+        return [user for chunk in chunks for user in chunk]
+
+    async def _batch_get(self, user_ids: List[int]) -> List[Dict[str, Any]]:
+        response = await self._request(
+            "batch_get_users",
+            "POST",
+            f"{self.api_path}/users:batchGet",
+            json={"ids": user_ids},
+            hedge=True
+        )
+        response.raise_for_status()
+        data = response.json()
+        # Seed the cache of get_user with the ETag of each user
+        max_age = freshness(response)
+        etags = data.get("etags", {})
+        await self.response_cache.store_many([
+            (self._cache_key(user["id"]), user, etags.get(str(user["id"])), max_age)
+            for user in data["users"]
+        ], is_private(response))
+        return data["users"]
+
+    async def _load_users(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        return {user["id"]: user for user in await self.get_users(user_ids)}
 
     async def update_user(self, user_id: int, user_data: UserUpdate) -> Dict[str, Any]:
         """
         Cập nhật thông tin user
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                f"{self.base_url}/api/v1/users/{user_id}",
-                json=user_data.dict(exclude_unset=True),
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request(
+            "update_user",
+            "PUT",
+            f"{self.api_path}/users/{user_id}",
+            json=user_data.dict(exclude_unset=True)
+        )
+        await self.response_cache.discard(self._cache_key(user_id))
+        response.raise_for_status()
+        return response.json()
 
     async def delete_user(self, user_id: int) -> None:
         """
         Xóa user
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{self.base_url}/api/v1/users/{user_id}",
-                headers=self.headers
-            )
-            response.raise_for_status()
+        response = await self._request(
+            "delete_user",
+            "DELETE",
+            f"{self.api_path}/users/{user_id}"
+        )
+        await self.response_cache.discard(self._cache_key(user_id))
+        response.raise_for_status()
 
     async def verify_otp(self, user_id: int, otp: str) -> Dict[str, Any]:
         """
         Xác thực OTP cho user
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/api/v1/users/{user_id}/verify-otp",
-                json={"otp": otp},
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request(
+            "verify_otp",
+            "POST",
+            f"{self.api_path}/users/{user_id}/verify-otp",
+            json={"otp": otp},
+            idempotent=False
+        )
+        response.raise_for_status()
+        return response.json()
 
     async def resend_otp(self, user_id: int) -> Dict[str, Any]:
         """
         Gửi lại OTP cho user
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/api/v1/users/{user_id}/resend-otp",
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request(
+            "resend_otp",
+            "POST",
+            f"{self.api_path}/users/{user_id}/resend-otp",
+            idempotent=False
+        )
+        response.raise_for_status()
+        return response.json()
 
     async def verify_credentials(self, username: str, password: str) -> Dict[str, Any]:
         """
         Verify user credentials
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                # Debug request
-                debug_request(
-                    method="POST",
-                    url=f"{self.base_url}/api/v1/users/verify",
-                    headers=self.headers,
-                    data={
-                        "username": username,
-                        "password": "***"  # Hide password in debug
-                    }
-                )
-                
-                response = await client.post(
-                    f"{self.base_url}/api/v1/users/verify",
-                    json={"username": username, "password": password},
-                    headers=self.headers
-                )
-                
-                # Debug response
-                debug_response(
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                    body=response.json()
-                )
-                
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                debug_error(e)
-                raise 
\ No newline at end of file
+        try:
+            # Debug request
+            debug_request(
+                method="POST",
+                url=f"{self.api_url}/users/verify",
+                headers=self.headers,
+                data={
+                    "username": username,
+                    "password": "***"  # Hide password in debug
+                }
+            )
+            
+            response = await self._request(
+                "verify_credentials",
+                "POST",
+                f"{self.api_path}/users/verify",
+                json={"username": username, "password": password},
+                idempotent=False
+            )
+            
+            # Debug response
+            debug_response(
+                status_code=response.status_code,
+                headers=dict(response.headers),
+                body=response.json()
+            )
+            
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            debug_error(e)
+            raise 
\ No newline at end of file
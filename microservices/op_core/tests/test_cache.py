@@ -0,0 +1,91 @@
+import json
+import pytest
+import fakeredis
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from op_core.core import cache
+from op_core.core.cache import cached_lookup, cache_key, invalidate
+
+Base = declarative_base()
+
+class Account(Base):
+    __tablename__ = "accounts"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String(255))
+    password = Column(String(255))
+
+@cached_lookup(Account, "account:id", exclude=("password",))
+def get_account(db, account_id: int):
+    get_account.queries += 1
+    return db.query(Account).filter(Account.id == account_id).first()
+
+get_account.queries = 0
+
+@pytest.fixture
+def cache_redis(monkeypatch):
+    monkeypatch.setitem(cache.settings.CACHE, "ENABLED", True)
+    # No probabilistic early refresh: hits are deterministic
+    monkeypatch.setitem(cache.settings.CACHE, "EARLY_REFRESH_BETA", 0)
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "get_sync_redis", lambda name="default": client)
+    get_account.queries = 0
+    return client
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(Account(id=1, email="a@example.com", password="hash"))
+        db.commit()
+    yield factory
+    engine.dispose()
+
+def test_excluded_columns_never_reach_redis(cache_redis, session_factory):
+    with session_factory() as db:
+        assert get_account(db, 1).password == "hash"
+    raw = cache_redis.get(cache_key("account:id", 1))
+    assert json.loads(raw)["row"] == {"id": 1, "email": "a@example.com"}
+    assert "hash" not in raw
+
+def test_hit_skips_the_query_and_loads_excluded_columns_on_access(cache_redis, session_factory):
+    with session_factory() as db:
+        get_account(db, 1)
+    with session_factory() as db:
+        account = get_account(db, 1)
+        assert account.email == "a@example.com"
+        assert get_account.queries == 1
+        # Lazy loaded from the database, not from the cache
+        assert account.password == "hash"
+
+def test_uncached_write_and_invalidate_evicts_the_row(cache_redis, session_factory):
+    with session_factory() as db:
+        get_account(db, 1)
+    with session_factory() as db:
+        account = get_account.uncached(db, 1)
+        account.email = "b@example.com"
+        db.commit()
+        invalidate("account:id", 1)
+    assert cache_redis.get(cache_key("account:id", 1)) is None
+    with session_factory() as db:
+        assert get_account(db, 1).email == "b@example.com"
+    assert get_account.queries == 3
+
+def test_redis_errors_fall_back_to_the_database(monkeypatch, session_factory):
+    monkeypatch.setitem(cache.settings.CACHE, "ENABLED", True)
+
+    class BrokenRedis:
+        def get(self, key):
+            raise cache.redis.ConnectionError("Redis is down")
+
+        def set(self, *args, **kwargs):
+            raise cache.redis.ConnectionError("Redis is down")
+
+    monkeypatch.setattr(cache, "get_sync_redis", lambda name="default": BrokenRedis())
+    with session_factory() as db:
+        assert get_account(db, 1).email == "a@example.com"
+
+def test_cache_keys_ignore_email_case():
+    assert cache_key("user:email", "A@Example.com") == cache_key("user:email", "a@example.com")
@@ -0,0 +1,87 @@
+import time
+import asyncio
+import pytest
+from op_core.core.deadline import (
+    DeadlineExceeded,
+    request_deadline_var,
+    deadline_from_caller_var,
+    remaining_seconds,
+    deadline_from_caller
+)
+from op_core.rest.loader import BatchLoader
+
+def recording_batch_fn(delay: float = 0.0):
+    """
+    batch_fn returning {key: key * 10} and recording keys and the deadline it ran with
+    """
+    batches = []
+
+    async def batch_fn(keys):
+        batches.append({"keys": keys, "remaining": remaining_seconds(), "from_caller": deadline_from_caller()})
+        if delay:
+            await asyncio.sleep(delay)
+        return {key: key * 10 for key in keys if key < 100}
+
+    batch_fn.batches = batches
+    return batch_fn
+
+async def load_with_deadline(loader: BatchLoader, key, seconds: float):
+    # Each gather()ed coroutine runs in its own copy of the context, like separate requests
+    request_deadline_var.set(time.monotonic() + seconds)
+    deadline_from_caller_var.set(True)
+    return await loader.load(key)
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_are_coalesced_and_deduplicated():
+    batch_fn = recording_batch_fn()
+    loader = BatchLoader(batch_fn, max_batch_size=10)
+    results = await asyncio.gather(*(loader.load(key) for key in [1, 2, 2, 3, 1, 500]))
+    assert results == [10, 20, 20, 30, 10, None]
+    assert [batch["keys"] for batch in batch_fn.batches] == [[1, 2, 3, 500]]
+
+@pytest.mark.asyncio
+async def test_batches_are_split_at_max_batch_size():
+    batch_fn = recording_batch_fn()
+    loader = BatchLoader(batch_fn, max_batch_size=2)
+    assert await asyncio.gather(*(loader.load(key) for key in [1, 2, 3])) == [10, 20, 30]
+    assert [batch["keys"] for batch in batch_fn.batches] == [[1, 2], [3]]
+
+@pytest.mark.asyncio
+async def test_batch_error_reaches_every_caller():
+    async def batch_fn(keys):
+        raise RuntimeError("upstream down")
+
+    loader = BatchLoader(batch_fn, max_batch_size=10)
+    results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+@pytest.mark.asyncio
+async def test_short_caller_deadline_does_not_fail_coalesced_loads():
+    """One request's tiny deadline must not fail the other requests sharing its batch"""
+    batch_fn = recording_batch_fn(delay=0.05)
+    loader = BatchLoader(batch_fn, max_batch_size=10)
+    short, long = await asyncio.gather(
+        load_with_deadline(loader, 10, 0.0000001),
+        load_with_deadline(loader, 11, 5),
+        return_exceptions=True
+    )
+    assert isinstance(short, DeadlineExceeded)
+    assert long == 110
+
+    # The batch ran with the longest deadline of its callers
+    [batch] = batch_fn.batches
+    assert batch["keys"] == [10, 11]
+    assert 4 < batch["remaining"] <= 5
+    assert batch["from_caller"] is True
+
+@pytest.mark.asyncio
+async def test_batch_without_deadline_when_a_caller_has_none():
+    batch_fn = recording_batch_fn()
+    loader = BatchLoader(batch_fn, max_batch_size=10)
+
+    async def load_without_deadline(key):
+        request_deadline_var.set(None)
+        return await loader.load(key)
+
+    await asyncio.gather(load_with_deadline(loader, 1, 1), load_without_deadline(2))
+    assert batch_fn.batches[0]["remaining"] is None
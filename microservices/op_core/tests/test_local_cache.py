@@ -0,0 +1,94 @@
+import json
+import pytest
+from op_core.core import local_cache as local_cache_module
+from op_core.core.local_cache import InvalidationBus, LocalCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(local_cache_module, "time", clock)
+    return clock
+
+def test_value_invalidated_mid_load_is_dropped():
+    cache = LocalCache("users", max_entries=10, ttl=30)
+    version = cache.version
+    # ... the value is being loaded when another request invalidates the key
+    cache.discard(1)
+    cache.set(1, "stale", since=version)
+    assert cache.get(1) is None
+
+    version = cache.version
+    cache.set(1, "fresh", since=version)
+    assert cache.get(1) == "fresh"
+
+def test_invalidation_of_any_key_drops_values_loaded_since():
+    # The version is per cache, so the check errs on the side of dropping
+    cache = LocalCache("users", max_entries=10, ttl=30)
+    version = cache.version
+    cache.discard(2)
+    cache.set(1, "value", since=version)
+    assert cache.get(1) is None
+
+def test_entries_expire_after_the_shorter_ttl(clock):
+    cache = LocalCache("users", max_entries=10, ttl=30)
+    cache.set(1, "default ttl")
+    cache.set(2, "short ttl", ttl=5)
+    cache.set(3, "capped ttl", ttl=60)
+    cache.set(4, "expired", ttl=0)
+    clock.now += 10
+    assert cache.get(2) is None
+    assert cache.get(4) is None
+    assert cache.get(1) == "default ttl"
+    clock.now += 25
+    assert cache.get(1) is None
+    assert cache.get(3) is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LocalCache("users", max_entries=2, ttl=30)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")
+    assert cache.get(2) is None
+    assert cache.get(1) == "a" and cache.get(3) == "c"
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+def test_entries_are_not_served_while_unsubscribed(monkeypatch):
+    bus = InvalidationBus("test:invalidate")
+    monkeypatch.setattr(bus, "ready", lambda: False)
+    cache = bus.cache("users", max_entries=10, ttl=30)
+    cache.set(1, "a")
+    assert cache.get(1) is None
+
+def test_bus_messages_invalidate_other_workers(monkeypatch):
+    bus = InvalidationBus("test:invalidate")
+    monkeypatch.setattr(bus, "ready", lambda: True)
+    cache = bus.cache("users", max_entries=10, ttl=30)
+    cache.set(1, "a")
+    cache.set((1, "x"), "tuple key")
+    cache.set(2, "b")
+
+    # As received from another worker's publish()
+    bus._apply(json.dumps({"cache": "users", "keys": [1, [1, "x"]]}))
+    assert cache.get(1) is None
+    assert cache.get((1, "x")) is None
+    assert cache.get(2) == "b"
+
+    bus._apply("not json")
+    bus._apply(json.dumps({"cache": "unknown", "keys": [2]}))
+    assert cache.get(2) == "b"
+
+def test_resubscribe_clears_every_cache(monkeypatch):
+    bus = InvalidationBus("test:invalidate")
+    monkeypatch.setattr(bus, "ready", lambda: True)
+    cache = bus.cache("users", max_entries=10, ttl=30)
+    cache.set(1, "a")
+    bus._clear_all()
+    assert cache.get(1) is None
@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import subprocess
+import sys
+from op_core.core.metrics import MetricsRegistry, merge_snapshots, render_text
+
+def worker_snapshot(requests: int, latency: float, breaker_open: int):
+    """Snapshot of one worker with a counter, a histogram and a gauge"""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests", ("route",)).inc("/users", amount=requests)
+    registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)).observe(latency, "/users")
+    registry.gauge("breaker_open", "Open breakers", ("breaker",), collect=lambda: {("users",): breaker_open})
+    return registry.snapshot()
+
+def by_name(families):
+    return {family["name"]: family for family in families}
+
+def test_merge_sums_counters_and_histograms_and_keeps_gauges_per_worker():
+    merged = by_name(merge_snapshots({
+        "101": worker_snapshot(2, 0.05, 1),
+        "102": worker_snapshot(3, 0.5, 0)
+    }))
+    assert merged["requests_total"]["series"] == [[["/users"], 5]]
+    [[labels, (counts, total, count)]] = merged["latency_seconds"]["series"]
+    assert counts == [1, 1, 0]
+    assert count == 2 and abs(total - 0.55) < 1e-9
+
+    gauge = merged["breaker_open"]
+    assert gauge["labelnames"] == ["breaker", "pid"]
+    assert sorted(gauge["series"]) == [[["users", "101"], 1], [["users", "102"], 0]]
+
+def test_render_text():
+    text = render_text(merge_snapshots({"101": worker_snapshot(2, 0.05, 1)}))
+    lines = text.splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/users"} 2' in lines
+    assert 'latency_seconds_bucket{route="/users",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/users",le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{route="/users",le="+Inf"} 1' in lines
+    assert 'latency_seconds_count{route="/users"} 1' in lines
+    assert 'breaker_open{breaker="users",pid="101"} 1' in lines
+    assert text.endswith("\n")
+
+def test_render_text_escapes_label_values():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors", ("message",)).inc('say "hi"\n')
+    assert 'errors_total{message="say \\"hi\\"\\n"} 1' in render_text(registry.snapshot())
+
+def test_collect_prunes_snapshots_of_exited_and_stalled_workers(tmp_path):
+    registry = MetricsRegistry(str(tmp_path), snapshot_interval=5)
+    registry.counter("requests_total", "Requests", ("route",)).inc("/users")
+
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    stalled_path = tmp_path / f"{os.getppid()}.json"
+    for path in (tmp_path / f"{exited.pid}.json", stalled_path):
+        path.write_text(json.dumps(worker_snapshot(10, 0.05, 1)))
+    stale = time.time() - 60
+    os.utime(stalled_path, (stale, stale))
+
+    merged = by_name(registry.collect())
+    assert merged["requests_total"]["series"] == [[["/users"], 1]]
+    assert sorted(os.listdir(tmp_path)) == [f"{os.getpid()}.json"]
@@ -0,0 +1,270 @@
+import pytest
+import pytest_asyncio
+import fakeredis
+from op_core.core import rate_limit
+from op_core.core.middleware import fingerprint_body
+from op_core.core.rate_limit import LocalRateLimiter, RateLimiter, RateLimitPolicy, RateLimitResult, STRATEGIES
+
+class Clock:
+    """Stands in for the time module of rate_limit: wall and monotonic time move together"""
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    # One second into a 60 s window
+    clock = Clock(1_700_000_040.0 + 1)
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+def limiter_with(client, policy: RateLimitPolicy) -> RateLimiter:
+    limiter = RateLimiter(client)
+    limiter.policies = [("", policy)]
+    return limiter
+
+async def hits(limiter: RateLimiter, count: int, ip: str = "10.0.0.1", path: str = "/api", body_hash: str = ""):
+    return [await limiter.hit(ip, path, body_hash) for _ in range(count)]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", list(STRATEGIES))
+async def test_strategy_allows_limit_then_rejects(strategy, clock, redis_client):
+    limiter = limiter_with(redis_client, RateLimitPolicy("total", strategy, max_requests=3, window=60))
+    results = await hits(limiter, 4)
+    assert [result.allowed for result in results] == [True, True, True, False]
+    rejected = results[-1]
+    assert rejected.reason == RateLimitResult.LIMIT
+    assert 0 < rejected.wait_seconds <= 60
+
+    # Other clients have their own budget
+    assert (await limiter.hit("10.0.0.2", "/api")).allowed
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", ["sliding_window_log", "sliding_window_counter", "gcra"])
+async def test_strategy_allows_again_after_retry_after(strategy, clock, redis_client):
+    limiter = limiter_with(redis_client, RateLimitPolicy("total", strategy, max_requests=3, window=60))
+    *_, rejected = await hits(limiter, 4)
+    assert not rejected.allowed
+
+    clock.advance(rejected.wait_seconds - 0.5)
+    assert not (await limiter.hit("10.0.0.1", "/api")).allowed
+    clock.advance(0.5)
+    assert (await limiter.hit("10.0.0.1", "/api")).allowed
+
+@pytest.mark.asyncio
+async def test_gcra_spreads_requests_after_burst(clock, redis_client):
+    limiter = limiter_with(redis_client, RateLimitPolicy("total", "gcra", max_requests=3, window=60))
+    *_, rejected = await hits(limiter, 4)
+    # One request every window / limit seconds once the burst is spent
+    assert rejected.wait_seconds == pytest.approx(20, abs=0.01)
+
+@pytest.mark.asyncio
+async def test_sliding_window_counter_weighs_previous_window(clock, redis_client):
+    limiter = limiter_with(redis_client, RateLimitPolicy("total", "sliding_window_counter", max_requests=4, window=60))
+    assert all(result.allowed for result in await hits(limiter, 4))
+
+    # Half way into the next window half of the previous window's 4 requests still count
+    clock.advance(59 + 30)
+    results = await hits(limiter, 3)
+    assert [result.allowed for result in results] == [True, True, False]
+
+    # Retry-After points at the first millisecond the previous window's share drops enough
+    assert results[-1].wait_seconds == pytest.approx(0.001)
+    clock.advance(0.001)
+    assert (await limiter.hit("10.0.0.1", "/api")).allowed
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimitPolicy("total", "leaky", max_requests=3, window=60)
+
+def test_policy_for_uses_longest_prefix(monkeypatch):
+    monkeypatch.setitem(rate_limit.settings.RATE_LIMIT, "ROUTES", {
+        "/api": {"max_requests": 10},
+        "/api/v1/user/login": {"strategy": "gcra", "max_requests": 2}
+    })
+    limiter = RateLimiter(fakeredis.FakeAsyncRedis())
+    assert limiter.policy_for("/api/v1/user/login").strategy == "gcra"
+    assert limiter.policy_for("/api/v1/user/me").max_requests == 10
+    assert limiter.policy_for("/health").name == "total"
+
+@pytest_asyncio.fixture
+async def local_limiters(redis_client):
+    """
+    Factory of local pre-limiters (one per simulated worker) synced by hand
+    """
+    limiters = []
+
+    def create(max_keys: int = 100) -> LocalRateLimiter:
+        limiter = LocalRateLimiter(redis_client, max_keys, sync_interval_ms=60000)
+        limiters.append(limiter)
+        return limiter
+
+    yield create
+    for limiter in limiters:
+        if limiter._sync_task is not None:
+            limiter._sync_task.cancel()
+
+LOCAL_POLICY = RateLimitPolicy("total", "fixed_window", max_requests=3, window=60, local=True)
+
+def synced_count(redis_client, key: str, clock: Clock):
+    window_start = int(clock.time() * 1000) - int(clock.time() * 1000) % 60000
+    return redis_client.get(f"{key}:{window_start}")
+
+@pytest.mark.asyncio
+async def test_local_bucket_limits_without_redis(clock, local_limiters, redis_client):
+    limiter = local_limiters()
+    results = [limiter.hit("a", LOCAL_POLICY) for _ in range(4)]
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert results[-1].reason == RateLimitResult.LIMIT
+    assert await redis_client.keys("*") == []
+
+@pytest.mark.asyncio
+async def test_sync_enforces_the_global_count_of_all_workers(clock, local_limiters, redis_client):
+    first, second = local_limiters(), local_limiters()
+    assert all(first.hit("a", LOCAL_POLICY).allowed for _ in range(2))
+    await first.sync()
+    assert all(second.hit("a", LOCAL_POLICY).allowed for _ in range(2))
+    await second.sync()
+    assert await synced_count(redis_client, "a", clock) == "4"
+
+    # The second worker learnt the cross-worker total in its sync: limited despite local tokens
+    result = second.hit("a", LOCAL_POLICY)
+    assert not result.allowed
+    assert result.count == 4
+
+    # The first one only learns it with its next sync, overshooting by at most one interval's requests
+    assert first.hit("a", LOCAL_POLICY).allowed
+    await first.sync()
+    assert not first.hit("a", LOCAL_POLICY).allowed
+
+@pytest.mark.asyncio
+async def test_eviction_keeps_unsynced_counts(clock, local_limiters, redis_client):
+    limiter = local_limiters(max_keys=1)
+    limiter.hit("a", LOCAL_POLICY)
+    limiter.hit("a", LOCAL_POLICY)
+    limiter.hit("b", LOCAL_POLICY)
+    assert list(limiter.entries) == ["b"]
+
+    await limiter.sync()
+    assert await synced_count(redis_client, "a", clock) == "2"
+    assert await synced_count(redis_client, "b", clock) == "1"
+    assert limiter._evicted == []
+
+@pytest.mark.asyncio
+async def test_failed_sync_keeps_counts_for_the_next_one(clock, local_limiters, redis_client):
+    limiter = local_limiters(max_keys=1)
+    limiter.hit("a", LOCAL_POLICY)
+    limiter.hit("b", LOCAL_POLICY)
+    sync_script = limiter._sync_script
+
+    async def broken_script(keys, args):
+        raise ConnectionError("Redis is down")
+
+    limiter._sync_script = broken_script
+    await limiter.sync()
+    assert limiter.entries["b"].pending == 1
+    assert [entry.redis_key for entry in limiter._evicted] == ["a"]
+
+    limiter._sync_script = sync_script
+    await limiter.sync()
+    assert await synced_count(redis_client, "a", clock) == "1"
+    assert await synced_count(redis_client, "b", clock) == "1"
+
+@pytest.mark.asyncio
+async def test_local_counts_reset_with_the_window(clock, local_limiters):
+    limiter = local_limiters()
+    assert all(limiter.hit("a", LOCAL_POLICY).allowed for _ in range(3))
+    clock.advance(60)
+    assert limiter.hit("a", LOCAL_POLICY).allowed
+    assert limiter.entries["a"].pending == 1
+
+@pytest.mark.asyncio
+async def test_local_route_checks_cooldown_before_taking_a_token(clock, redis_client):
+    policy = RateLimitPolicy("/register", "fixed_window", max_requests=3, window=60, local=True, cooldown=5)
+    limiter = limiter_with(redis_client, policy)
+    try:
+        assert (await limiter.hit("10.0.0.1", "/register", "body")).allowed
+        rejected = await limiter.hit("10.0.0.1", "/register", "body")
+        assert rejected.reason == RateLimitResult.COOLDOWN
+        entry = limiter.local.entries["rate_limit:local:/register:10.0.0.1"]
+        assert entry.pending == 1
+        assert entry.tokens == pytest.approx(2)
+    finally:
+        limiter.local._sync_task.cancel()
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", list(STRATEGIES))
+async def test_cooldown_blocks_same_fingerprint_only(strategy, clock, redis_client):
+    policy = RateLimitPolicy("/register", strategy, max_requests=100, window=60, cooldown=5)
+    limiter = limiter_with(redis_client, policy)
+    assert (await limiter.hit("10.0.0.1", "/register", "first")).allowed
+
+    rejected = await limiter.hit("10.0.0.1", "/register", "first")
+    assert rejected.reason == RateLimitResult.COOLDOWN
+    assert rejected.wait_seconds == pytest.approx(5)
+    # Another body, or another client, is not a duplicate
+    assert (await limiter.hit("10.0.0.1", "/register", "second")).allowed
+    assert (await limiter.hit("10.0.0.2", "/register", "first")).allowed
+
+    clock.advance(4)
+    assert (await limiter.hit("10.0.0.1", "/register", "first")).wait_seconds == pytest.approx(1)
+    clock.advance(1)
+    assert (await limiter.hit("10.0.0.1", "/register", "first")).allowed
+
+@pytest.mark.asyncio
+async def test_cooldown_rejection_is_not_counted(clock, redis_client):
+    policy = RateLimitPolicy("/register", "fixed_window", max_requests=2, window=60, cooldown=5)
+    limiter = limiter_with(redis_client, policy)
+    results = await hits(limiter, 3, path="/register", body_hash="same")
+    assert [result.reason for result in results] == [None, RateLimitResult.COOLDOWN, RateLimitResult.COOLDOWN]
+    assert (await limiter.hit("10.0.0.1", "/register", "other")).allowed
+
+def body_receive(*chunks: bytes):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    received = []
+
+    async def receive():
+        message = messages.pop(0)
+        received.append(message)
+        return message
+
+    receive.received = received
+    return receive
+
+def body_scope(length: int):
+    return {"type": "http", "headers": [(b"content-length", str(length).encode())]}
+
+@pytest.mark.asyncio
+async def test_fingerprint_reads_a_bounded_prefix_and_replays_it():
+    chunks = (b"a" * 10, b"b" * 10, b"c" * 10)
+    receive = body_receive(*chunks)
+    digest, replay = await fingerprint_body(body_scope(30), receive, limit=15)
+    # Stops reading once the prefix is hashed
+    assert len(receive.received) == 2
+    assert [(await replay())["body"] for _ in chunks] == list(chunks)
+
+    same_prefix, _ = await fingerprint_body(body_scope(30), body_receive(b"a" * 10, b"b" * 10, b"x" * 10), limit=15)
+    other_length, _ = await fingerprint_body(body_scope(31), body_receive(b"a" * 10, b"b" * 10, b"c" * 11), limit=15)
+    assert same_prefix == digest
+    assert other_length != digest
+
+@pytest.mark.asyncio
+async def test_empty_body_has_no_fingerprint():
+    digest, replay = await fingerprint_body(body_scope(0), body_receive(b""), limit=15)
+    assert digest == ""
+    assert (await replay())["body"] == b""
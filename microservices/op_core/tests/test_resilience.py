@@ -0,0 +1,189 @@
+import time
+import asyncio
+import pytest
+import httpx
+from op_core.core.config import settings
+from op_core.core.deadline import DeadlineExceeded, request_deadline_var, deadline_from_caller_var
+from op_core.rest.resilience import Resilience, CircuitBreaker, CircuitOpenError, circuit_breakers
+
+@pytest.fixture(autouse=True)
+def resilience_settings(monkeypatch):
+    """
+    Fast backoff, fresh breakers for every test
+    """
+    monkeypatch.setitem(settings.RESILIENCE, "RETRY_ATTEMPTS", 3)
+    monkeypatch.setitem(settings.RESILIENCE, "RETRY_BASE_DELAY_MS", 1)
+    monkeypatch.setitem(settings.RESILIENCE, "BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setitem(settings.RESILIENCE, "BREAKER_HALF_OPEN_PROBES", 1)
+    monkeypatch.setitem(settings.RESILIENCE, "HEDGE_DELAY_MS", 0)
+    circuit_breakers.breakers.clear()
+    yield
+    circuit_breakers.breakers.clear()
+
+def with_deadline(seconds: float, from_caller: bool):
+    """
+    Run the rest of the test as a request with a deadline, as DeadlineMiddleware would
+    """
+    request_deadline_var.set(time.monotonic() + seconds)
+    deadline_from_caller_var.set(from_caller)
+
+def responder(*statuses, delay: float = 0.0):
+    """
+    send() answering the given statuses in order (the last one repeats)
+    """
+    calls = []
+
+    async def send(timeout):
+        calls.append(timeout)
+        if delay:
+            await asyncio.sleep(delay)
+        status_code = statuses[min(len(calls), len(statuses)) - 1]
+        if isinstance(status_code, Exception):
+            raise status_code
+        return httpx.Response(status_code)
+
+    send.calls = calls
+    return send
+
+@pytest.mark.asyncio
+async def test_idempotent_call_retries_retryable_status():
+    send = responder(503, 502, 200)
+    response = await Resilience("users").call("get_user", send)
+    assert response.status_code == 200
+    assert len(send.calls) == 3
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_is_not_retried_after_reaching_upstream():
+    send = responder(503)
+    response = await Resilience("users").call("create_user", send, idempotent=False)
+    assert response.status_code == 503
+    assert len(send.calls) == 1
+
+    send = responder(httpx.ReadTimeout("slow"))
+    with pytest.raises(httpx.ReadTimeout):
+        await Resilience("users").call("create_user", send, idempotent=False)
+    assert len(send.calls) == 1
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_retries_connect_errors():
+    send = responder(httpx.ConnectError("refused"), 201)
+    response = await Resilience("users").call("create_user", send, idempotent=False)
+    assert response.status_code == 201
+    assert len(send.calls) == 2
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_consecutive_failures():
+    resilience = Resilience("users")
+    with pytest.raises(httpx.ConnectError):
+        await resilience.call("get_user", responder(httpx.ConnectError("refused")))
+    assert circuit_breakers.get("users:get_user").state == CircuitBreaker.OPEN
+
+    send = responder(200)
+    with pytest.raises(CircuitOpenError):
+        await resilience.call("get_user", send)
+    assert send.calls == []
+
+@pytest.mark.asyncio
+async def test_caller_deadline_does_not_open_breaker():
+    """A client sending a tiny X-Request-Timeout-Ms must not open the circuit for everyone"""
+    resilience = Resilience("users")
+    with_deadline(0.05, from_caller=True)
+    for _ in range(5):
+        with pytest.raises(DeadlineExceeded):
+            await resilience.call("get_user", responder(200, delay=1))
+    assert circuit_breakers.get("users:get_user").state == CircuitBreaker.CLOSED
+
+    with_deadline(10, from_caller=False)
+    response = await resilience.call("get_user", responder(200))
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_caller_deadline_timeout_from_transport_does_not_open_breaker():
+    """The transport timeout is cut to the remaining budget, its expiry is the caller's"""
+    resilience = Resilience("users")
+
+    async def send(timeout):
+        await asyncio.sleep(timeout - 0.001)
+        raise httpx.ReadTimeout("budget")
+
+    with_deadline(0.05, from_caller=True)
+    for _ in range(5):
+        with pytest.raises(DeadlineExceeded):
+            await resilience.call("get_user", send)
+    assert circuit_breakers.get("users:get_user").state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_own_deadline_timeouts_open_breaker():
+    resilience = Resilience("users")
+    for _ in range(3):
+        with_deadline(0.05, from_caller=False)
+        with pytest.raises(DeadlineExceeded):
+            await resilience.call("get_user", responder(200, delay=1))
+    assert circuit_breakers.get("users:get_user").state == CircuitBreaker.OPEN
+
+@pytest.mark.asyncio
+async def test_half_open_allows_one_probe_and_closes_on_success():
+    resilience = Resilience("users")
+    breaker = circuit_breakers.get("users:get_user")
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.opened_at -= settings.RESILIENCE["BREAKER_RESET_SECONDS"]
+
+    probe = asyncio.ensure_future(resilience.call("get_user", responder(200, delay=0.05)))
+    await asyncio.sleep(0.01)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await resilience.call("get_user", responder(200))
+
+    assert (await probe).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_half_open_probe_ended_by_caller_deadline_is_given_back():
+    resilience = Resilience("users")
+    breaker = circuit_breakers.get("users:get_user")
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.opened_at -= settings.RESILIENCE["BREAKER_RESET_SECONDS"]
+
+    with_deadline(0.05, from_caller=True)
+    with pytest.raises(DeadlineExceeded):
+        await resilience.call("get_user", responder(200, delay=1))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    with_deadline(10, from_caller=False)
+    response = await resilience.call("get_user", responder(200))
+    assert response.status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+@pytest.mark.asyncio
+async def test_hedge_returns_first_answer_and_cancels_loser():
+    resilience = Resilience("users")
+    resilience.hedge_delay = 0.01
+    started, cancelled = [], []
+
+    async def send(timeout):
+        attempt = len(started)
+        started.append(attempt)
+        try:
+            # The first copy hangs, the hedge answers
+            await asyncio.sleep(1 if attempt == 0 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return httpx.Response(200, json={"attempt": attempt})
+
+    response = await resilience.call("get_user", send, hedge=True)
+    await asyncio.sleep(0)
+    assert response.json() == {"attempt": 1}
+    assert started == [0, 1]
+    assert cancelled == [0]
+
+@pytest.mark.asyncio
+async def test_hedging_skipped_for_non_idempotent_calls():
+    resilience = Resilience("users")
+    resilience.hedge_delay = 0.01
+    send = responder(201, delay=0.05)
+    response = await resilience.call("create_user", send, idempotent=False, hedge=True)
+    assert response.status_code == 201
+    assert len(send.calls) == 1
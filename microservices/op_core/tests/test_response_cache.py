@@ -0,0 +1,75 @@
+import pytest
+import httpx
+import fakeredis
+from op_core.core.config import settings
+from op_core.rest import response_cache as response_cache_module
+from op_core.rest.response_cache import ResponseCache
+from op_core.rest.user.client import UserClient
+
+@pytest.fixture
+def cache_redis(monkeypatch):
+    """
+    Response cache backed by a fake Redis shared with a second cache instance (another worker)
+    """
+    monkeypatch.setitem(settings.HTTP_CACHE, "ENABLED", True)
+    monkeypatch.setitem(settings.HTTP_CACHE, "REDIS", True)
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(response_cache_module, "get_async_redis", lambda name="default": client)
+    return client
+
+def responder(status_code: int, cache_control: str, etag: str = 'W/"1"', body=None):
+    sent = []
+
+    async def send(headers):
+        sent.append(headers)
+        return httpx.Response(
+            status_code,
+            json=body if status_code == 200 else None,
+            headers={"ETag": etag, "Cache-Control": cache_control},
+            request=httpx.Request("GET", "http://users/users/1")
+        )
+
+    send.sent = sent
+    return send
+
+@pytest.mark.asyncio
+async def test_shared_responses_reach_other_workers(cache_redis):
+    await ResponseCache("users").fetch("key", responder(200, "max-age=60", body={"id": 1}))
+    send = responder(200, "max-age=60", body={"id": 2})
+    assert await ResponseCache("users").fetch("key", send) == {"id": 1}
+    assert send.sent == []
+
+@pytest.mark.asyncio
+async def test_private_responses_stay_in_process(cache_redis):
+    cache = ResponseCache("users")
+    await cache.fetch("key", responder(200, "private, max-age=60", body={"id": 1}))
+    assert await cache_redis.keys("*") == []
+
+    send = responder(200, "private, max-age=60", body={"id": 1})
+    await cache.fetch("key", send)
+    assert send.sent == []
+    await ResponseCache("users").fetch("key", send)
+    assert len(send.sent) == 1
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_revalidated(cache_redis):
+    cache = ResponseCache("users")
+    await cache.fetch("key", responder(200, "private, no-cache", body={"id": 1}))
+    send = responder(304, "private, max-age=60")
+    assert await cache.fetch("key", send) == {"id": 1}
+    assert send.sent == [{"If-None-Match": 'W/"1"'}]
+    assert (await cache.get("key")).fresh
+
+@pytest.mark.asyncio
+async def test_not_modified_but_no_store_drops_entry(cache_redis):
+    cache = ResponseCache("users")
+    await cache.fetch("key", responder(200, "no-cache", body={"id": 1}))
+    assert await cache.fetch("key", responder(304, "no-store")) == {"id": 1}
+    assert await cache.get("key") is None
+    assert await cache_redis.keys("*") == []
+
+def test_user_client_cache_keys_are_scoped_by_token():
+    first, second = UserClient(token="first"), UserClient(token="second")
+    assert first._cache_key(1) == UserClient(token="first")._cache_key(1)
+    assert first._cache_key(1) != second._cache_key(1)
+    assert "first" not in first._cache_key(1)
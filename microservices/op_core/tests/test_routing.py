@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, text, table, column, select, update
+from sqlalchemy.orm import sessionmaker
+from op_core.core.routing import PrimaryPin, ReplicaSet, RoutingSession
+
+rows = table("t", column("v"))
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """
+    Sessions over a primary and a replica whose single row names the database
+    """
+    engines = {}
+    for name in ("primary", "replica"):
+        engine = engines[name] = create_engine(f"sqlite:///{tmp_path}/{name}.db")
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE t (v TEXT)"))
+            connection.execute(text(f"INSERT INTO t VALUES ('{name}')"))
+    yield sessionmaker(bind=engines["primary"], class_=RoutingSession, replicas=ReplicaSet([engines["replica"]]))
+    for engine in engines.values():
+        engine.dispose()
+
+def read(session) -> str:
+    return session.execute(select(rows.c.v)).scalar()
+
+def test_reads_go_to_replica_until_write(session_factory):
+    with session_factory(prefer_replica=True) as session:
+        assert read(session) == "replica"
+        session.execute(update(rows).values(v="written"))
+        assert read(session) == "written"
+
+def test_write_pins_other_sessions_of_the_request(session_factory):
+    """A write through get_db must send reads of get_read_db's session to the primary"""
+    pin = PrimaryPin()
+    with session_factory(pin=pin) as db, session_factory(prefer_replica=True, pin=pin) as read_db:
+        assert read(read_db) == "replica"
+        db.execute(update(rows).values(v="written"))
+        db.commit()
+        assert read(read_db) == "written"
+
+    # Another request starts unpinned
+    with session_factory(prefer_replica=True, pin=PrimaryPin()) as read_db:
+        assert read(read_db) == "replica"
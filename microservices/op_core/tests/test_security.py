@@ -0,0 +1,107 @@
+import time
+import pytest
+import redis
+import fakeredis
+from op_core.core import security
+from op_core.core.exceptions import RevocationUnavailableError
+from op_core.core.security import (
+    create_access_token,
+    decode_token,
+    is_token_revoked,
+    is_token_revoked_async,
+    revoke_token_claims,
+    revoke_token_claims_async,
+    revoke_subject_tokens,
+    check_token_status
+)
+
+class BrokenRedis:
+    """Client whose every command fails, like a Redis that is down"""
+    def __init__(self):
+        self.calls = 0
+
+    def _fail(self, *args, **kwargs):
+        self.calls += 1
+        raise redis.ConnectionError("Redis is down")
+
+    set = mget = _fail
+
+class BrokenAsyncRedis(BrokenRedis):
+    async def _fail(self, *args, **kwargs):
+        BrokenRedis._fail(self)
+
+    set = mget = _fail
+
+@pytest.fixture
+def session_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    async_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(security, "get_sync_redis", lambda name="default": client)
+    monkeypatch.setattr(security, "get_async_redis", lambda name="default": async_client)
+    return client
+
+@pytest.fixture
+def broken_redis(monkeypatch):
+    client, async_client = BrokenRedis(), BrokenAsyncRedis()
+    monkeypatch.setattr(security, "get_sync_redis", lambda name="default": client)
+    monkeypatch.setattr(security, "get_async_redis", lambda name="default": async_client)
+    monkeypatch.setattr(security, "_REVOKE_RETRY_SECONDS", 0)
+    return client, async_client
+
+def new_claims(subject: int = 1, **extra):
+    return decode_token(create_access_token({"sub": str(subject), **extra}))
+
+def test_revoked_token_is_rejected(session_redis):
+    claims, other = new_claims(), new_claims()
+    assert not is_token_revoked(claims)
+    revoke_token_claims(claims)
+    assert is_token_revoked(claims)
+    assert not is_token_revoked(other)
+    # The key lives as long as the token could still be used
+    assert 0 < session_redis.ttl(f"auth:revoked:{claims['jti']}") <= security._token_ttl(claims)
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected_async(session_redis):
+    claims = new_claims()
+    assert not await is_token_revoked_async(claims)
+    await revoke_token_claims_async(claims)
+    assert await is_token_revoked_async(claims)
+
+def test_subject_cutoff_revokes_only_older_tokens(session_redis):
+    issued_before, other_user = new_claims(1), new_claims(2)
+    revoke_subject_tokens(1)
+    issued_after = new_claims(1, iat=time.time() + 1)
+    assert is_token_revoked(issued_before)
+    assert not is_token_revoked(other_user)
+    assert not is_token_revoked(issued_after)
+
+def test_check_token_status(session_redis):
+    token = create_access_token({"sub": "1"})
+    assert check_token_status(token)["sub"] == "1"
+    revoke_token_claims(decode_token(token))
+    assert check_token_status(token) is None
+    assert check_token_status("not-a-token") is None
+
+def test_validation_fails_closed_when_redis_is_down(broken_redis):
+    assert is_token_revoked(new_claims())
+
+@pytest.mark.asyncio
+async def test_validation_fails_closed_when_redis_is_down_async(broken_redis):
+    assert await is_token_revoked_async(new_claims())
+
+def test_revocation_error_is_raised_after_retries(broken_redis):
+    client, _ = broken_redis
+    with pytest.raises(RevocationUnavailableError) as error:
+        revoke_token_claims(new_claims())
+    assert error.value.status_code == 503
+    assert client.calls == security._REVOKE_ATTEMPTS
+    with pytest.raises(RevocationUnavailableError):
+        revoke_subject_tokens(1)
+
+@pytest.mark.asyncio
+async def test_revocation_error_is_raised_after_retries_async(broken_redis):
+    _, async_client = broken_redis
+    with pytest.raises(RevocationUnavailableError):
+        await revoke_token_claims_async(new_claims())
+    assert async_client.calls == security._REVOKE_ATTEMPTS
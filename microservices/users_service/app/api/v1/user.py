@@ -1,23 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Body
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta, datetime
-from typing import Any, List
+from typing import Any, Dict, List
+import hashlib
+import json
 import time
-from op_core.core import get_db, create_access_token, settings
+from op_core.core import get_db, get_read_db, get_async_db, create_access_token, settings
 from ...crud.user import (
     authenticate_user, create_user, get_user_by_email, 
-    get_user_by_username, get_users, get_user_by_id,
-    update_user, delete_user
+    get_user_by_username, get_users, get_user_by_id, get_users_by_ids,
+    update_user, delete_user, get_user_status, SECRET_COLUMNS
 )
-from ...crud.token import create_user_token, revoke_token, get_user_tokens , get_token
-from ...schemas.user import User, UserCreate, UserUpdate, Token, UserLogin , UserLogout
+from ...crud.token import create_user_token, revoke_token, get_user_tokens , get_token, verify_access_token
+from ...crud import user_async, token_async
+from ...schemas.user import User, UserCreate, UserUpdate, Token, UserLogin , UserLogout, UserBatchGet, UserBatch
 from ...core.constants import UserStatus
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Claims of the bearer token; 401 when it is invalid, expired or revoked
+    """
+    claims = verify_access_token(token)
+    if not claims:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return claims
+
+def _user_etag(user) -> str:
+    # Digest of the user's columns (secrets left out): changes with every write, even
+    # within the second (u_datemodified alone is too coarse). Weak: it identifies the
+    # user's state, not the exact bytes sent.
+    state = {
+        column.key: getattr(user, column.key)
+        for column in user.__table__.columns
+        if column.key not in SECRET_COLUMNS
+    }
+    digest = hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+def _cache_control() -> str:
+    max_age = settings.HTTP_CACHE["MAX_AGE_SECONDS"]
+    return f"private, max-age={max_age}" if max_age > 0 else "private, no-cache"
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    # Weak comparison (RFC 9110 13.1.2)
+    tags = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+    return "*" in tags or etag.replace("W/", "", 1) in tags
+
 # Authentication endpoints
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
 def register(*, db: Session = Depends(get_db), user_in: UserCreate) -> Any:
@@ -55,7 +96,7 @@ def register(*, db: Session = Depends(get_db), user_in: UserCreate) -> Any:
 @router.post("/login", response_model=Token)
 async def login(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Login with username and password, get an access token for future requests.
@@ -63,7 +104,7 @@ async def login(
     try:
         user_data = await request.json()
         login_data = UserLogin(**user_data)
-        user = authenticate_user(db, login_data.username, login_data.password)
+        user = await user_async.authenticate_user(db, login_data.username, login_data.password)
 
         if not user:
             raise HTTPException(
@@ -81,7 +122,7 @@ async def login(
         expires_at = int(time.time() + access_token_expires.total_seconds())
         
         token_data = {
-            "sub": user.id,
+            "sub": str(user.id),  # JWT subject must be a string
             "email": user.email,
             "full_name": user.full_name,
             "status": user.status,
@@ -98,7 +139,7 @@ async def login(
         user_agent = request.headers.get("user-agent", "Unknown")
 
         # Create token record
-        token_created = create_user_token(
+        token_created = await token_async.create_user_token(
             db=db,
             user_id=user.id,
             access_token=access_token,
@@ -114,7 +155,7 @@ async def login(
 
         # Update last login time
         user.u_datelastlogin = int(time.time())
-        db.commit()
+        await db.commit()
 
         return {
             "access_token": access_token,
@@ -132,7 +173,7 @@ async def login(
 @router.post("/logout", status_code=status.HTTP_200_OK)
 async def logout(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> dict:
     """
     Logout user by revoking the current token
@@ -140,7 +181,7 @@ async def logout(
     try:
         user_data = await  request.json()
         logout_data = UserLogout(**user_data)
-        success = revoke_token(db, logout_data.token)
+        success = await token_async.revoke_token(db, logout_data.token)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -158,27 +199,28 @@ async def logout(
 @router.get("/user/sessions", response_model=List[dict])
 def get_user_sessions(
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    token: str = Depends(oauth2_scheme),
+    claims: Dict[str, Any] = Depends(get_token_claims)
 ) -> Any:
     """
     Get all active sessions for the current user
     """
     try:
-        # Get current user's ID from token
-        current_token = get_token(db, token)
-        if not current_token:
+        # Current user's ID from the token (verified without the token table)
+        user_id = int(claims["sub"])
+        if get_user_status(db, user_id) != UserStatus.ACTIVE:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token"
             )
         
-        tokens = get_user_tokens(db, current_token.user_id)
+        tokens = get_user_tokens(db, user_id)
         return [{
-            "device_info": t.device_info,
-            "ip_address": t.ip_address,
-            "created_at": datetime.fromtimestamp(t.created_at),
-            "expires_at": datetime.fromtimestamp(t.expires_at),
-            "is_current": t.access_token == token
+            "device_info": t.uk_device_info,
+            "ip_address": t.uk_ip_address,
+            "created_at": datetime.fromtimestamp(t.uk_created_at),
+            "expires_at": datetime.fromtimestamp(t.uk_expires_at),
+            "is_current": t.uk_access_token == token
         } for t in tokens]
     except HTTPException as e:
         raise e
@@ -191,10 +233,10 @@ def get_user_sessions(
 # User management endpoints
 @router.get("/users", response_model=List[User])
 def list_users(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
-    token: str = Depends(oauth2_scheme)
+    claims: Dict[str, Any] = Depends(get_token_claims)
 ) -> Any:
     """
     Retrieve users.
@@ -208,14 +250,49 @@ def list_users(
             detail=f"An error occurred while retrieving users: {str(e)}"
         )
 
+@router.post("/users:batchGet", response_model=UserBatch)
+def batch_get_users(
+    batch_in: UserBatchGet,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    claims: Dict[str, Any] = Depends(get_token_claims)
+) -> Any:
+    """
+    Get many users by ID with a single query.
+    Duplicate IDs are ignored; IDs without a user are listed in `missing`.
+    """
+    user_ids = list(dict.fromkeys(batch_in.ids))
+    if len(user_ids) > settings.BATCH_GET["MAX_IDS"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_GET['MAX_IDS']} ids per request"
+        )
+    try:
+        users = get_users_by_ids(db, user_ids)
+        found = {user.u_id for user in users}
+        response.headers["Cache-Control"] = _cache_control()
+        return {
+            "users": users,
+            "missing": [user_id for user_id in user_ids if user_id not in found],
+            "etags": {user.u_id: _user_etag(user) for user in users}
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while retrieving users: {str(e)}"
+        )
+
 @router.get("/users/{user_id}", response_model=User)
 def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    claims: Dict[str, Any] = Depends(get_token_claims)
 ) -> Any:
     """
     Get user by ID.
+    Answers 304 Not Modified when If-None-Match holds the current ETag.
     """
     try:
         user = get_user_by_id(db, user_id=user_id)
@@ -224,6 +301,11 @@ def get_user(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
+        etag = _user_etag(user)
+        cache_headers = {"ETag": etag, "Cache-Control": _cache_control()}
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+        response.headers.update(cache_headers)
         return user
     except HTTPException as e:
         raise e
@@ -238,7 +320,7 @@ def update_user_info(
     user_id: int,
     user_in: UserUpdate,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    claims: Dict[str, Any] = Depends(get_token_claims)
 ) -> Any:
     """
     Update user.
@@ -266,7 +348,7 @@ def update_user_info(
 def delete_user_account(
     user_id: int,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    claims: Dict[str, Any] = Depends(get_token_claims)
 ) -> Any:
     """
     Delete user.
@@ -0,0 +1,5 @@
+-- Log retention: indexed logs.created_at used by the scheduled retention job.
+-- Skip this if the logs table was created from the README schema (it already has both).
+ALTER TABLE logs
+    ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD INDEX idx_created_at (created_at);
@@ -0,0 +1,4 @@
+-- Request logs keep a bounded body prefix plus the full response size and hash.
+ALTER TABLE logs
+    ADD COLUMN response_size INT NULL AFTER response_body,
+    ADD COLUMN response_hash VARCHAR(32) NULL AFTER response_size;
@@ -1,5 +1,7 @@
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
+from op_core.core.local_cache import local_cache, invalidation_bus
+from op_core.core.security import decode_token, is_token_revoked, revoke_token_claims, revoke_subject_tokens
 from ..models.token import UserToken
 import time
 
@@ -33,6 +35,33 @@ def get_token(db: Session, access_token: str) -> Optional[UserToken]:
         UserToken.uk_is_active == 1
     ).first()
 
+# Per-worker (L1) cache of the jti of tokens found not revoked, never kept past the token's expiry
+active_tokens = local_cache("active_tokens")
+
+def token_ids(access_tokens: List[str]) -> List[str]:
+    """jti claims of the (still valid) tokens, for L1 invalidation"""
+    ids = []
+    for access_token in access_tokens:
+        claims = decode_token(access_token)
+        if claims and claims.get("jti"):
+            ids.append(claims["jti"])
+    return ids
+
+def verify_access_token(access_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims of a valid access token, None if it is invalid, expired or revoked.
+    Signature and expiry are checked locally, revocation in Redis (L1 cached): no MySQL query.
+    """
+    claims = decode_token(access_token)
+    if not claims or not claims.get("jti"):
+        return None
+    version = active_tokens.version
+    if active_tokens.get(claims["jti"]) is None:
+        if is_token_revoked(claims):
+            return None
+        active_tokens.set(claims["jti"], True, ttl=claims["exp"] - time.time(), since=version)
+    return claims
+
 def get_user_tokens(db: Session, user_id: int) -> List[UserToken]:
     """Get all active tokens for a user"""
     return db.query(UserToken).filter(
@@ -41,20 +70,32 @@ def get_user_tokens(db: Session, user_id: int) -> List[UserToken]:
     ).all()
 
 def revoke_token(db: Session, access_token: str) -> bool:
-    """Revoke a specific token"""
+    """
+    Revoke a specific token.
+    Redis (what token validation checks) is written before the commit: if it
+    fails, RevocationUnavailableError is raised and the token row stays active.
+    """
     token = get_token(db, access_token)
     if token:
+        claims = decode_token(access_token)
+        if claims:
+            revoke_token_claims(claims)
         token.uk_is_active = 0
         db.commit()
+        if claims:
+            invalidation_bus.publish("active_tokens", *token_ids([access_token]))
         return True
     return False
 
 def revoke_all_user_tokens(db: Session, user_id: int) -> bool:
-    """Revoke all tokens for a user"""
+    """Revoke all tokens for a user (Redis first, as in revoke_token)"""
     tokens = get_user_tokens(db, user_id)
+    access_tokens = [token.uk_access_token for token in tokens]
+    revoke_subject_tokens(user_id)
     for token in tokens:
         token.uk_is_active = 0
     db.commit()
+    invalidation_bus.publish("active_tokens", *token_ids(access_tokens))
     return True
 
 def cleanup_expired_tokens(db: Session) -> int:
@@ -0,0 +1,109 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Dict, Any
+from op_core.core.local_cache import invalidation_bus
+from op_core.core.security import (
+    decode_token,
+    is_token_revoked_async,
+    revoke_token_claims_async,
+    revoke_subject_tokens_async
+)
+from ..models.token import UserToken
+from .token import active_tokens, token_ids
+import time
+
+# Async variants of crud/token.py for AsyncSession (get_async_db)
+
+async def create_user_token(
+    db: AsyncSession,
+    user_id: int,
+    access_token: str,
+    device_info: str,
+    ip_address: str,
+    expires_at: int
+) -> UserToken:
+    """Create a new token record"""
+    db_token = UserToken(
+        uk_user_id=user_id,
+        uk_access_token=access_token,
+        uk_device_info=device_info,
+        uk_ip_address=ip_address,
+        uk_created_at=int(time.time()),
+        uk_expires_at=expires_at,
+        uk_is_active=1
+    )
+    db.add(db_token)
+    await db.commit()
+    await db.refresh(db_token)
+    return db_token
+
+async def get_token(db: AsyncSession, access_token: str) -> Optional[UserToken]:
+    """Get token by access_token"""
+    result = await db.execute(select(UserToken).where(
+        UserToken.uk_access_token == access_token,
+        UserToken.uk_is_active == 1
+    ))
+    return result.scalars().first()
+
+async def verify_access_token(access_token: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims of a valid access token, None if it is invalid, expired or revoked (no MySQL query)
+    """
+    claims = decode_token(access_token)
+    if not claims or not claims.get("jti"):
+        return None
+    version = active_tokens.version
+    if active_tokens.get(claims["jti"]) is None:
+        if await is_token_revoked_async(claims):
+            return None
+        active_tokens.set(claims["jti"], True, ttl=claims["exp"] - time.time(), since=version)
+    return claims
+
+async def get_user_tokens(db: AsyncSession, user_id: int) -> List[UserToken]:
+    """Get all active tokens for a user"""
+    result = await db.execute(select(UserToken).where(
+        UserToken.uk_user_id == user_id,
+        UserToken.uk_is_active == 1
+    ))
+    return result.scalars().all()
+
+async def revoke_token(db: AsyncSession, access_token: str) -> bool:
+    """Revoke a specific token (Redis before the commit, see crud/token.py)"""
+    token = await get_token(db, access_token)
+    if token:
+        claims = decode_token(access_token)
+        if claims:
+            await revoke_token_claims_async(claims)
+        token.uk_is_active = 0
+        await db.commit()
+        if claims:
+            await invalidation_bus.publish_async("active_tokens", *token_ids([access_token]))
+        return True
+    return False
+
+async def revoke_all_user_tokens(db: AsyncSession, user_id: int) -> bool:
+    """Revoke all tokens for a user (Redis before the commit, see crud/token.py)"""
+    # MySQL has no UPDATE ... RETURNING: read the tokens to invalidate first
+    result = await db.execute(select(UserToken.uk_access_token).where(
+        UserToken.uk_user_id == user_id,
+        UserToken.uk_is_active == 1
+    ))
+    access_tokens = result.scalars().all()
+    await revoke_subject_tokens_async(user_id)
+    await db.execute(update(UserToken).where(
+        UserToken.uk_user_id == user_id,
+        UserToken.uk_is_active == 1
+    ).values(uk_is_active=0))
+    await db.commit()
+    await invalidation_bus.publish_async("active_tokens", *token_ids(access_tokens))
+    return True
+
+async def cleanup_expired_tokens(db: AsyncSession) -> int:
+    """Clean up expired tokens"""
+    current_time = int(time.time())
+    result = await db.execute(update(UserToken).where(
+        UserToken.uk_expires_at < current_time,
+        UserToken.uk_is_active == 1
+    ).values(uk_is_active=0))
+    await db.commit()
+    return result.rowcount
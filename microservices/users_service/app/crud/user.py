@@ -1,20 +1,52 @@
 from sqlalchemy.orm import Session
-from typing import Optional
-from op_core.core import get_password_hash, verify_password
+from typing import List, Optional
+from op_core.core import get_password_hash, verify_and_update_password
+from op_core.core.cache import cached_lookup, invalidate
+from op_core.core.local_cache import local_cache, invalidation_bus
 from ..models.user import User
 from ..schemas.user import UserCreate, UserUpdate
 from ..core.constants import UserStatus
 import time
 
+# Per-worker (L1) cache of u_status, in front of the Redis cached get_user_by_id
+user_status_cache = local_cache("user_status")
+
+# Never written to the Redis row cache
+SECRET_COLUMNS = ("u_password", "u_activatedcode")
+
+def _invalidate_user(user_id: int, *emails: str):
+    invalidate("user:id", user_id)
+    invalidate("user:email", *emails)
+    invalidation_bus.publish("user_status", user_id)
+
+@cached_lookup(User, "user:id", exclude=SECRET_COLUMNS)
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.u_id == user_id).first()
 
+@cached_lookup(User, "user:email", exclude=SECRET_COLUMNS)
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.u_email == email).first()
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.u_email == username).first()  # Using email as username
 
+def get_user_status(db: Session, user_id: int) -> Optional[int]:
+    version = user_status_cache.version
+    user_status = user_status_cache.get(user_id)
+    if user_status is None:
+        user = get_user_by_id(db, user_id)
+        if not user:
+            return None
+        user_status = user.u_status
+        user_status_cache.set(user_id, user_status, since=version)
+    return user_status
+
+def get_users_by_ids(db: Session, user_ids: List[int]) -> List[User]:
+    # One IN query for the whole batch (users:batchGet)
+    if not user_ids:
+        return []
+    return db.query(User).filter(User.u_id.in_(user_ids)).all()
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(User).offset(skip).limit(limit).all()
 
@@ -34,9 +66,10 @@ def create_user(db: Session, user: UserCreate) -> User:
     return db_user
 
 def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
-    db_user = get_user_by_id(db, user_id)
+    db_user = get_user_by_id.uncached(db, user_id)
     if not db_user:
         return None
+    old_email = db_user.u_email
     
     update_data = user.dict(exclude_unset=True)
     
@@ -61,29 +94,40 @@ def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
     
     db.commit()
     db.refresh(db_user)
+    _invalidate_user(user_id, old_email, db_user.u_email)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> bool:
-    user = get_user_by_id(db, user_id)
+    user = get_user_by_id.uncached(db, user_id)
     if not user:
         return False
+    email = user.u_email
     user.u_status = UserStatus.DELETED  # Set status to deleted
     user.u_datemodified = int(time.time())
     db.commit()
+    _invalidate_user(user_id, email)
     return True
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email)
+    # u_password is not cached, read the row from the database
+    user = get_user_by_email.uncached(db, email)
     if not user:
         return None
-    if not verify_password(password, user.u_password):
+    verified, new_hash = verify_and_update_password(password, user.u_password)
+    if not verified:
         return None
     if user.u_status != UserStatus.ACTIVE:  # Check if user is active
         return None
         
+    # Rehash with the current bcrypt rounds
+    if new_hash:
+        user.u_password = new_hash
+    
     # Update last login time
+    user_id, email = user.u_id, user.u_email
     user.u_datelastlogin = int(time.time())
     user.u_datemodified = int(time.time())
     db.commit()
+    _invalidate_user(user_id, email)
     
     return user 
\ No newline at end of file
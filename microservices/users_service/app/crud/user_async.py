@@ -0,0 +1,133 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from op_core.core import get_password_hash_async, verify_and_update_password_async
+from op_core.core.cache import cached_lookup, invalidate_async
+from op_core.core.local_cache import invalidation_bus
+from ..models.user import User
+from ..schemas.user import UserCreate, UserUpdate
+from ..core.constants import UserStatus
+from .user import user_status_cache, SECRET_COLUMNS
+import time
+
+# Async variants of crud/user.py for AsyncSession (get_async_db)
+
+async def _invalidate_user(user_id: int, *emails: str):
+    await invalidate_async("user:id", user_id)
+    await invalidate_async("user:email", *emails)
+    await invalidation_bus.publish_async("user_status", user_id)
+
+@cached_lookup(User, "user:id", exclude=SECRET_COLUMNS)
+async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
+    result = await db.execute(select(User).where(User.u_id == user_id))
+    return result.scalars().first()
+
+@cached_lookup(User, "user:email", exclude=SECRET_COLUMNS)
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.u_email == email))
+    return result.scalars().first()
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.u_email == username))  # Using email as username
+    return result.scalars().first()
+
+async def get_user_status(db: AsyncSession, user_id: int) -> Optional[int]:
+    version = user_status_cache.version
+    user_status = user_status_cache.get(user_id)
+    if user_status is None:
+        user = await get_user_by_id(db, user_id)
+        if not user:
+            return None
+        user_status = user.u_status
+        user_status_cache.set(user_id, user_status, since=version)
+    return user_status
+
+async def get_users_by_ids(db: AsyncSession, user_ids: List[int]) -> List[User]:
+    if not user_ids:
+        return []
+    result = await db.execute(select(User).where(User.u_id.in_(user_ids)))
+    return result.scalars().all()
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    hashed_password = await get_password_hash_async(user.password)
+    db_user = User(
+        u_email=user.email,
+        u_password=hashed_password,
+        u_fullname=user.full_name,
+        u_status=user.status,
+        u_datecreated=int(time.time()),
+        u_datemodified=int(time.time())
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user(db: AsyncSession, user_id: int, user: UserUpdate) -> Optional[User]:
+    db_user = await get_user_by_id.uncached(db, user_id)
+    if not db_user:
+        return None
+    old_email = db_user.u_email
+    
+    update_data = user.dict(exclude_unset=True)
+    
+    # Map the fields to database column names
+    field_mapping = {
+        "email": "u_email",
+        "password": "u_password",
+        "full_name": "u_fullname",
+        "status": "u_status"
+    }
+    
+    for field, value in update_data.items():
+        if field == "password":
+            setattr(db_user, "u_password", await get_password_hash_async(value))
+        else:
+            db_field = field_mapping.get(field)
+            if db_field:
+                setattr(db_user, db_field, value)
+    
+    # Update modified time
+    db_user.u_datemodified = int(time.time())
+    
+    await db.commit()
+    await _invalidate_user(user_id, old_email, db_user.u_email)
+    await db.refresh(db_user)
+    return db_user
+
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
+    user = await get_user_by_id.uncached(db, user_id)
+    if not user:
+        return False
+    user.u_status = UserStatus.DELETED  # Set status to deleted
+    user.u_datemodified = int(time.time())
+    await db.commit()
+    await _invalidate_user(user_id, user.u_email)
+    return True
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    # u_password is not cached, read the row from the database
+    user = await get_user_by_email.uncached(db, email)
+    if not user:
+        return None
+    verified, new_hash = await verify_and_update_password_async(password, user.u_password)
+    if not verified:
+        return None
+    if user.u_status != UserStatus.ACTIVE:  # Check if user is active
+        return None
+        
+    # Rehash with the current bcrypt rounds
+    if new_hash:
+        user.u_password = new_hash
+    
+    # Update last login time
+    user.u_datelastlogin = int(time.time())
+    user.u_datemodified = int(time.time())
+    await db.commit()
+    await _invalidate_user(user.u_id, user.u_email)
+    
+    return user
@@ -12,7 +12,11 @@ from op_core.core import (
     validation_error_handler,
     request_validation_error_handler,
     http_exception_handler,
-    generic_error_handler
+    generic_error_handler,
+    diagnostics_router,
+    MetricsMiddleware,
+    DeadlineMiddleware,
+    metrics_router
 )
 from .api.v1.user import router as user_router
 # from .models import user, token  # Import models to ensure they are registered with Base
@@ -42,6 +46,12 @@ app.add_middleware(RateLimitMiddleware)
 # Add request logging middleware
 app.add_middleware(LoggingMiddleware)
 
+# Add request deadline middleware (budget for outbound calls, from the caller's header)
+app.add_middleware(DeadlineMiddleware)
+
+# Add latency metrics middleware (outermost, so it times the whole stack)
+app.add_middleware(MetricsMiddleware)
+
 # Exception handlers
 app.add_exception_handler(ValidationError, validation_error_handler)
 app.add_exception_handler(RequestValidationError, request_validation_error_handler)
@@ -54,12 +64,21 @@ app.include_router(
     prefix=f"{settings.SERVICES['users']['api_prefix']}/user",
     tags=["authentication"]
 )
+if settings.DIAGNOSTICS["ENDPOINTS"]:
+    app.include_router(
+        diagnostics_router,
+        prefix="/diagnostics",
+        tags=["diagnostics"]
+    )
 # app.include_router(
 #     otp_router,
 #     prefix=f"{settings.SERVICES['users']['api_prefix']}/otp",
 #     tags=["otp"]
 # )
 
+# Prometheus scrape endpoint
+app.include_router(metrics_router, tags=["metrics"])
+
 @app.get("/health")
 async def health_check():
     return {
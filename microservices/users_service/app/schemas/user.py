@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from ..core.constants import UserStatus
 
@@ -37,6 +37,15 @@ class UserInDBBase(UserBase):
 class User(UserInDBBase):
     pass
 
+class UserBatchGet(BaseModel):
+    ids: List[int]
+
+class UserBatch(BaseModel):
+    users: List[User]
+    missing: List[int] = []
+    # ETag of each user, as sent by GET /users/{id}
+    etags: Dict[int, str] = {}
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -0,0 +1,40 @@
+import pytest
+import fakeredis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from op_core.core import Base, cache, local_cache
+from app.models.user import User
+from app.models.token import UserToken
+
+@pytest.fixture
+def db_session():
+    """
+    Session on an in-memory SQLite database with one active user (id 1)
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[User.__table__, UserToken.__table__])
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    db.add(User(u_id=1, u_email="user@example.com", u_password="hash", u_fullname="User", u_status=1))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+@pytest.fixture
+def cache_redis(monkeypatch):
+    """
+    Row cache (L2) and invalidation bus on a fake Redis; the L1 bus counts as subscribed
+    """
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "get_sync_redis", lambda name="default": client)
+    monkeypatch.setattr(local_cache, "get_sync_redis", lambda name="default": client)
+    monkeypatch.setitem(cache.settings.CACHE, "ENABLED", True)
+    monkeypatch.setitem(cache.settings.CACHE, "EARLY_REFRESH_BETA", 0)
+    monkeypatch.setitem(cache.settings.LOCAL_CACHE, "ENABLED", True)
+    monkeypatch.setattr(local_cache.invalidation_bus, "ready", lambda: True)
+    for l1 in local_cache.invalidation_bus.caches.values():
+        l1.clear()
+    return client
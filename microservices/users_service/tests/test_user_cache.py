@@ -0,0 +1,32 @@
+import json
+from op_core.core.cache import cache_key
+from app.crud.user import get_user_by_id, get_user_by_email, get_user_status, update_user, delete_user, user_status_cache
+from app.schemas.user import UserUpdate
+from app.core.constants import UserStatus
+
+def test_password_hash_is_not_cached(cache_redis, db_session):
+    get_user_by_id(db_session, 1)
+    get_user_by_email(db_session, "user@example.com")
+    for key in (cache_key("user:id", 1), cache_key("user:email", "user@example.com")):
+        row = json.loads(cache_redis.get(key))["row"]
+        assert row["u_email"] == "user@example.com"
+        assert "u_password" not in row and "u_activatedcode" not in row
+
+def test_update_evicts_redis_and_local_cache(cache_redis, db_session):
+    assert get_user_status(db_session, 1) == 1
+    get_user_by_email(db_session, "user@example.com")
+    assert user_status_cache.get(1) == 1
+    assert cache_redis.get(cache_key("user:id", 1)) is not None
+
+    update_user(db_session, 1, UserUpdate(full_name="Renamed", status=0))
+    assert cache_redis.get(cache_key("user:id", 1)) is None
+    assert cache_redis.get(cache_key("user:email", "user@example.com")) is None
+    assert user_status_cache.get(1) is None
+    assert get_user_status(db_session, 1) == 0
+    assert get_user_by_id(db_session, 1).u_fullname == "Renamed"
+
+def test_delete_evicts_redis_and_local_cache(cache_redis, db_session):
+    get_user_status(db_session, 1)
+    assert delete_user(db_session, 1)
+    assert cache_redis.get(cache_key("user:id", 1)) is None
+    assert get_user_status(db_session, 1) == UserStatus.DELETED